@@ -35,9 +35,10 @@ def get_prediction(db: Session, prediction_id: int):
 
 
 def get_predictions_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+    # Стабильный порядок страниц - тот же, что у keyset пагинации в prediction_service
     return db.query(models.Prediction).filter(
         models.Prediction.user_id == user_id
-    ).offset(skip).limit(limit).all()
+    ).order_by(models.Prediction.created_at.desc(), models.Prediction.id.desc()).offset(skip).limit(limit).all()
 
 
 def get_pending_predictions(db: Session):
@@ -1,12 +1,74 @@
 # api_gateway/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import StreamingResponse
+import httpx
 import os
-import jwt
-from typing import Optional
+from jose import JWTError, jwt
+from typing import AsyncIterator, Optional
+from shared.config import JWT_SECRET, JWT_ALGORITHM
+from shared.metrics import REGISTRY, install_metrics
+from shared.revocation import RevocationList, register_metrics
+from database import SessionLocal
+from resilience import CircuitOpenError
+from singleflight import SingleFlight
+from token_cache import TokenCache
+from upstream import UpstreamClients
 
-app = FastAPI(title="Prediction App API Gateway")
+# Конфигурация сервисов
+SERVICES = {
+    "auth": "http://auth_service:8000",
+    "predictions": "http://prediction_service:8002",
+    "rewards": "http://reward_service:8001"
+}
+
+# Общие пулы соединений ко всем сервисам из SERVICES
+upstreams = UpstreamClients(SERVICES)
+
+# Потоковое проксирование ответов upstream без разбора JSON (по умолчанию для маршрутов)
+STREAM_PROXY = os.getenv("GATEWAY_STREAM_PROXY", "false").lower() == "true"
+
+# Заголовки уровня соединения не пробрасываются (RFC 7230, 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade",
+}
+
+# Отозванные токены: проверяются в памяти на каждом запросе, в том числе при попадании в кэш
+revocation_list = RevocationList(
+    SessionLocal,
+    refresh_interval=float(os.getenv("REVOCATION_REFRESH_INTERVAL", "2"))
+)
+
+# Одинаковые одновременные чтения одного пользователя идут в upstream одним запросом
+singleflight = SingleFlight()
+
+# Кэш уже проверенных токенов: повторные запросы не ходят в auth service
+token_cache = TokenCache(
+    max_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", "300"))
+)
+
+# Дедлайны (в секундах) для частей агрегированного dashboard
+DASHBOARD_DEADLINES = {
+    "predictions": float(os.getenv("DASHBOARD_PREDICTIONS_DEADLINE", "2.0")),
+    "balance": float(os.getenv("DASHBOARD_BALANCE_DEADLINE", "1.0")),
+    "stats": float(os.getenv("DASHBOARD_STATS_DEADLINE", "1.0")),
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstreams.start()
+    # Первая загрузка отозванных токенов идет в БД - не блокируем event loop
+    await asyncio.to_thread(revocation_list.start)
+    yield
+    await upstreams.close()
+
+
+app = FastAPI(title="Prediction App API Gateway", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,54 +78,269 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Конфигурация сервисов
-SERVICES = {
-    "auth": "http://auth_service:8000",
-    "predictions": "http://prediction_service:8002",
-    "rewards": "http://reward_service:8001"
-}
+install_metrics(app)
+register_metrics(revocation_list)
+
+# Внутренние счетчики gateway в /metrics
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+REGISTRY.callback(
+    "gateway_token_cache_hits_total", "Token cache hits",
+    lambda: token_cache.hits, kind="counter"
+)
+REGISTRY.callback(
+    "gateway_token_cache_misses_total", "Token cache misses",
+    lambda: token_cache.misses, kind="counter"
+)
+REGISTRY.callback(
+    "gateway_token_cache_size", "Tokens currently cached",
+    lambda: token_cache.stats()["size"]
+)
+REGISTRY.callback(
+    "gateway_circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    lambda: {(name, ): _BREAKER_STATES[p.breaker.state] for name, p in upstreams.policies.items()},
+    labelnames=("upstream",)
+)
+REGISTRY.callback(
+    "gateway_circuit_breaker_trips_total", "Times the circuit breaker opened",
+    lambda: {(name, ): p.breaker.trips for name, p in upstreams.policies.items()},
+    labelnames=("upstream",), kind="counter"
+)
+REGISTRY.callback(
+    "gateway_upstream_retries_total", "Retried upstream requests",
+    lambda: {(name, ): p.retries for name, p in upstreams.policies.items()},
+    labelnames=("upstream",), kind="counter"
+)
+REGISTRY.callback(
+    "gateway_upstream_hedges_total", "Hedged upstream requests",
+    lambda: {(name, ): p.hedges for name, p in upstreams.policies.items()},
+    labelnames=("upstream",), kind="counter"
+)
+REGISTRY.callback(
+    "gateway_singleflight_calls_total", "Upstream reads actually sent",
+    lambda: singleflight.calls, kind="counter"
+)
+REGISTRY.callback(
+    "gateway_singleflight_coalesced_total", "Upstream reads served by an in-flight call",
+    lambda: singleflight.coalesced, kind="counter"
+)
 
 
 async def verify_token(token: str) -> dict:
     """Верификация JWT токена"""
+    claims = token_cache.get(token)
+    if claims is not None:
+        if claims["jti"] is not None and revocation_list.is_revoked(claims["jti"]):
+            raise HTTPException(status_code=401, detail="Token revoked")
+        return claims
+
+    # Подпись и срок действия проверяем локально
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    claims = {"sub": payload["sub"], "user_id": payload.get("user_id"), "jti": payload.get("jti")}
+    if claims["jti"] is not None and revocation_list.is_revoked(claims["jti"]):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    if claims["user_id"] is None:
+        # Токены старого формата без user_id - узнаем пользователя в auth service
+        claims["user_id"] = await resolve_user_id(token)
+
+    token_cache.put(token, claims, exp=payload.get("exp"))
+    return claims
+
+
+async def resolve_user_id(token: str) -> int:
+    """Получение id пользователя по токену через сервис аутентификации"""
     try:
-        # Отправляем токен в сервис аутентификации для проверки
-        auth_response = requests.get(
-            f"{SERVICES['auth']}/auth/verify-token",
+        auth_response = await upstreams.get(
+            "auth",
+            "/auth/verify",
             headers={"Authorization": f"Bearer {token}"}
         )
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Auth service unavailable")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=401, detail="Token verification failed")
 
-        if auth_response.status_code == 200:
-            return auth_response.json()
-        else:
-            raise HTTPException(status_code=401, detail="Invalid token")
+    if auth_response.status_code == 200:
+        return auth_response.json()["user"]["id"]
+    raise HTTPException(status_code=401, detail="Invalid token")
 
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Token verification failed")
+
+async def coalesced_get(
+        service: str,
+        path: str,
+        token: str,
+        user_id: int,
+        timeout: Optional[float] = None
+) -> httpx.Response:
+    """GET к upstream, объединенный с такими же текущими запросами пользователя"""
+    # Таймаут входит в ключ: короткий дедлайн части dashboard не должен обрывать
+    # вызов, к которому присоединился обычный запрос с таймаутом пула
+    return await singleflight.do(
+        (service, path, user_id, timeout),
+        lambda: upstreams.get(
+            service,
+            path,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=timeout
+        )
+    )
+
+
+async def fetch_upstream(service: str, path: str, token: str, user_id: int) -> httpx.Response:
+    """GET запрос к сервису с пробросом токена"""
+    try:
+        return await coalesced_get(service, path, token, user_id)
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail=f"Upstream '{service}' circuit is open")
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail=f"Upstream '{service}' timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail=f"Upstream '{service}' unavailable")
+
+
+async def stream_upstream(service: str, path: str, token: str) -> StreamingResponse:
+    """Проксирует ответ сервиса как есть: статус, заголовки и тело кусками"""
+    try:
+        response = await upstreams.stream(
+            service,
+            "GET",
+            path,
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail=f"Upstream '{service}' circuit is open")
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail=f"Upstream '{service}' timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail=f"Upstream '{service}' unavailable")
+
+    # Тело передается без декодирования, поэтому content-encoding и content-length остаются верными
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name.lower() not in HOP_BY_HOP_HEADERS
+    }
+    return StreamingResponse(
+        _relay_body(response),
+        status_code=response.status_code,
+        headers=headers
+    )
+
+
+async def _relay_body(response: httpx.Response) -> AsyncIterator[bytes]:
+    # Закрываем ответ и в случае обрыва upstream посреди тела: фоновая задача
+    # StreamingResponse после исключения не запускается, и соединение пула утекло бы
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
 
 
 @app.get("/user/predictions")
-async def get_user_predictions(token: str):
+async def get_user_predictions(token: str, stream: Optional[bool] = None):
     """Получение предсказаний пользователя через gateway"""
     user_data = await verify_token(token)
+    # prediction_service отдает предсказания владельца токена
+    path = "/predictions/"
+
+    if (STREAM_PROXY if stream is None else stream):
+        return await stream_upstream("predictions", path, token)
 
     # Перенаправляем запрос в prediction service
-    response = requests.get(
-        f"{SERVICES['predictions']}/predictions/user/{user_data['user_id']}",
-        headers={"Authorization": f"Bearer {token}"}
+    response = await fetch_upstream(
+        "predictions",
+        path,
+        token,
+        user_data["user_id"]
     )
 
     return response.json()
 
 
 @app.get("/user/rewards")
-async def get_user_rewards(token: str):
+async def get_user_rewards(token: str, stream: Optional[bool] = None):
     """Получение наград пользователя через gateway"""
     user_data = await verify_token(token)
+    path = f"/rewards/balance/{user_data['user_id']}"
+
+    if (STREAM_PROXY if stream is None else stream):
+        return await stream_upstream("rewards", path, token)
+
+    response = await fetch_upstream(
+        "rewards",
+        path,
+        token,
+        user_data["user_id"]
+    )
+
+    return response.json()
+
+
+async def fetch_dashboard_part(service: str, path: str, token: str, user_id: int, deadline: float):
+    """Загрузка одной части dashboard с жестким дедлайном"""
+    response = await asyncio.wait_for(
+        coalesced_get(service, path, token, user_id, timeout=deadline),
+        timeout=deadline
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@app.get("/user/dashboard")
+async def get_user_dashboard(token: str):
+    """Предсказания, баланс и статистика наград одним запросом"""
+    # Токен проверяем один раз, сервисы опрашиваем параллельно. Если часть
+    # не уложилась в дедлайн или упала - отдаем остальное и список ошибок
+    user_data = await verify_token(token)
+    user_id = user_data["user_id"]
 
-    response = requests.get(
-        f"{SERVICES['rewards']}/rewards/balance/{user_data['user_id']}",
-        headers={"Authorization": f"Bearer {token}"}
+    parts = {
+        "predictions": ("predictions", "/predictions/"),
+        "balance": ("rewards", f"/rewards/balance/{user_id}"),
+        "stats": ("rewards", f"/rewards/stats/{user_id}"),
+    }
+    results = await asyncio.gather(
+        *(
+            fetch_dashboard_part(service, path, token, user_id, DASHBOARD_DEADLINES[name])
+            for name, (service, path) in parts.items()
+        ),
+        return_exceptions=True
     )
 
-    return response.json()
\ No newline at end of file
+    dashboard = {"user_id": user_id, "errors": {}}
+    for name, result in zip(parts, results):
+        if isinstance(result, (asyncio.TimeoutError, httpx.TimeoutException)):
+            dashboard[name] = None
+            dashboard["errors"][name] = "timeout"
+        elif isinstance(result, CircuitOpenError):
+            dashboard[name] = None
+            dashboard["errors"][name] = "circuit open"
+        elif isinstance(result, httpx.HTTPStatusError):
+            dashboard[name] = None
+            dashboard["errors"][name] = f"upstream returned {result.response.status_code}"
+        elif isinstance(result, Exception):
+            dashboard[name] = None
+            dashboard["errors"][name] = "unavailable"
+        else:
+            dashboard[name] = result
+
+    dashboard["partial"] = bool(dashboard["errors"])
+    return dashboard
+
+
+@app.get("/gateway/stats")
+async def gateway_stats():
+    """Внутренняя статистика gateway"""
+    return {
+        "token_cache": token_cache.stats(),
+        "upstreams": upstreams.stats(),
+        "singleflight": singleflight.stats(),
+    }
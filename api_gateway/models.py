@@ -1,6 +1,6 @@
 # prediction_app/api_gateway/models.py - ДОБАВЛЯЕМ К СУЩЕСТВУЮЩИМ
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -43,6 +43,10 @@ class Prediction(Base):
     # Связь с пользователем
     user = relationship("User", back_populates="predictions")
 
+    __table_args__ = (
+        Index("ix_predictions_user_created_id", "user_id", "created_at", "id"),
+    )
+
 
 # Новая модель для наград пользователей
 class UserReward(Base):
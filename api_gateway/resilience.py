@@ -0,0 +1,131 @@
+# api_gateway/resilience.py
+import time
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: circuit breaker сервиса разомкнут"""
+
+    def __init__(self, service: str):
+        super().__init__(f"Circuit breaker for '{service}' is open")
+        self.service = service
+
+
+class CircuitBreaker:
+    """Circuit breaker: после серии ошибок перестает пускать запросы к сервису"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.trips = 0
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            # Время ожидания вышло - пропускаем пробные запросы
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """Возвращает слот пробного запроса, если он завершился без результата"""
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self.trips += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "consecutive_failures": self._failures,
+        }
+
+
+class RetryBudget:
+    """Бюджет повторов: не больше ratio повторов на один обычный запрос"""
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.spent = 0
+        self.exhausted = 0
+        self._tokens = max_tokens
+
+    def deposit(self):
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.spent += 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self._tokens, 2),
+            "spent": self.spent,
+            "exhausted": self.exhausted,
+        }
+
+
+class UpstreamPolicy:
+    """Политика отказоустойчивости для одного upstream"""
+
+    def __init__(
+            self,
+            breaker: CircuitBreaker,
+            budget: RetryBudget,
+            max_retries: int = 1,
+            hedge_delay: float = 0.0
+    ):
+        self.breaker = breaker
+        self.budget = budget
+        self.max_retries = max_retries
+        # 0 - hedged запросы выключены
+        self.hedge_delay = hedge_delay
+        self.retries = 0
+        self.hedges = 0
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "retry_budget": self.budget.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+        }
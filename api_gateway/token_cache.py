@@ -0,0 +1,54 @@
+# api_gateway/token_cache.py
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenCache:
+    """LRU кэш проверенных токенов с TTL, не превышающим exp самого токена"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[dict]:
+        item = self._items.get(token)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, claims = item
+        if expires_at <= time.time():
+            del self._items[token]
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(token)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict, exp: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+
+        self._items[token] = (expires_at, claims)
+        self._items.move_to_end(token)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, token: str):
+        self._items.pop(token, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
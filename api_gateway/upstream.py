@@ -0,0 +1,236 @@
+# api_gateway/upstream.py
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, UpstreamPolicy
+from shared.metrics import REGISTRY
+
+# Настройки пулов соединений по умолчанию (переопределяются для конкретного
+# upstream через UPSTREAM_<NAME>_MAX_CONNECTIONS и т.п.)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "1.0"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5.0"))
+
+# Отказоустойчивость (тоже переопределяется per-upstream)
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "1"))
+UPSTREAM_RETRY_BUDGET_RATIO = float(os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", "0.2"))
+# Задержка перед hedged запросом, 0 - выключено
+UPSTREAM_HEDGE_DELAY = float(os.getenv("UPSTREAM_HEDGE_DELAY", "0"))
+
+# Повторять можно только идемпотентные запросы и только на эти статусы
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRYABLE_STATUSES = {502, 503, 504}
+
+UPSTREAM_DURATION = REGISTRY.histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Latency of gateway calls to upstream services",
+    ("upstream", "method", "status"),
+)
+
+
+def _discard_result(task: asyncio.Future):
+    if not task.cancelled():
+        task.exception()
+
+
+def _setting(service: str, name: str, default, cast):
+    """Читает настройку конкретного upstream, например UPSTREAM_REWARDS_TIMEOUT"""
+    value = os.getenv(f"UPSTREAM_{service.upper()}_{name}")
+    return cast(value) if value is not None else default
+
+
+class UpstreamClients:
+    """Долгоживущие async HTTP клиенты - отдельный пул соединений на каждый сервис"""
+
+    def __init__(self, services: Dict[str, str]):
+        self.services = services
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.policies: Dict[str, UpstreamPolicy] = {
+            service: UpstreamPolicy(
+                breaker=CircuitBreaker(
+                    failure_threshold=_setting(service, "BREAKER_FAILURES", UPSTREAM_BREAKER_FAILURES, int),
+                    reset_timeout=_setting(service, "BREAKER_RESET", UPSTREAM_BREAKER_RESET, float),
+                ),
+                budget=RetryBudget(
+                    ratio=_setting(service, "RETRY_BUDGET_RATIO", UPSTREAM_RETRY_BUDGET_RATIO, float),
+                ),
+                max_retries=_setting(service, "MAX_RETRIES", UPSTREAM_MAX_RETRIES, int),
+                hedge_delay=_setting(service, "HEDGE_DELAY", UPSTREAM_HEDGE_DELAY, float),
+            )
+            for service in services
+        }
+
+    async def start(self):
+        for service, base_url in self.services.items():
+            limits = httpx.Limits(
+                max_connections=_setting(service, "MAX_CONNECTIONS", UPSTREAM_MAX_CONNECTIONS, int),
+                max_keepalive_connections=_setting(service, "MAX_KEEPALIVE", UPSTREAM_MAX_KEEPALIVE, int),
+                keepalive_expiry=_setting(service, "KEEPALIVE_EXPIRY", UPSTREAM_KEEPALIVE_EXPIRY, float),
+            )
+            timeout = httpx.Timeout(
+                _setting(service, "TIMEOUT", UPSTREAM_TIMEOUT, float),
+                connect=_setting(service, "CONNECT_TIMEOUT", UPSTREAM_CONNECT_TIMEOUT, float),
+            )
+            self._clients[service] = httpx.AsyncClient(
+                base_url=base_url,
+                limits=limits,
+                timeout=timeout,
+            )
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def client(self, service: str) -> httpx.AsyncClient:
+        client = self._clients.get(service)
+        if client is None:
+            raise RuntimeError(f"Upstream client for '{service}' is not started")
+        return client
+
+    async def request(
+            self,
+            service: str,
+            method: str,
+            path: str,
+            timeout: Optional[float] = None,
+            **kwargs
+    ) -> httpx.Response:
+        """Запрос к upstream; timeout переопределяет таймаут пула для одного вызова"""
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        client = self.client(service)
+        policy = self.policies[service]
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            if not policy.breaker.allow_request():
+                raise CircuitOpenError(service)
+
+            start = time.perf_counter()
+            try:
+                if idempotent and policy.hedge_delay > 0:
+                    response = await self._hedged_request(client, policy, method, path, **kwargs)
+                else:
+                    response = await client.request(method, path, **kwargs)
+            except asyncio.CancelledError:
+                # Вызов отменен снаружи (например, дедлайн dashboard) - это не ошибка сервиса
+                policy.breaker.release()
+                UPSTREAM_DURATION.observe(time.perf_counter() - start, upstream=service, method=method, status="cancelled")
+                raise
+            except httpx.TransportError as exc:
+                status = "timeout" if isinstance(exc, httpx.TimeoutException) else "error"
+                UPSTREAM_DURATION.observe(time.perf_counter() - start, upstream=service, method=method, status=status)
+                policy.breaker.record_failure()
+                if not self._may_retry(policy, idempotent, attempt):
+                    raise
+            else:
+                UPSTREAM_DURATION.observe(
+                    time.perf_counter() - start,
+                    upstream=service,
+                    method=method,
+                    status=response.status_code
+                )
+                if response.status_code < 500:
+                    policy.breaker.record_success()
+                    return response
+                policy.breaker.record_failure()
+                if response.status_code not in RETRYABLE_STATUSES or not self._may_retry(policy, idempotent, attempt):
+                    return response
+
+            attempt += 1
+            policy.retries += 1
+
+    @staticmethod
+    def _may_retry(policy: UpstreamPolicy, idempotent: bool, attempt: int) -> bool:
+        return idempotent and attempt < policy.max_retries and policy.budget.withdraw()
+
+    @staticmethod
+    async def _hedged_request(
+            client: httpx.AsyncClient,
+            policy: UpstreamPolicy,
+            method: str,
+            path: str,
+            **kwargs
+    ) -> httpx.Response:
+        """Если ответ не пришел за hedge_delay, дублируем запрос и берем первый успешный"""
+        tasks = [asyncio.ensure_future(client.request(method, path, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=policy.hedge_delay)
+            if done or not policy.budget.withdraw():
+                return await tasks[0]
+
+            policy.hedges += 1
+            tasks.append(asyncio.ensure_future(client.request(method, path, **kwargs)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Оба запроса упали - пробрасываем ошибку первого
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                # Результат проигравшего запроса никто не заберет - читаем его
+                # исключение в callback, иначе asyncio залогирует "never retrieved"
+                task.add_done_callback(_discard_result)
+                if not task.done():
+                    task.cancel()
+
+    async def stream(
+            self,
+            service: str,
+            method: str,
+            path: str,
+            timeout: Optional[float] = None,
+            **kwargs
+    ) -> httpx.Response:
+        """Открывает потоковый ответ upstream; тело не читается, закрывает вызывающий"""
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        client = self.client(service)
+        policy = self.policies[service]
+        # Повторы и hedging здесь невозможны: тело уходит клиенту по мере чтения
+        if not policy.breaker.allow_request():
+            raise CircuitOpenError(service)
+
+        start = time.perf_counter()
+        try:
+            response = await client.send(client.build_request(method, path, **kwargs), stream=True)
+        except asyncio.CancelledError:
+            policy.breaker.release()
+            raise
+        except httpx.TransportError as exc:
+            status = "timeout" if isinstance(exc, httpx.TimeoutException) else "error"
+            UPSTREAM_DURATION.observe(time.perf_counter() - start, upstream=service, method=method, status=status)
+            policy.breaker.record_failure()
+            raise
+
+        UPSTREAM_DURATION.observe(
+            time.perf_counter() - start,
+            upstream=service,
+            method=method,
+            status=response.status_code
+        )
+        if response.status_code < 500:
+            policy.breaker.record_success()
+        else:
+            policy.breaker.record_failure()
+        return response
+
+    async def get(self, service: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(service, "GET", path, **kwargs)
+
+    def stats(self) -> dict:
+        return {service: policy.stats() for service, policy in self.policies.items()}
@@ -0,0 +1,48 @@
+# auth_service/bcrypt_benchmark.py
+# Подбор стоимости bcrypt под целевое время входа на текущей машине:
+#   python -m auth_service.bcrypt_benchmark --target-ms 250
+import argparse
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+
+def measure(rounds: int, samples: int) -> float:
+    """Медианное время проверки пароля (мс) при заданной стоимости"""
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+    hashed = context.hash("benchmark-password")
+
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("benchmark-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick a bcrypt cost factor for a target login latency")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    best = None
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        elapsed = measure(rounds, args.samples)
+        print(f"rounds={rounds:2d}  verify={elapsed:8.1f} ms")
+        if elapsed > args.target_ms:
+            # Каждый следующий уровень вдвое дороже - дальше смысла мерить нет
+            break
+        best = rounds
+
+    if best is None:
+        print(f"Even rounds={args.min_rounds} exceeds {args.target_ms} ms; use BCRYPT_ROUNDS={args.min_rounds}")
+    else:
+        print(f"BCRYPT_ROUNDS={best}")
+
+
+if __name__ == "__main__":
+    main()
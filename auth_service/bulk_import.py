@@ -0,0 +1,227 @@
+# auth_service/bulk_import.py
+# Массовый импорт пользователей из NDJSON или CSV (поля username, email и
+# password либо уже готовый bcrypt hashed_password):
+#   python -m auth_service.bulk_import users.ndjson
+#   python -m auth_service.bulk_import users.csv --batch-size 2000 --workers 8 --rounds 8
+#
+# Пароли хешируются параллельно во всех ядрах. С --rounds ниже BCRYPT_ROUNDS
+# импорт идет в тысячи строк в секунду, а хеши прозрачно пересчитываются
+# с полной стоимостью при первом входе (needs_update, см. hashing.py).
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import SessionLocal
+from .hashing import BCRYPT_ROUNDS, pwd_context
+
+# Контекст хеширования внутри процесса пула (создается initializer'ом)
+_import_context = None
+
+
+def _init_hash_worker(rounds: int):
+    global _import_context
+    _import_context = pwd_context.copy(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def _hash_password(password: str) -> str:
+    return _import_context.hash(password)
+
+
+def read_rows(source: TextIO, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Построчно читает файл, возвращая (номер строки, данные)"""
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(source, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, {"__error__": f"invalid JSON: {e.msg}"}
+
+
+class ImportReport:
+    def __init__(self, errors_out: TextIO):
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self._errors_out = errors_out
+
+    def error(self, line: int, username: Optional[str], message: str):
+        self.failed += 1
+        self._errors_out.write(json.dumps({"line": line, "username": username, "error": message}) + "\n")
+
+    def progress(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.processed / elapsed if elapsed else 0.0
+        return (
+            f"processed={self.processed} imported={self.imported} "
+            f"failed={self.failed} rate={rate:.0f} rows/s"
+        )
+
+
+def _validate(line: int, row: dict, report: ImportReport) -> Optional[dict]:
+    if "__error__" in row:
+        report.error(line, None, row["__error__"])
+        return None
+
+    username = row.get("username")
+    hashed_password = row.get("hashed_password") or None
+    try:
+        if hashed_password:
+            user = schemas.UserBase(username=username, email=row.get("email"))
+            if not pwd_context.identify(hashed_password):
+                report.error(line, username, "hashed_password is not a supported hash")
+                return None
+        else:
+            user = schemas.UserCreate(username=username, email=row.get("email"), password=row.get("password"))
+    except ValidationError as e:
+        report.error(line, username, "; ".join(err["msg"] for err in e.errors()))
+        return None
+
+    return {
+        "line": line,
+        "username": user.username,
+        "email": user.email,
+        "password": getattr(user, "password", None),
+        "hashed_password": hashed_password,
+    }
+
+
+def _drop_conflicts(db: Session, rows: List[dict], report: ImportReport) -> List[dict]:
+    """Отсекает дубликаты внутри пачки и уже существующие в БД (два запроса с IN)"""
+    existing_usernames = {
+        username for (username,) in db.query(models.User.username).filter(
+            models.User.username.in_({row["username"] for row in rows})
+        )
+    }
+    existing_emails = {
+        email for (email,) in db.query(models.User.email).filter(
+            models.User.email.in_({row["email"] for row in rows})
+        )
+    }
+
+    accepted = []
+    for row in rows:
+        if row["username"] in existing_usernames:
+            report.error(row["line"], row["username"], "Username already registered")
+        elif row["email"] in existing_emails:
+            report.error(row["line"], row["username"], "Email already registered")
+        else:
+            existing_usernames.add(row["username"])
+            existing_emails.add(row["email"])
+            accepted.append(row)
+    return accepted
+
+
+def _insert_batch(db: Session, rows: List[dict], report: ImportReport):
+    values = [
+        {"username": row["username"], "email": row["email"], "hashed_password": row["hashed_password"]}
+        for row in rows
+    ]
+    try:
+        db.execute(insert(models.User), values)
+        db.commit()
+        report.imported += len(rows)
+        return
+    except IntegrityError:
+        # Кто-то успел зарегистрировать те же имена - вставляем по одной, чтобы найти конфликт
+        db.rollback()
+
+    for row, value in zip(rows, values):
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.User), [value])
+            report.imported += 1
+        except IntegrityError:
+            report.error(row["line"], row["username"], "Username or email already registered")
+    db.commit()
+
+
+def import_users(
+        source: TextIO,
+        fmt: str,
+        batch_size: int,
+        executor: ProcessPoolExecutor,
+        workers: int,
+        report: ImportReport
+):
+    rows = read_rows(source, fmt)
+    db = SessionLocal()
+    try:
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            report.processed += len(chunk)
+
+            batch = [row for row in (_validate(line, data, report) for line, data in chunk) if row]
+            if batch:
+                batch = _drop_conflicts(db, batch, report)
+
+            # bcrypt по всем ядрам; крупные chunksize снижают накладные расходы на IPC
+            to_hash = [row for row in batch if not row["hashed_password"]]
+            hashes = executor.map(
+                _hash_password,
+                [row["password"] for row in to_hash],
+                chunksize=max(1, len(to_hash) // (workers * 4))
+            )
+            for row, hashed in zip(to_hash, hashes):
+                row["hashed_password"] = hashed
+
+            if batch:
+                _insert_batch(db, batch, report)
+            print(report.progress(), file=sys.stderr)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from NDJSON or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS,
+                        help="bcrypt cost for imported passwords (upgraded on first login)")
+    parser.add_argument("--errors", default="-", help="file for per-row errors (NDJSON), '-' for stdout")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    errors_out = sys.stdout if args.errors == "-" else open(args.errors, "w")
+    report = ImportReport(errors_out)
+    try:
+        with open(args.path, newline="" if fmt == "csv" else None) as source, ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=_init_hash_worker,
+                initargs=(args.rounds,)
+        ) as executor:
+            import_users(source, fmt, args.batch_size, executor, args.workers, report)
+    finally:
+        if errors_out is not sys.stdout:
+            errors_out.close()
+
+    print(f"done: {report.progress()}", file=sys.stderr)
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
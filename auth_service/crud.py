@@ -1,22 +1,35 @@
 # auth_service/crud.py
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import models, schemas
-from passlib.context import CryptContext
-from typing import Optional
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .hashing import hasher
+from typing import Iterable, List, Optional
+from datetime import datetime
 
 
 def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.username == username).first()
 
 
+async def aget_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+
+def get_users_by_usernames(db: Session, usernames: Iterable[str]) -> List[models.User]:
+    usernames = list(set(usernames))
+    if not usernames:
+        return []
+    return db.query(models.User).filter(models.User.username.in_(usernames)).all()
+
+
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = hasher.hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -28,14 +41,49 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     return db_user
 
 
+def update_user(db: Session, user: models.User, **changes) -> models.User:
+    # Запись в кэше пользователей сбрасывается после коммита (after_commit, user_cache.py)
+    for field, value in changes.items():
+        setattr(user, field, value)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def deactivate_user(db: Session, username: str) -> Optional[models.User]:
+    user = get_user_by_username(db, username)
+    if user:
+        user = update_user(db, user, is_active=False)
+    return user
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = hasher.verify_and_update(plain_password, hashed_password)
+    return valid
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
-    return user
\ No newline at end of file
+    if new_hash:
+        # Хеш создан с устаревшей стоимостью - сохраняем пересчитанный
+        user.hashed_password = new_hash
+        db.commit()
+        db.refresh(user)
+    return user
+
+
+def revoke_token(db: Session, jti: str, expires_at: datetime, user_id: Optional[int] = None) -> models.RevokedToken:
+    existing = db.query(models.RevokedToken).filter(models.RevokedToken.jti == jti).first()
+    if existing:
+        return existing
+
+    db_revoked = models.RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at)
+    db.add(db_revoked)
+    db.commit()
+    db.refresh(db_revoked)
+    return db_revoked
@@ -2,18 +2,30 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from typing import Callable
+import os
 from . import crud, schemas
-from .database import get_db
+from .database import get_db, SessionLocal
+from .user_cache import user_cache
 from shared.config import JWT_SECRET, JWT_ALGORITHM
+from shared.revocation import RevocationList, register_metrics
 
 security = HTTPBearer()
 
+# Отозванные токены в памяти процесса; используется и prediction_service
+revocation_list = RevocationList(
+    SessionLocal,
+    refresh_interval=float(os.getenv("REVOCATION_REFRESH_INTERVAL", "2")),
+    purge_expired=True
+)
+register_metrics(revocation_list)
 
-async def get_current_user(
-        credentials: HTTPAuthorizationCredentials = Depends(security),
-        db: Session = Depends(get_db)
-) -> schemas.UserResponse:
+
+async def get_token_payload(
+        credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,13 +38,60 @@ async def get_current_user(
             JWT_SECRET,
             algorithms=[JWT_ALGORITHM]
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_user_by_username(db, username=username)
-    if user is None:
+    if payload.get("sub") is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    jti = payload.get("jti")
+    if jti is not None and revocation_list.is_revoked(jti):
+        raise credentials_exception
+    return payload
+
+
+async def get_current_user(
+        payload: dict = Depends(get_token_payload),
+        db: Session = Depends(get_db)
+) -> schemas.UserResponse:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    username: str = payload["sub"]
+
+    # Сначала кэш: на горячем пути обычно обходимся без запроса в БД
+    user = user_cache.get(username)
+    if user is None:
+        db_user = crud.get_user_by_username(db, username=username)
+        if db_user is None:
+            raise credentials_exception
+        user = schemas.UserResponse.model_validate(db_user)
+        user_cache.put(username, user)
+    return user
+
+
+def async_current_user(get_async_db: Callable) -> Callable:
+    """get_current_user для async маршрутов: промах кэша читает пользователя
+    через AsyncSession сервиса (get_async_db), не блокируя event loop"""
+
+    async def get_current_user_async(
+            payload: dict = Depends(get_token_payload),
+            db: AsyncSession = Depends(get_async_db)
+    ) -> schemas.UserResponse:
+        username: str = payload["sub"]
+        user = user_cache.get(username)
+        if user is None:
+            db_user = await crud.aget_user_by_username(db, username=username)
+            if db_user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user = schemas.UserResponse.model_validate(db_user)
+            user_cache.put(username, user)
+        return user
+
+    return get_current_user_async
@@ -0,0 +1,96 @@
+# auth_service/hashing.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from shared.metrics import REGISTRY
+
+# Стоимость bcrypt (подбирается через python -m auth_service.bcrypt_benchmark)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Размер пула процессов и максимум операций в очереди, после которого отвечаем 429
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_WORKERS * 8)))
+
+# min_rounds = BCRYPT_ROUNDS: более дешевые хеши помечаются needs_update
+# и прозрачно пересчитываются при следующем входе пользователя
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+class HashingOverloaded(Exception):
+    """Очередь хеширования переполнена - запрос нужно отклонить"""
+
+
+# Функции уровня модуля: выполняются в дочерних процессах пула
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Выполняет bcrypt в пуле процессов, не занимая потоки обработки запросов"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.queue_limit:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self.pending += 1
+            if self._executor is None:
+                # spawn, а не fork: процесс uvicorn многопоточный, и fork унаследовал
+                # бы блокировки, захваченные другими потоками в момент форка
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            executor = self._executor
+
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Проверяет пароль; если хеш устарел, возвращает новый хеш вторым элементом"""
+        return self._run(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher(HASH_WORKERS, HASH_QUEUE_LIMIT)
+
+REGISTRY.callback(
+    "auth_hashing_pending", "Password hashing operations queued or running",
+    lambda: hasher.pending
+)
+REGISTRY.callback(
+    "auth_hashing_rejected_total", "Password hashing operations shed with 429",
+    lambda: hasher.rejected, kind="counter"
+)
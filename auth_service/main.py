@@ -1,17 +1,43 @@
 # auth_service/main.py
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from jose import jwt
-from datetime import datetime, timedelta
+from jose import ExpiredSignatureError, JWTError, jwt
+from datetime import datetime, timedelta, timezone
+import uuid
 from . import crud, schemas, models
 from .database import get_db, engine
+from .dependencies import get_current_user, get_token_payload, revocation_list
+from .hashing import HashingOverloaded, hasher
+from .user_cache import user_cache
 from shared.config import JWT_SECRET, JWT_ALGORITHM
+from shared.metrics import install_metrics
 
-# Создаем таблицы
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Auth Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Первая загрузка отозванных токенов идет в БД - не блокируем event loop
+    await asyncio.to_thread(revocation_list.start)
+    yield
+    hasher.shutdown()
+
+
+app = FastAPI(title="Auth Service", version="1.0.0", lifespan=lifespan)
+install_metrics(app, engine=engine)
+
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    # Очередь bcrypt переполнена - отказываем сразу, а не копим ожидающие запросы
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many authentication requests, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
 
 # JWT настройки
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -23,7 +49,8 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti - идентификатор токена, по которому его можно отозвать
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
@@ -55,17 +82,83 @@ def login(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "user_id": user.id}, expires_delta=access_token_expires
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @app.get("/auth/verify")
-def verify_token(current_user: schemas.UserResponse = Depends(crud.get_current_user)):
+def verify_token(current_user: schemas.UserResponse = Depends(get_current_user)):
     return {"status": "valid", "user": current_user}
 
 
+@app.post("/auth/logout")
+def logout(
+        payload: dict = Depends(get_token_payload),
+        current_user: schemas.UserResponse = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Отзыв текущего токена"""
+    jti = payload.get("jti")
+    if jti is None:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+    crud.revoke_token(db, jti=jti, expires_at=expires_at, user_id=current_user.id)
+    revocation_list.add(jti, expires_at)
+    return {"status": "revoked"}
+
+
+@app.post("/auth/introspect", response_model=schemas.TokenIntrospectionResponse)
+def introspect_tokens(request: schemas.TokenIntrospectionRequest, db: Session = Depends(get_db)):
+    """Пакетная проверка токенов: один запрос вместо N вызовов /auth/verify"""
+    results = []
+    for token in request.tokens:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except ExpiredSignatureError:
+            results.append(schemas.TokenIntrospection(active=False, error="expired"))
+            continue
+        except JWTError:
+            results.append(schemas.TokenIntrospection(active=False, error="invalid_token"))
+            continue
+
+        username = payload.get("sub")
+        if username is None:
+            results.append(schemas.TokenIntrospection(active=False, error="invalid_token"))
+            continue
+        if payload.get("jti") is not None and revocation_list.is_revoked(payload["jti"]):
+            results.append(schemas.TokenIntrospection(active=False, error="revoked"))
+            continue
+        results.append(schemas.TokenIntrospection(active=True, username=username, exp=payload.get("exp")))
+
+    # Пользователей берем из кэша, остальных - одним запросом с IN
+    users = {}
+    missing = set()
+    for result in results:
+        if result.active and result.username not in users:
+            cached = user_cache.get(result.username)
+            if cached is None:
+                missing.add(result.username)
+            else:
+                users[result.username] = cached
+    for db_user in crud.get_users_by_usernames(db, missing):
+        user = schemas.UserResponse.model_validate(db_user)
+        user_cache.put(db_user.username, user)
+        users[db_user.username] = user
+
+    for result in results:
+        if not result.active:
+            continue
+        result.user = users.get(result.username)
+        if result.user is None:
+            result.active = False
+            result.error = "unknown_user"
+
+    return {"results": results}
+
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
\ No newline at end of file
@@ -1,2 +1,2 @@
 # auth_service/models.py
-from shared.models import User, Base
\ No newline at end of file
+from shared.models import User, RevokedToken, Base
\ No newline at end of file
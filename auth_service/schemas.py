@@ -1,7 +1,7 @@
 # auth_service/schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class UserBase(BaseModel):
@@ -28,4 +28,20 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
-    username: Optional[str] = None
\ No newline at end of file
+    username: Optional[str] = None
+
+
+class TokenIntrospectionRequest(BaseModel):
+    tokens: List[str] = Field(..., max_length=1000)
+
+
+class TokenIntrospection(BaseModel):
+    active: bool
+    username: Optional[str] = None
+    exp: Optional[int] = None
+    user: Optional[UserResponse] = None
+    error: Optional[str] = None
+
+
+class TokenIntrospectionResponse(BaseModel):
+    results: List[TokenIntrospection]
@@ -0,0 +1,113 @@
+# auth_service/user_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from . import models, schemas
+from shared.metrics import REGISTRY
+
+
+class UserCache:
+    """LRU кэш пользователей с TTL, ключ - username"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[schemas.UserResponse]:
+        with self._lock:
+            item = self._items.get(username)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._items[username]
+                self.misses += 1
+                return None
+            self._items.move_to_end(username)
+            self.hits += 1
+            return item[1]
+
+    def put(self, username: str, user: schemas.UserResponse):
+        with self._lock:
+            self._items[username] = (time.monotonic() + self.ttl, user)
+            self._items.move_to_end(username)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            if self._items.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# TTL ограничивает устаревание записей, измененных другим процессом или сервисом
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60"))
+)
+
+
+# Любое изменение или удаление пользователя через ORM в этом процессе сбрасывает
+# запись - но только после COMMIT: при сбросе во время flush параллельный запрос
+# успел бы перечитать еще закоммиченную старую строку и закэшировать ее на весь TTL
+_PENDING_KEY = "user_cache_invalidate"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    usernames = session.info.setdefault(_PENDING_KEY, set())
+    for target in list(session.dirty) + list(session.deleted):
+        if not isinstance(target, models.User):
+            continue
+        usernames.add(target.username)
+
+
+@event.listens_for(models.User.username, "set", active_history=True)
+def _remember_old_username(target, value, oldvalue, initiator):
+    # Если поменялся сам username, сбрасываем и старый ключ. active_history
+    # подгружает прежнее значение, даже если атрибут истек после коммита
+    session = object_session(target)
+    if session is not None and isinstance(oldvalue, str) and oldvalue != value:
+        session.info.setdefault(_PENDING_KEY, set()).add(oldvalue)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for username in session.info.pop(_PENDING_KEY, ()):
+        # После отката имена остаются до следующего коммита сессии - лишний промах кэша безвреден
+        user_cache.invalidate(username)
+
+
+REGISTRY.callback(
+    "auth_user_cache_hits_total", "User cache hits in get_current_user",
+    lambda: user_cache.hits, kind="counter"
+)
+REGISTRY.callback(
+    "auth_user_cache_misses_total", "User cache misses in get_current_user",
+    lambda: user_cache.misses, kind="counter"
+)
+REGISTRY.callback(
+    "auth_user_cache_hit_ratio", "User cache hit ratio since start",
+    user_cache.hit_rate
+)
+REGISTRY.callback(
+    "auth_user_cache_invalidations_total", "User cache entries dropped after a user change",
+    lambda: user_cache.invalidations, kind="counter"
+)
@@ -0,0 +1,59 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from shared.config import DATABASE_URL
+from shared.models import Base as SharedBase
+from reward_service.models import Base as RewardBase
+
+config = context.config
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Таблицы auth/prediction сервисов и reward_service живут в одной БД
+target_metadata = [SharedBase.metadata, RewardBase.metadata]
+
+# Объекты полнотекстового поиска зависят от диалекта и не описаны в моделях (0003)
+UNMAPPED_SEARCH_OBJECTS = {"search_vector", "ix_predictions_search_vector", "predictions_fts"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return name not in UNMAPPED_SEARCH_OBJECTS and not (name or "").startswith("predictions_fts_")
+
+
+def run_migrations_offline():
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
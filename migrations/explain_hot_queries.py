@@ -0,0 +1,117 @@
+# migrations/explain_hot_queries.py
+# Проверка, что горячие запросы сервисов идут по индексам из миграций:
+#   python -m migrations.explain_hot_queries
+# Запросы, которые сервисы строят через SQLAlchemy Core, берутся из самого кода
+# сервисов и компилируются диалектом PostgreSQL - проверяется ровно тот SQL,
+# что уходит в БД. Простые выборки через ORM Query повторены здесь текстом.
+# Последовательное сканирование отключено (enable_seqscan = off): на почти
+# пустой БД планировщик иначе предпочтет его, и проверка ничего не покажет.
+# Код выхода 1, если хоть один запрос не использует ожидаемый индекс.
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from shared.config import DATABASE_URL
+from prediction_service import archive, crud
+
+# reward_service использует плоские импорты (import models), как в своем контейнере
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reward_service"))
+import crud as reward_crud  # noqa: E402
+import models as reward_models  # noqa: E402
+
+NOW = datetime(2024, 1, 1)
+
+
+def _award_rows():
+    return [
+        {
+            "user_id": 1, "prediction_id": prediction_id, "points_awarded": 100,
+            "award_type": "prediction_success", "description": "", "is_claimed": True
+        }
+        for prediction_id in (1, 2, 3)
+    ]
+
+
+# (где используется, ожидаемые индексы, запрос: Core statement или текст SQL)
+HOT_QUERIES = [
+    (
+        "prediction_service.crud.claim_due_predictions",
+        ("ix_predictions_pending_due",),
+        crud.claim_due_statement("explain", 500, 300, now=NOW),
+    ),
+    (
+        "prediction_service.crud.get_user_predictions_page",
+        ("ix_predictions_user_created_id", "ix_predictions_archive_user_created_id"),
+        crud.user_history_query(1, 101, before=(NOW, 1000000)),
+    ),
+    (
+        "reward_service.crud.award_predictions_bulk",
+        ("ix_user_rewards_prediction_id",),
+        reward_crud.award_insert_statement(postgresql.insert(reward_models.UserReward), _award_rows()),
+    ),
+    (
+        "prediction_service.crud.get_outbox_batch",
+        ("ix_award_outbox_user_id_id",),
+        crud.outbox_batch_query(1000, now=NOW),
+    ),
+    (
+        "prediction_service.archive.archive_batch",
+        ("ix_predictions_resolved_checked",),
+        archive.archive_candidates_query(NOW - timedelta(days=30), 5000),
+    ),
+    (
+        "api_gateway.crud.get_user_stats",
+        ("ix_predictions_user_status",),
+        "SELECT count(*) FROM predictions WHERE user_id = 1 AND status = 'pending'",
+    ),
+    (
+        "reward_service.crud.get_user_reward_stats",
+        ("ix_user_rewards_user_awarded",),
+        """
+        SELECT count(id), coalesce(sum(points_awarded), 0), max(awarded_at)
+        FROM user_rewards WHERE user_id = 1
+        """,
+    ),
+    (
+        "auth_service.crud.get_user_by_username",
+        ("ix_users_username",),
+        "SELECT * FROM users WHERE username = 'someone'",
+    ),
+]
+
+
+def explain(connection, query) -> str:
+    if isinstance(query, str):
+        rows = connection.execute(text(f"EXPLAIN {query}"))
+    else:
+        # render_postcompile раскрывает IN (...) в отдельные параметры
+        compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True})
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    return "\n".join(row[0] for row in rows)
+
+
+def main() -> int:
+    engine = create_engine(DATABASE_URL)
+    if engine.dialect.name != "postgresql":
+        print(f"EXPLAIN checks need PostgreSQL, got {engine.dialect.name}", file=sys.stderr)
+        return 2
+
+    failures = 0
+    with engine.connect() as connection:
+        connection.execute(text("SET enable_seqscan = off"))
+        for source, index_names, query in HOT_QUERIES:
+            plan = explain(connection, query)
+            missing = [name for name in index_names if name not in plan]
+            failures += bool(missing)
+            print(f"{'FAIL' if missing else 'OK  '} {source} -> {', '.join(index_names)}")
+            print("\n".join(f"    {line}" for line in plan.splitlines()))
+        connection.rollback()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""baseline: schema as created by create_all before migrations were introduced
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Existing databases created by Base.metadata.create_all already match this
+revision - mark them with `alembic stamp 0001`, then run `alembic upgrade head`.
+Tables and columns added to the models later (claim leases, revoked_tokens,
+award_outbox) come in 0001a.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50)),
+        sa.Column("email", sa.String(100)),
+        sa.Column("hashed_password", sa.String(255)),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "predictions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("prediction_text", sa.Text(), nullable=False),
+        sa.Column("due_date", sa.DateTime(timezone=True)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("checked_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_predictions_id", "predictions", ["id"])
+
+    op.create_table(
+        "user_rewards",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("prediction_id", sa.Integer()),
+        sa.Column("points_awarded", sa.Integer()),
+        sa.Column("award_type", sa.String(50)),
+        sa.Column("description", sa.Text()),
+        sa.Column("awarded_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("is_claimed", sa.Boolean()),
+    )
+    op.create_index("ix_user_rewards_id", "user_rewards", ["id"])
+    op.create_index("ix_user_rewards_user_id", "user_rewards", ["user_id"])
+    op.create_index("ix_user_rewards_prediction_id", "user_rewards", ["prediction_id"])
+
+    op.create_table(
+        "reward_rules",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("rule_name", sa.String(100), unique=True),
+        sa.Column("points", sa.Integer()),
+        sa.Column("description", sa.String(500)),
+        sa.Column("conditions", sa.Text()),
+        sa.Column("is_active", sa.Boolean()),
+    )
+    op.create_index("ix_reward_rules_id", "reward_rules", ["id"])
+
+    op.create_table(
+        "user_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("total_points", sa.Integer()),
+        sa.Column("available_points", sa.Integer()),
+        sa.Column("level", sa.Integer()),
+        sa.Column("streak_days", sa.Integer()),
+        sa.Column("last_activity", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_user_balances_id", "user_balances", ["id"])
+    op.create_index("ix_user_balances_user_id", "user_balances", ["user_id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("user_balances")
+    op.drop_table("reward_rules")
+    op.drop_table("user_rewards")
+    op.drop_table("predictions")
+    op.drop_table("users")
@@ -0,0 +1,70 @@
+"""claim leases on predictions, revoked_tokens, award_outbox
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18
+
+Schema added to the models after the baseline. Databases that ran a later
+create_all may already have the new tables (create_all creates missing
+tables but never alters existing ones), so each object is created only if
+it is missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    # Аренда строк воркерами проверки (claim_due_predictions)
+    prediction_columns = {column["name"] for column in inspector.get_columns("predictions")}
+    with op.batch_alter_table("predictions") as batch:
+        if "claimed_by" not in prediction_columns:
+            batch.add_column(sa.Column("claimed_by", sa.String(64), nullable=True))
+        if "claim_expires_at" not in prediction_columns:
+            batch.add_column(sa.Column("claim_expires_at", sa.DateTime(timezone=True), nullable=True))
+
+    if "revoked_tokens" not in tables:
+        op.create_table(
+            "revoked_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("jti", sa.String(64), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("revoked_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_revoked_tokens_id", "revoked_tokens", ["id"])
+        op.create_index("ix_revoked_tokens_jti", "revoked_tokens", ["jti"], unique=True)
+        op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+    if "award_outbox" not in tables:
+        op.create_table(
+            "award_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("prediction_id", sa.Integer(), nullable=False, unique=True),
+            sa.Column("prediction_text", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("last_error", sa.Text(), nullable=True),
+        )
+        op.create_index("ix_award_outbox_id", "award_outbox", ["id"])
+        # Заменяется составным (user_id, id) в 0002
+        op.create_index("ix_award_outbox_user_id", "award_outbox", ["user_id"])
+        op.create_index("ix_award_outbox_next_attempt_at", "award_outbox", ["next_attempt_at"])
+
+
+def downgrade():
+    op.drop_table("award_outbox")
+    op.drop_table("revoked_tokens")
+    with op.batch_alter_table("predictions") as batch:
+        batch.drop_column("claim_expires_at")
+        batch.drop_column("claimed_by")
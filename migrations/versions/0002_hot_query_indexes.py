@@ -0,0 +1,98 @@
+"""indexes for hot queries
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-18
+
+Each index serves a concrete query; migrations/explain_hot_queries.py checks
+that the planner actually picks it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'pending'")
+# Награды за уже награжденное предсказание (все, кроме самой ранней)
+DUPLICATE_REWARD = """
+    user_rewards.prediction_id IS NOT NULL AND user_rewards.id NOT IN (
+        SELECT MIN(id) FROM user_rewards WHERE prediction_id IS NOT NULL GROUP BY prediction_id
+    )
+"""
+
+
+def _concurrently() -> dict:
+    # На Postgres индексы строятся без блокировки записи в горячие таблицы
+    return {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+
+
+def upgrade():
+    # До уникального индекса параллельные выдачи могли наградить одно предсказание
+    # дважды - оставляем самую раннюю награду, а очки удаляемых дублей вычитаем
+    # из баланса (вычитание, а не пересчет: потраченные очки сохраняются)
+    op.execute(
+        f"""
+        UPDATE user_balances SET
+            total_points = total_points - (
+                SELECT COALESCE(SUM(points_awarded), 0) FROM user_rewards
+                WHERE user_rewards.user_id = user_balances.user_id AND {DUPLICATE_REWARD}
+            ),
+            available_points = available_points - (
+                SELECT COALESCE(SUM(points_awarded), 0) FROM user_rewards
+                WHERE user_rewards.user_id = user_balances.user_id AND {DUPLICATE_REWARD}
+            )
+        WHERE user_id IN (SELECT user_id FROM user_rewards WHERE {DUPLICATE_REWARD})
+        """
+    )
+    op.execute(f"DELETE FROM user_rewards WHERE {DUPLICATE_REWARD}")
+
+    with op.get_context().autocommit_block():
+        options = _concurrently()
+
+        # claim_due_predictions, DueScheduler.rebuild, get_pending_predictions (gateway):
+        # в индексе только ожидающие строки, он не растет с историей
+        op.create_index(
+            "ix_predictions_pending_due", "predictions", ["due_date"],
+            postgresql_where=PENDING, sqlite_where=PENDING, **options
+        )
+        # get_user_predictions(_page), get_predictions_by_user: keyset по (created_at, id)
+        op.create_index(
+            "ix_predictions_user_created_id", "predictions", ["user_id", "created_at", "id"], **options
+        )
+        # get_user_stats (gateway): счетчики по статусам пользователя
+        op.create_index("ix_predictions_user_status", "predictions", ["user_id", "status"], **options)
+
+        # get_user_reward_stats: count/sum/max без обращения к таблице
+        op.create_index(
+            "ix_user_rewards_user_awarded", "user_rewards", ["user_id", "awarded_at"],
+            postgresql_include=["points_awarded"], **options
+        )
+        # create_user_reward, award_predictions_bulk: ON CONFLICT (prediction_id) DO NOTHING
+        op.drop_index("ix_user_rewards_prediction_id", table_name="user_rewards", **options)
+        op.create_index(
+            "ix_user_rewards_prediction_id", "user_rewards", ["prediction_id"], unique=True, **options
+        )
+        # get_outbox_batch: NOT EXISTS по (user_id, id < ...)
+        op.create_index("ix_award_outbox_user_id_id", "award_outbox", ["user_id", "id"], **options)
+
+        # Одиночные индексы по user_id перекрыты составными выше
+        op.drop_index("ix_user_rewards_user_id", table_name="user_rewards", **options)
+        op.drop_index("ix_award_outbox_user_id", table_name="award_outbox", **options)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        options = _concurrently()
+        op.create_index("ix_award_outbox_user_id", "award_outbox", ["user_id"], **options)
+        op.create_index("ix_user_rewards_user_id", "user_rewards", ["user_id"], **options)
+        op.drop_index("ix_award_outbox_user_id_id", table_name="award_outbox", **options)
+        op.drop_index("ix_user_rewards_prediction_id", table_name="user_rewards", **options)
+        op.create_index("ix_user_rewards_prediction_id", "user_rewards", ["prediction_id"], **options)
+        op.drop_index("ix_user_rewards_user_awarded", table_name="user_rewards", **options)
+        op.drop_index("ix_predictions_user_status", table_name="predictions", **options)
+        op.drop_index("ix_predictions_user_created_id", table_name="predictions", **options)
+        op.drop_index("ix_predictions_pending_due", table_name="predictions", **options)
@@ -0,0 +1,126 @@
+"""full-text search over predictions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Postgres: tsvector column + GIN index, maintained by a trigger on every
+INSERT/UPDATE. The column is added nullable and backfilled in batches, and
+the index is built CONCURRENTLY, so predictions is never rewritten under an
+ACCESS EXCLUSIVE lock. SQLite (local runs): external-content FTS5 table kept
+in sync by triggers.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Конфигурация без стемминга: тексты предсказаний на разных языках
+SEARCH_CONFIG = "simple"
+# Строк на одну транзакцию заполнения search_vector
+BACKFILL_BATCH_SIZE = 5000
+
+POSTGRES_TRIGGER = [
+    f"""
+    CREATE FUNCTION predictions_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.prediction_text, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER predictions_search_vector_update
+    BEFORE INSERT OR UPDATE OF prediction_text ON predictions
+    FOR EACH ROW EXECUTE FUNCTION predictions_search_vector_update()
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER predictions_fts_insert AFTER INSERT ON predictions BEGIN
+        INSERT INTO predictions_fts(rowid, prediction_text) VALUES (new.id, new.prediction_text);
+    END
+    """,
+    """
+    CREATE TRIGGER predictions_fts_delete AFTER DELETE ON predictions BEGIN
+        INSERT INTO predictions_fts(predictions_fts, rowid, prediction_text)
+        VALUES ('delete', old.id, old.prediction_text);
+    END
+    """,
+    """
+    CREATE TRIGGER predictions_fts_update AFTER UPDATE OF prediction_text ON predictions BEGIN
+        INSERT INTO predictions_fts(predictions_fts, rowid, prediction_text)
+        VALUES ('delete', old.id, old.prediction_text);
+        INSERT INTO predictions_fts(rowid, prediction_text) VALUES (new.id, new.prediction_text);
+    END
+    """,
+]
+
+
+def upgrade():
+    op.add_column(
+        "predictions",
+        sa.Column("is_public", sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Колонка без выражения по умолчанию добавляется без перезаписи таблицы;
+        # новые и измененные строки заполняет триггер
+        op.execute("ALTER TABLE predictions ADD COLUMN search_vector tsvector")
+        for statement in POSTGRES_TRIGGER:
+            op.execute(statement)
+
+        with op.get_context().autocommit_block():
+            _backfill_search_vector()
+            op.create_index(
+                "ix_predictions_search_vector", "predictions", ["search_vector"],
+                postgresql_using="gin", postgresql_concurrently=True
+            )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE predictions_fts USING fts5("
+            "prediction_text, content='predictions', content_rowid='id')"
+        )
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(trigger)
+        op.execute("INSERT INTO predictions_fts(predictions_fts) VALUES ('rebuild')")
+
+
+def _backfill_search_vector():
+    # Каждая пачка - отдельная короткая транзакция (autocommit): блокируются
+    # только строки пачки, и запись в таблицу не останавливается
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM predictions")).scalar()
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                f"UPDATE predictions SET search_vector = "
+                f"to_tsvector('{SEARCH_CONFIG}', coalesce(prediction_text, '')) "
+                "WHERE id > :start AND id <= :end AND search_vector IS NULL"
+            ),
+            {"start": start, "end": start + BACKFILL_BATCH_SIZE}
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                "ix_predictions_search_vector", table_name="predictions", postgresql_concurrently=True
+            )
+        op.execute("DROP TRIGGER IF EXISTS predictions_search_vector_update ON predictions")
+        op.execute("DROP FUNCTION IF EXISTS predictions_search_vector_update()")
+        op.drop_column("predictions", "search_vector")
+    elif dialect == "sqlite":
+        for name in ("predictions_fts_insert", "predictions_fts_delete", "predictions_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS predictions_fts")
+
+    op.drop_column("predictions", "is_public")
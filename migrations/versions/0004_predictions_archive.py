@@ -0,0 +1,49 @@
+"""cold table for resolved predictions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Filled in batches by prediction_service/archive.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+RESOLVED = sa.text("status IN ('fulfilled', 'failed')")
+
+
+def upgrade():
+    op.create_table(
+        "predictions_archive",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("prediction_text", sa.Text(), nullable=False),
+        sa.Column("due_date", sa.DateTime(timezone=True)),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("checked_at", sa.DateTime(timezone=True)),
+        sa.Column("is_public", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_predictions_archive_user_created_id", "predictions_archive", ["user_id", "created_at", "id"]
+    )
+
+    # Выборка кандидатов на архивацию по времени проверки
+    with op.get_context().autocommit_block():
+        options = {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+        op.create_index(
+            "ix_predictions_resolved_checked", "predictions", ["checked_at"],
+            postgresql_where=RESOLVED, sqlite_where=RESOLVED, **options
+        )
+
+
+def downgrade():
+    op.drop_index("ix_predictions_resolved_checked", table_name="predictions")
+    op.drop_table("predictions_archive")
@@ -0,0 +1,27 @@
+"""index revoked_tokens.revoked_at
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+RevocationList.refresh reads new revocations by a revoked_at watermark.
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        options = {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+        op.create_index("ix_revoked_tokens_revoked_at", "revoked_tokens", ["revoked_at"], **options)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        options = {"postgresql_concurrently": True} if op.get_bind().dialect.name == "postgresql" else {}
+        op.drop_index("ix_revoked_tokens_revoked_at", table_name="revoked_tokens", **options)
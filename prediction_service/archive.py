@@ -0,0 +1,92 @@
+# prediction_service/archive.py
+# Перенос проверенных предсказаний старше N дней в predictions_archive:
+#   python -m prediction_service.archive --days 30 --batch-size 5000
+# Каждая пачка переносится одной транзакцией (INSERT ... SELECT + DELETE),
+# поэтому строка всегда видна ровно в одной из таблиц. В горячей таблице
+# остаются ожидающие и недавно проверенные предсказания; история читается
+# через crud.get_user_predictions(_page) из обеих таблиц, чтение/удаление/смена
+# статуса по id тоже смотрят в архив. Полнотекстовый поиск архив не покрывает.
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("PREDICTION_ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("PREDICTION_ARCHIVE_BATCH_SIZE", "5000"))
+
+RESOLVED_STATUSES = ("fulfilled", "failed")
+ARCHIVED_COLUMNS = ("id", "user_id", "prediction_text", "due_date", "status", "created_at", "checked_at", "is_public")
+
+
+def archive_candidates_query(cutoff: datetime, batch_size: int):
+    hot = models.Prediction.__table__
+    # SKIP LOCKED: строки, занятые воркерами или другим запуском, берем в следующий раз
+    return select(hot.c.id).where(
+        hot.c.status.in_(RESOLVED_STATUSES),
+        hot.c.checked_at < cutoff
+    ).order_by(hot.c.checked_at).limit(batch_size).with_for_update(skip_locked=True)
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Переносит одну пачку; возвращает число перенесенных строк"""
+    hot = models.Prediction.__table__
+    cold = models.PredictionArchive.__table__
+
+    ids = db.execute(archive_candidates_query(cutoff, batch_size)).scalars().all()
+    if not ids:
+        db.rollback()
+        return 0
+
+    db.execute(insert(cold).from_select(
+        list(ARCHIVED_COLUMNS),
+        select(*(hot.c[name] for name in ARCHIVED_COLUMNS)).where(hot.c.id.in_(ids))
+    ))
+    db.execute(delete(hot).where(hot.c.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def archive_resolved(days: int, batch_size: int, pause: float = 0.0) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            moved = archive_batch(db, cutoff, batch_size)
+            total += moved
+            if moved:
+                logger.info(f"Archived {moved} predictions ({total} total)")
+            if moved < batch_size:
+                break
+            # Пауза между пачками снижает нагрузку на реплики и autovacuum
+            if pause:
+                time.sleep(pause)
+    finally:
+        db.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move resolved predictions into predictions_archive")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    total = archive_resolved(args.days, args.batch_size, args.pause)
+    print(f"done: archived={total} older_than_days={args.days}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
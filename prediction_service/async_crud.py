@@ -0,0 +1,141 @@
+# prediction_service/async_crud.py
+# Асинхронные версии функций crud.py для маршрутов в режиме PREDICTION_ASYNC_DB.
+# Запросы строятся теми же функциями, что и в синхронном crud; воркеры
+# проверки и relay наград остаются синхронными процессами. Redis (кэш и
+# расписание) вызывается через redis.asyncio клиент, заданный в lifespan.
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+from .cache import prediction_cache
+from .scheduler import asafe_schedule, asafe_schedule_many, asafe_unschedule
+from shared.pagination import decode_cursor
+
+
+async def get_prediction(db: AsyncSession, prediction_id: int) -> Optional[models.Prediction]:
+    return await db.get(models.Prediction, prediction_id)
+
+
+async def get_archived_prediction(db: AsyncSession, prediction_id: int) -> Optional[models.PredictionArchive]:
+    return await db.get(models.PredictionArchive, prediction_id)
+
+
+async def get_prediction_or_archived(db: AsyncSession, prediction_id: int):
+    return await get_prediction(db, prediction_id) or await get_archived_prediction(db, prediction_id)
+
+
+async def get_user_predictions(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100) -> List:
+    result = await db.execute(crud.user_history_query(user_id, limit, skip=skip))
+    return result.all()
+
+
+async def get_user_predictions_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    before = decode_cursor(cursor) if cursor else None
+    result = await db.execute(crud.user_history_query(user_id, limit + 1, before=before))
+    return crud.history_page(result.all(), limit)
+
+
+async def get_prediction_cached(db: AsyncSession, prediction_id: int) -> Optional[dict]:
+    async def load():
+        prediction = await get_prediction_or_archived(db, prediction_id)
+        return crud.prediction_data(prediction) if prediction else None
+
+    return await prediction_cache.aget_or_load("prediction", prediction_cache.prediction_key(prediction_id), load)
+
+
+async def get_user_first_page_cached(db: AsyncSession, user_id: int, limit: int) -> Tuple[List[dict], Optional[str]]:
+    async def load():
+        return crud.first_page_data(
+            *await get_user_predictions_page(db, user_id, limit=crud.CACHED_FIRST_PAGE_SIZE)
+        )
+
+    page = await prediction_cache.aget_or_load("first_page", prediction_cache.first_page_key(user_id), load)
+    return crud.slice_first_page(page, limit)
+
+
+async def search_predictions(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    statement = crud.search_statement(db.bind.dialect.name, user_id, query, limit, cursor)
+    if statement is None:
+        return [], None
+    result = await db.execute(statement)
+    return crud.search_page(result.all(), limit)
+
+
+async def create_prediction(db: AsyncSession, prediction: schemas.PredictionCreate, user_id: int) -> models.Prediction:
+    db_prediction = models.Prediction(**prediction.model_dump(), user_id=user_id)
+    db.add(db_prediction)
+    await db.commit()
+    await db.refresh(db_prediction)
+    await asafe_schedule(db_prediction.id, db_prediction.due_date)
+    await prediction_cache.ainvalidate(user_ids=[user_id])
+    return db_prediction
+
+
+async def create_predictions_bulk(
+    db: AsyncSession,
+    predictions: Sequence[schemas.PredictionCreate],
+    user_id: int
+) -> List:
+    if not predictions:
+        return []
+    table = models.Prediction.__table__
+    result = await db.execute(
+        insert(table).returning(*table.c, sort_by_parameter_order=True),
+        [{**prediction.model_dump(), "user_id": user_id, "status": "pending"} for prediction in predictions]
+    )
+    created = result.all()
+    await db.commit()
+    await asafe_schedule_many((row.id, row.due_date) for row in created)
+    await prediction_cache.ainvalidate(user_ids=[user_id])
+    return created
+
+
+async def update_prediction_status(
+    db: AsyncSession,
+    prediction_id: int,
+    status: str
+):
+    db_prediction = await get_prediction(db, prediction_id)
+    if db_prediction is None and status == "pending" and await get_archived_prediction(db, prediction_id):
+        for statement in crud.restore_statements(prediction_id):
+            await db.execute(statement)
+        db_prediction = await get_prediction(db, prediction_id)
+    if db_prediction is None:
+        db_prediction = await get_archived_prediction(db, prediction_id)
+    if db_prediction:
+        db_prediction.status = status
+        db_prediction.checked_at = datetime.utcnow()
+        await db.commit()
+        await db.refresh(db_prediction)
+        if status == "pending":
+            await asafe_schedule(prediction_id, db_prediction.due_date)
+        else:
+            await asafe_unschedule(prediction_id)
+        await prediction_cache.ainvalidate([(prediction_id, db_prediction.user_id)])
+    return db_prediction
+
+
+async def delete_prediction(db: AsyncSession, prediction_id: int) -> bool:
+    db_prediction = await get_prediction_or_archived(db, prediction_id)
+    if db_prediction:
+        user_id = db_prediction.user_id
+        await db.delete(db_prediction)
+        await db.commit()
+        await asafe_unschedule(prediction_id)
+        await prediction_cache.ainvalidate([(prediction_id, user_id)])
+        return True
+    return False
@@ -0,0 +1,132 @@
+# prediction_service/async_routes.py
+# Те же маршруты, что в main.py, на асинхронной сессии (PREDICTION_ASYNC_DB=true):
+# обработчики, пользователь из токена, кэш и расписание в Redis работают
+# в event loop без пула потоков
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import async_crud, crud, schemas
+from .database import get_async_db
+from auth_service.dependencies import async_current_user
+from auth_service.schemas import UserResponse
+from shared.pagination import InvalidCursor
+
+router = APIRouter()
+
+# Пользователь читается в той же AsyncSession, что и данные маршрута
+get_current_user = async_current_user(get_async_db)
+
+
+@router.post("/predictions/", response_model=schemas.PredictionResponse)
+async def create_prediction(
+        prediction: schemas.PredictionCreate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    return await async_crud.create_prediction(db=db, prediction=prediction, user_id=current_user.id)
+
+
+@router.post("/predictions/batch", response_model=schemas.PredictionBatchResponse)
+async def create_predictions_batch(
+        batch: schemas.PredictionBatchCreate,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    """Создание пачки предсказаний одним INSERT; невалидные элементы возвращаются в errors"""
+    valid, errors = schemas.validate_batch_items(batch)
+    created = await async_crud.create_predictions_bulk(db, valid, user_id=current_user.id)
+    return schemas.PredictionBatchResponse(
+        created=[schemas.PredictionResponse.model_validate(row) for row in created],
+        errors=errors
+    )
+
+
+@router.get("/predictions/", response_model=list[schemas.PredictionResponse])
+async def read_predictions(
+        response: Response,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    # skip > 0 без курсора - старый режим offset для совместимости
+    if skip and not cursor:
+        return await async_crud.get_user_predictions(db, user_id=current_user.id, skip=skip, limit=limit)
+
+    if not cursor and limit <= crud.CACHED_FIRST_PAGE_SIZE:
+        predictions, next_cursor = await async_crud.get_user_first_page_cached(db, current_user.id, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return predictions
+
+    try:
+        predictions, next_cursor = await async_crud.get_user_predictions_page(
+            db, user_id=current_user.id, limit=limit, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return predictions
+
+
+@router.get("/predictions/search", response_model=list[schemas.PredictionSearchResult])
+async def search_predictions(
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    """Полнотекстовый поиск по своим и публичным предсказаниям (без архива)"""
+    try:
+        results, next_cursor = await async_crud.search_predictions(
+            db, user_id=current_user.id, query=q, limit=limit, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except crud.SearchNotSupported:
+        raise HTTPException(status_code=501, detail="Full-text search is not available")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [schemas.PredictionSearchResult.model_validate(row) for row in results]
+
+
+@router.get("/predictions/{prediction_id}", response_model=schemas.PredictionResponse)
+async def read_prediction(
+        prediction_id: int,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    prediction = await async_crud.get_prediction_cached(db, prediction_id=prediction_id)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+
+    if prediction["user_id"] != current_user.id and not prediction["is_public"]:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    return prediction
+
+
+@router.delete("/predictions/{prediction_id}")
+async def delete_prediction(
+        prediction_id: int,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    db_prediction = await async_crud.get_prediction_or_archived(db, prediction_id=prediction_id)
+    if db_prediction is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+
+    if db_prediction.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    success = await async_crud.delete_prediction(db, prediction_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+
+    return {"message": "Prediction deleted successfully"}
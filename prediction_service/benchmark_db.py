@@ -0,0 +1,96 @@
+# prediction_service/benchmark_db.py
+# Сравнение синхронного (пул потоков) и асинхронного (PREDICTION_ASYNC_DB=true)
+# режимов сервиса при высокой конкурентности. Запросы идут в само ASGI
+# приложение через httpx, поэтому в замер входят маршрут, проверка токена,
+# get_current_user, кэш и Redis:
+#   python -m prediction_service.benchmark_db --users alice,bob --requests 5000 --concurrency 200
+# Пользователи должны существовать в БД. По умолчанию читается вторая страница
+# (skip) - она идет в БД; --path "/predictions/?limit=20" измеряет кэш первой страницы.
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from jose import jwt
+
+from shared.config import JWT_ALGORITHM, JWT_SECRET
+
+
+def _report(mode: str, latencies: List[float], errors: int, elapsed: float):
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{mode}: requests={len(latencies)} errors={errors} rps={len(latencies) / elapsed:.0f} "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+    )
+
+
+def _token(username: str) -> str:
+    expire = datetime.utcnow() + timedelta(hours=1)
+    return jwt.encode({"sub": username, "exp": expire}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+async def run(mode: str, usernames: List[str], requests: int, concurrency: int, path: str):
+    # Режим читается при импорте приложения - один режим на процесс
+    os.environ["PREDICTION_ASYNC_DB"] = "true" if mode == "async" else "false"
+    from .main import app
+    # Модули сервиса включают INFO-логи, а httpx пишет строку на каждый запрос
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    headers = [{"Authorization": f"Bearer {_token(username)}"} for username in usernames]
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def request(client: httpx.AsyncClient, i: int) -> float:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers[i % len(headers)])
+            if response.status_code != 200:
+                errors += 1
+            return time.perf_counter() - started
+
+    # ASGITransport не выполняет lifespan - запускаем его сами
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            # Прогрев: пул соединений и кэш пользователей
+            await asyncio.gather(*(request(client, i) for i in range(min(requests, concurrency))))
+            errors = 0
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(request(client, i) for i in range(requests)))
+            elapsed = time.perf_counter() - started
+    _report(mode, list(latencies), errors, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async prediction routes under concurrency")
+    parser.add_argument("--users", default="alice", help="comma-separated usernames")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--path", default="/predictions/?skip=20&limit=20")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        # Каждый режим - в отдельном процессе со своим приложением и пулами
+        for mode in ("sync", "async"):
+            subprocess.run(
+                [sys.executable, "-m", "prediction_service.benchmark_db", *sys.argv[1:], "--mode", mode],
+                check=True
+            )
+        return
+
+    usernames = args.users.split(",")
+    asyncio.run(run(args.mode, usernames, args.requests, args.concurrency, args.path))
+
+
+if __name__ == "__main__":
+    main()
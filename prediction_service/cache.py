@@ -0,0 +1,365 @@
+# prediction_service/cache.py
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+
+from .redis_client import redis_client
+from shared.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "prediction_cache_requests_total", "Prediction cache lookups by layer that answered",
+    ("cache", "result")
+)
+
+
+class LocalCache:
+    """L1: LRU с коротким TTL в памяти процесса"""
+
+    # Каждое удаление ключа повышает его версию: загрузка, начатая до удаления,
+    # не может положить в кэш прочитанное до записи значение
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._clock = 0
+        # Версия ключей, которых нет в _versions (растет при очистке словаря)
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, self._floor)
+
+    def put(self, key: str, value, version: Optional[int] = None):
+        """Кладет значение; с version - только если ключ с тех пор не удаляли"""
+        with self._lock:
+            if version is not None and self._versions.get(key, self._floor) != version:
+                return
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            if len(self._versions) > self.max_size:
+                self._versions.clear()
+                self._floor = self._clock + 1
+            self._clock += 1
+            for key in keys:
+                self._items.pop(key, None)
+                self._versions[key] = self._clock
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class PredictionCache:
+    """Read-through кэш чтений: L1 в процессе, L2 в Redis, инвалидация при записи"""
+
+    # L1 других процессов не знает об инвалидации - его TTL ограничивает
+    # устаревание парой секунд; L2 сбрасывается точно по ключам.
+    # При промахе загрузку выполняет один процесс (SET NX lock), остальные
+    # недолго ждут появления значения, а не идут в БД все разом.
+    # Инвалидация повышает поколение ключа ({key}:gen). Загрузка читает его до
+    # запроса в БД и записывает результат, только если поколение не сменилось:
+    # иначе значение, прочитанное до параллельной записи, вернулось бы в кэш на весь TTL.
+
+    def __init__(
+            self,
+            client: redis.Redis,
+            ttl: float = 60.0,
+            l1_ttl: float = 2.0,
+            l1_size: int = 10000,
+            lock_seconds: float = 5.0,
+            lock_wait: float = 0.5
+    ):
+        self.client = client
+        # redis.asyncio клиент для a*-методов, задается при старте в async режиме
+        self.async_client = None
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.lock_wait = lock_wait
+        self.local = LocalCache(l1_size, l1_ttl)
+        self.hits = 0
+        self.lookups = 0
+        # Внутри процесса одинаковые промахи ждут одну загрузку
+        self._loading: dict = {}
+        self._loading_lock = threading.Lock()
+        self._async_loading: dict = {}
+
+    @staticmethod
+    def prediction_key(prediction_id: int) -> str:
+        return f"cache:prediction:{prediction_id}"
+
+    @staticmethod
+    def first_page_key(user_id: int) -> str:
+        return f"cache:predictions:user:{user_id}:first"
+
+    def get_or_load(self, cache: str, key: str, loader: Callable):
+        """Значение из L1/L2 либо результат loader() (None не кэшируется)"""
+        self.lookups += 1
+        value = self.local.get(key)
+        if value is not None:
+            return self._hit(cache, "l1_hit", value)
+
+        value = self._get_remote(key)
+        if value is not None:
+            self.local.put(key, value)
+            return self._hit(cache, "l2_hit", value)
+
+        CACHE_REQUESTS.inc(cache=cache, result="miss")
+        with self._key_lock(key):
+            # Пока ждали блокировку, значение мог положить соседний поток
+            value = self.local.get(key)
+            if value is not None:
+                return value
+            return self._load(key, loader)
+
+    def _hit(self, cache: str, result: str, value):
+        self.hits += 1
+        CACHE_REQUESTS.inc(cache=cache, result=result)
+        return value
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._loading_lock:
+            lock = self._loading.get(key)
+            if lock is None:
+                if len(self._loading) > 10000:
+                    self._loading.clear()
+                lock = self._loading[key] = threading.Lock()
+            return lock
+
+    def _load(self, key: str, loader: Callable):
+        version = self.local.version(key)
+        locked, generation = self._try_lock(key)
+        if locked is None:
+            # Redis недоступен - работаем напрямую с БД
+            return self._store(key, loader(), version)
+
+        if not locked:
+            # Загрузку уже выполняет другой процесс - коротко ждем результат
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(0.02)
+                value = self._get_remote(key)
+                if value is not None:
+                    self.local.put(key, value, version)
+                    return value
+            return self._store(key, loader(), version)
+
+        try:
+            return self._store(key, loader(), version, remote=True, generation=generation)
+        finally:
+            self._unlock(key)
+
+    async def aget_or_load(self, cache: str, key: str, loader: Callable):
+        """get_or_load для async маршрутов: loader - корутина, Redis - через async_client"""
+        self.lookups += 1
+        value = self.local.get(key)
+        if value is not None:
+            return self._hit(cache, "l1_hit", value)
+
+        value = await self._aget_remote(key)
+        if value is not None:
+            self.local.put(key, value)
+            return self._hit(cache, "l2_hit", value)
+
+        CACHE_REQUESTS.inc(cache=cache, result="miss")
+        lock = self._async_loading.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                value = self.local.get(key)
+                if value is not None:
+                    return value
+                return await self._aload(key, loader)
+        finally:
+            if not lock.locked():
+                self._async_loading.pop(key, None)
+
+    async def _aload(self, key: str, loader: Callable):
+        version = self.local.version(key)
+        locked, generation = await self._atry_lock(key)
+        if locked is None:
+            return self._store(key, await loader(), version)
+
+        if not locked:
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                value = await self._aget_remote(key)
+                if value is not None:
+                    self.local.put(key, value, version)
+                    return value
+            return self._store(key, await loader(), version)
+
+        try:
+            value = self._store(key, await loader(), version)
+            if value is not None:
+                await self._astore_remote(key, value, generation)
+            return value
+        finally:
+            await self._aunlock(key)
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:gen"
+
+    def _queue_lock(self, pipeline, key: str):
+        # Команды одинаковы для pipeline redis и redis.asyncio
+        return pipeline.set(
+            f"{key}:lock", "1", nx=True, px=int(self.lock_seconds * 1000)
+        ).get(self._generation_key(key))
+
+    def _try_lock(self, key: str) -> Tuple[Optional[bool], Optional[bytes]]:
+        """Блокировка загрузки ключа между процессами и текущее поколение ключа"""
+        # (None, None) - Redis недоступен
+        try:
+            locked, generation = self._queue_lock(self.client.pipeline(transaction=False), key).execute()
+        except redis.RedisError:
+            return None, None
+        return bool(locked), generation
+
+    async def _atry_lock(self, key: str) -> Tuple[Optional[bool], Optional[bytes]]:
+        try:
+            locked, generation = await self._queue_lock(self.async_client.pipeline(transaction=False), key).execute()
+        except redis.RedisError:
+            return None, None
+        return bool(locked), generation
+
+    def _unlock(self, key: str):
+        try:
+            self.client.delete(f"{key}:lock")
+        except redis.RedisError:
+            pass
+
+    async def _aunlock(self, key: str):
+        try:
+            await self.async_client.delete(f"{key}:lock")
+        except redis.RedisError:
+            pass
+
+    def _store(self, key: str, value, version: int, remote: bool = False, generation: Optional[bytes] = None):
+        """Кладет загруженное значение в L1 и (remote) в L2, если ключ не инвалидировали"""
+        if value is None:
+            return None
+        self.local.put(key, value, version)
+        if remote:
+            self._store_remote(key, value, generation)
+        return value
+
+    def _store_remote(self, key: str, value, generation: Optional[bytes]):
+        generation_key = self._generation_key(key)
+        try:
+            with self.client.pipeline() as pipeline:
+                # WATCH: если инвалидация успеет между проверкой и SET, EXEC не выполнится
+                pipeline.watch(generation_key)
+                if pipeline.get(generation_key) != generation:
+                    return
+                pipeline.multi()
+                pipeline.set(key, json.dumps(value), px=int(self.ttl * 1000))
+                pipeline.execute()
+        except redis.RedisError:
+            # В том числе WatchError - ключ инвалидировали во время записи
+            pass
+
+    async def _astore_remote(self, key: str, value, generation: Optional[bytes]):
+        generation_key = self._generation_key(key)
+        try:
+            async with self.async_client.pipeline() as pipeline:
+                await pipeline.watch(generation_key)
+                if await pipeline.get(generation_key) != generation:
+                    return
+                pipeline.multi()
+                pipeline.set(key, json.dumps(value), px=int(self.ttl * 1000))
+                await pipeline.execute()
+        except redis.RedisError:
+            pass
+
+    def _get_remote(self, key: str):
+        try:
+            raw = self.client.get(key)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def _aget_remote(self, key: str):
+        try:
+            raw = await self.async_client.get(key)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _invalidation_keys(self, predictions: Iterable[Tuple[int, int]], user_ids: Iterable[int]) -> set:
+        """Записи предсказаний (id, user_id) и первые страницы их владельцев"""
+        keys = set()
+        for prediction_id, user_id in predictions:
+            keys.add(self.prediction_key(prediction_id))
+            keys.add(self.first_page_key(user_id))
+        keys.update(self.first_page_key(user_id) for user_id in user_ids)
+        return keys
+
+    def _queue_invalidation(self, pipeline, keys: set):
+        for key in keys:
+            # Поколение живет дольше любой загрузки; после истечения GET вернет
+            # None, и начатые до этого загрузки тоже не пройдут сравнение
+            pipeline.incr(self._generation_key(key))
+            pipeline.pexpire(self._generation_key(key), int(self.ttl * 1000))
+        return pipeline.delete(*keys)
+
+    def invalidate(self, predictions: Iterable[Tuple[int, int]] = (), user_ids: Iterable[int] = ()):
+        """Сбрасывает записи предсказаний (id, user_id) и первые страницы их владельцев"""
+        keys = self._invalidation_keys(predictions, user_ids)
+        if not keys:
+            return
+        self.local.delete(*keys)
+        try:
+            self._queue_invalidation(self.client.pipeline(transaction=False), keys).execute()
+        except redis.RedisError:
+            # Запись останется до истечения TTL
+            pass
+
+    async def ainvalidate(self, predictions: Iterable[Tuple[int, int]] = (), user_ids: Iterable[int] = ()):
+        keys = self._invalidation_keys(predictions, user_ids)
+        if not keys:
+            return
+        self.local.delete(*keys)
+        try:
+            await self._queue_invalidation(self.async_client.pipeline(transaction=False), keys).execute()
+        except redis.RedisError:
+            pass
+
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+prediction_cache = PredictionCache(
+    redis_client,
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "60")),
+    l1_ttl=float(os.getenv("PREDICTION_CACHE_L1_TTL", "2")),
+    l1_size=int(os.getenv("PREDICTION_CACHE_L1_SIZE", "10000"))
+)
+
+REGISTRY.callback(
+    "prediction_cache_hit_ratio", "Prediction cache hit ratio (L1 + L2) since start",
+    prediction_cache.hit_rate
+)
@@ -1,18 +1,189 @@
 # prediction_service/crud.py
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, text, union_all, update
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
 from . import models, schemas
-from typing import List, Optional
-from datetime import datetime
+from .cache import prediction_cache
+from .scheduler import safe_schedule, safe_schedule_many, safe_unschedule
+from shared.pagination import decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
+from typing import List, Optional, Sequence, Tuple
+from datetime import datetime, timedelta
 
 
 def get_prediction(db: Session, prediction_id: int) -> Optional[models.Prediction]:
     return db.query(models.Prediction).filter(models.Prediction.id == prediction_id).first()
 
 
-def get_user_predictions(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Prediction]:
-    return db.query(models.Prediction).filter(
-        models.Prediction.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def get_archived_prediction(db: Session, prediction_id: int) -> Optional[models.PredictionArchive]:
+    return db.query(models.PredictionArchive).filter(models.PredictionArchive.id == prediction_id).first()
+
+
+def get_prediction_or_archived(db: Session, prediction_id: int):
+    """Предсказание из горячей таблицы, а если его уже перенесли - из архива"""
+    return get_prediction(db, prediction_id) or get_archived_prediction(db, prediction_id)
+
+
+# Колонки, общие для горячей таблицы и архива
+_HISTORY_COLUMNS = ("id", "user_id", "prediction_text", "due_date", "status", "created_at", "checked_at", "is_public")
+
+
+def user_history_query(user_id: int, limit: int, skip: int = 0, before: Optional[Tuple[datetime, int]] = None):
+    # UNION ALL горячей таблицы и архива. Условие и LIMIT опускаются в каждую
+    # ветку, поэтому обе читают только свой индекс (user_id, created_at, id)
+    branches = []
+    for table in (models.Prediction.__table__, models.PredictionArchive.__table__):
+        branch = select(*(table.c[name] for name in _HISTORY_COLUMNS)).where(table.c.user_id == user_id)
+        if before is not None:
+            created_at, row_id = before
+            branch = branch.where(or_(
+                table.c.created_at < created_at,
+                and_(table.c.created_at == created_at, table.c.id < row_id)
+            ))
+        branch = branch.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(skip + limit)
+        branches.append(select(branch.subquery()))
+
+    history = union_all(*branches).subquery()
+    return select(history).order_by(history.c.created_at.desc(), history.c.id.desc()).offset(skip).limit(limit)
+
+
+def get_user_predictions(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List:
+    # Режим совместимости: стоимость растет с глубиной страницы
+    return db.execute(user_history_query(user_id, limit, skip=skip)).all()
+
+
+def get_user_predictions_page(
+    db: Session,
+    user_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    # Keyset по индексам (user_id, created_at, id) обеих таблиц: любая страница стоит одинаково
+    before = decode_cursor(cursor) if cursor else None
+    # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+    return history_page(db.execute(user_history_query(user_id, limit + 1, before=before)).all(), limit)
+
+
+def history_page(rows, limit: int) -> Tuple[List, Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+# Кэшируется первая страница этого размера; запросы с меньшим limit берут ее срез
+CACHED_FIRST_PAGE_SIZE = 100
+
+
+def prediction_data(prediction) -> dict:
+    return schemas.PredictionResponse.model_validate(prediction).model_dump(mode="json")
+
+
+def get_prediction_cached(db: Session, prediction_id: int) -> Optional[dict]:
+    """Предсказание в виде данных ответа через read-through кэш"""
+    def load():
+        prediction = get_prediction_or_archived(db, prediction_id)
+        return prediction_data(prediction) if prediction else None
+
+    return prediction_cache.get_or_load("prediction", prediction_cache.prediction_key(prediction_id), load)
+
+
+def get_user_first_page_cached(db: Session, user_id: int, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Первая страница ленты пользователя через кэш: (данные ответа, курсор следующей)"""
+    def load():
+        return first_page_data(*get_user_predictions_page(db, user_id, limit=CACHED_FIRST_PAGE_SIZE))
+
+    page = prediction_cache.get_or_load("first_page", prediction_cache.first_page_key(user_id), load)
+    return slice_first_page(page, limit)
+
+
+def first_page_data(predictions, next_cursor: Optional[str]) -> dict:
+    return {
+        "items": [prediction_data(prediction) for prediction in predictions],
+        # Курсор после каждой строки - для срезов с меньшим limit
+        "cursors": [encode_cursor(prediction.created_at, prediction.id) for prediction in predictions],
+        "next_cursor": next_cursor
+    }
+
+
+def slice_first_page(page: dict, limit: int) -> Tuple[List[dict], Optional[str]]:
+    items = page["items"][:limit]
+    if len(page["items"]) > limit:
+        return items, page["cursors"][limit - 1]
+    return items, page["next_cursor"]
+
+
+# Поиск идет по индексу (GIN по tsvector в Postgres, FTS5 в SQLite, миграция 0003);
+# конфигурация 'simple' должна совпадать с триггером, заполняющим search_vector.
+# rank - чем больше, тем релевантнее; выдача упорядочена по (rank, id) по убыванию
+# Ищется только горячая таблица: архив (проверенные старше ARCHIVE_AFTER_DAYS) не индексируется
+# и в выдачу не попадает - поиск рассчитан на актуальные предсказания
+_SEARCH_COLUMNS = "p.id, p.user_id, p.prediction_text, p.due_date, p.status, p.created_at, p.checked_at, p.is_public"
+_SEARCH_SQL = {
+    "postgresql": """
+        SELECT * FROM (
+            SELECT {columns}, ts_rank_cd(p.search_vector, q.query) AS rank
+            FROM predictions p, websearch_to_tsquery('simple', :query) AS q(query)
+            WHERE p.search_vector @@ q.query AND (p.user_id = :user_id OR p.is_public)
+        ) found
+    """,
+    "sqlite": """
+        SELECT * FROM (
+            SELECT {columns}, -bm25(predictions_fts) AS rank
+            FROM predictions_fts JOIN predictions p ON p.id = predictions_fts.rowid
+            WHERE predictions_fts MATCH :query AND (p.user_id = :user_id OR p.is_public)
+        ) found
+    """,
+}
+
+
+def _fts5_query(query: str) -> str:
+    # Каждое слово - отдельная фраза в кавычках: спецсимволы FTS5 не ломают запрос
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SearchNotSupported(Exception):
+    """Полнотекстовый индекс для этой БД не создается (см. миграцию 0003)"""
+
+
+def search_statement(dialect: str, user_id: int, query: str, limit: int, cursor: Optional[str] = None):
+    """Запрос поиска для диалекта (None - пустой запрос, искать нечего)"""
+    if dialect not in _SEARCH_SQL:
+        raise SearchNotSupported(f"Full-text search is not supported on {dialect}")
+    if not query.split():
+        return None
+
+    params = {
+        "query": _fts5_query(query) if dialect == "sqlite" else query,
+        "user_id": user_id,
+        "limit": limit + 1
+    }
+    sql = _SEARCH_SQL[dialect].format(columns=_SEARCH_COLUMNS)
+    if cursor:
+        params["rank"], params["row_id"] = decode_rank_cursor(cursor)
+        sql += " WHERE found.rank < :rank OR (found.rank = :rank AND found.id < :row_id)"
+    sql += " ORDER BY found.rank DESC, found.id DESC LIMIT :limit"
+    return text(sql).bindparams(**params)
+
+
+def search_page(rows, limit: int) -> Tuple[List, Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_rank_cursor(rows[-1].rank, rows[-1].id)
+
+
+def search_predictions(
+    db: Session,
+    user_id: int,
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """Свои и публичные предсказания по тексту: (строки с rank, курсор следующей страницы)"""
+    statement = search_statement(db.get_bind().dialect.name, user_id, query, limit, cursor)
+    if statement is None:
+        return [], None
+    return search_page(db.execute(statement).all(), limit)
 
 
 def get_expired_predictions(db: Session) -> List[models.Prediction]:
@@ -22,6 +193,178 @@ def get_expired_predictions(db: Session) -> List[models.Prediction]:
     ).all()
 
 
+def claim_due_statement(
+    worker_id: str,
+    limit: int,
+    lease_seconds: float,
+    prediction_ids: Optional[Sequence[int]] = None,
+    now: Optional[datetime] = None
+):
+    """UPDATE ... RETURNING, забирающий пачку наступивших строк в аренду"""
+    # SKIP LOCKED пропускает строки, которые прямо сейчас захватывает другой
+    # воркер, а просроченная аренда (воркер упал) позволяет забрать строку повторно
+    now = now or datetime.utcnow()
+    candidates = select(models.Prediction.id).where(
+        models.Prediction.due_date <= now,
+        models.Prediction.status == "pending",
+        or_(
+            models.Prediction.claim_expires_at.is_(None),
+            models.Prediction.claim_expires_at < now
+        )
+    )
+    if prediction_ids is not None:
+        candidates = candidates.where(models.Prediction.id.in_(prediction_ids))
+    candidates = candidates.order_by(models.Prediction.due_date).limit(limit).with_for_update(skip_locked=True)
+
+    return (
+        update(models.Prediction)
+        .where(models.Prediction.id.in_(candidates.scalar_subquery()))
+        .values(claimed_by=worker_id, claim_expires_at=now + timedelta(seconds=lease_seconds))
+        .returning(models.Prediction.id, models.Prediction.user_id, models.Prediction.prediction_text)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def claim_due_predictions(
+    db: Session,
+    worker_id: str,
+    limit: int,
+    lease_seconds: float,
+    prediction_ids: Optional[Sequence[int]] = None
+) -> List:
+    # Забираем пачку истекших строк в аренду и сразу коммитим - аренда видна другим воркерам
+    claimed = db.execute(claim_due_statement(worker_id, limit, lease_seconds, prediction_ids)).all()
+    db.commit()
+    return claimed
+
+
+def release_claims(db: Session, worker_id: str, prediction_ids: Sequence[int]):
+    if not prediction_ids:
+        return
+    db.execute(
+        update(models.Prediction)
+        .where(
+            models.Prediction.id.in_(prediction_ids),
+            models.Prediction.claimed_by == worker_id
+        )
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def defer_claims(db: Session, worker_id: str, prediction_ids: Sequence[int], until: datetime):
+    # Аренда продлевается до момента повтора: ни сканирование, ни расписание
+    # не возьмут строку раньше
+    if not prediction_ids:
+        return
+    db.execute(
+        update(models.Prediction)
+        .where(
+            models.Prediction.id.in_(prediction_ids),
+            models.Prediction.claimed_by == worker_id
+        )
+        .values(claim_expires_at=until)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def bulk_update_prediction_status(
+    db: Session,
+    prediction_ids: Sequence[int],
+    status: str,
+    checked_at: datetime,
+    worker_id: Optional[str] = None
+) -> List[int]:
+    # Один UPDATE на пачку; условие по статусу не дает перезаписать уже
+    # проверенные строки, RETURNING возвращает реально обновленные id.
+    # Коммит - на вызывающей стороне (одна транзакция на пачку)
+    if not prediction_ids:
+        return []
+    conditions = [
+        models.Prediction.id.in_(prediction_ids),
+        models.Prediction.status == "pending"
+    ]
+    if worker_id is not None:
+        # Пишем только строки, аренда которых все еще наша
+        conditions.append(models.Prediction.claimed_by == worker_id)
+
+    result = db.execute(
+        update(models.Prediction)
+        .where(*conditions)
+        .values(status=status, checked_at=checked_at, claimed_by=None, claim_expires_at=None)
+        .returning(models.Prediction.id)
+        .execution_options(synchronize_session=False)
+    )
+    return [row.id for row in result]
+
+
+def enqueue_awards(db: Session, predictions: Sequence) -> int:
+    # Запись в outbox без коммита: награда фиксируется в той же транзакции,
+    # что и статус предсказания, и не теряется при недоступном reward_service
+    if not predictions:
+        return 0
+    db.execute(insert(models.AwardOutbox), [
+        {
+            "user_id": prediction.user_id,
+            "prediction_id": prediction.id,
+            "prediction_text": prediction.prediction_text
+        }
+        for prediction in predictions
+    ])
+    return len(predictions)
+
+
+def outbox_batch_query(limit: int, now: Optional[datetime] = None):
+    # Порядок по id сохраняет порядок наград пользователя: строка не берется,
+    # пока более ранняя награда того же пользователя ждет повтора
+    now = now or datetime.utcnow()
+    earlier = aliased(models.AwardOutbox)
+    waiting = select(earlier.id).where(
+        earlier.user_id == models.AwardOutbox.user_id,
+        earlier.id < models.AwardOutbox.id,
+        earlier.next_attempt_at > now
+    )
+    return select(models.AwardOutbox).where(
+        models.AwardOutbox.next_attempt_at <= now,
+        ~waiting.exists()
+    ).order_by(models.AwardOutbox.id).limit(limit)
+
+
+def get_outbox_batch(db: Session, limit: int) -> List[models.AwardOutbox]:
+    return db.scalars(outbox_batch_query(limit)).all()
+
+
+def delete_outbox_rows(db: Session, outbox_ids: Sequence[int]):
+    if not outbox_ids:
+        return
+    db.execute(delete(models.AwardOutbox).where(models.AwardOutbox.id.in_(outbox_ids)))
+    db.commit()
+
+
+def defer_outbox_rows(db: Session, delays: Sequence[Tuple[int, float]], error: str):
+    """Откладывает неотправленные строки: (id, задержка в секундах)"""
+    if not delays:
+        return
+    now = datetime.utcnow()
+    outbox = models.AwardOutbox.__table__
+    db.execute(
+        update(outbox).where(outbox.c.id == bindparam("b_id")).values(
+            attempts=outbox.c.attempts + 1,
+            next_attempt_at=bindparam("b_next_attempt_at"),
+            last_error=error
+        ),
+        [{"b_id": outbox_id, "b_next_attempt_at": now + timedelta(seconds=delay)} for outbox_id, delay in delays]
+    )
+    db.commit()
+
+
+def get_outbox_backlog(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Число недоставленных наград и время создания самой старой"""
+    return db.query(func.count(models.AwardOutbox.id), func.min(models.AwardOutbox.created_at)).one()
+
+
 def create_prediction(db: Session, prediction: schemas.PredictionCreate, user_id: int) -> models.Prediction:
     db_prediction = models.Prediction(
         **prediction.dict(),
@@ -30,26 +373,75 @@ def create_prediction(db: Session, prediction: schemas.PredictionCreate, user_id
     db.add(db_prediction)
     db.commit()
     db.refresh(db_prediction)
+    safe_schedule(db_prediction.id, db_prediction.due_date)
+    prediction_cache.invalidate(user_ids=[user_id])
     return db_prediction
 
 
+def create_predictions_bulk(db: Session, predictions: Sequence[schemas.PredictionCreate], user_id: int) -> List:
+    # Один многострочный INSERT ... RETURNING вместо add/commit/refresh на каждую строку;
+    # возвращаются строки (не ORM объекты), поэтому после коммита нет повторных SELECT
+    if not predictions:
+        return []
+    table = models.Prediction.__table__
+    result = db.execute(
+        insert(table).returning(*table.c, sort_by_parameter_order=True),
+        [{**prediction.model_dump(), "user_id": user_id, "status": "pending"} for prediction in predictions]
+    )
+    created = result.all()
+    db.commit()
+    safe_schedule_many((row.id, row.due_date) for row in created)
+    prediction_cache.invalidate(user_ids=[user_id])
+    return created
+
+
+def restore_statements(prediction_id: int):
+    """Возврат строки из архива в горячую таблицу (обратно archive.archive_batch)"""
+    hot = models.Prediction.__table__
+    cold = models.PredictionArchive.__table__
+    return (
+        insert(hot).from_select(
+            list(_HISTORY_COLUMNS),
+            select(*(cold.c[name] for name in _HISTORY_COLUMNS)).where(cold.c.id == prediction_id)
+        ),
+        delete(cold).where(cold.c.id == prediction_id),
+    )
+
+
 def update_prediction_status(
     db: Session,
     prediction_id: int,
     status: str
-) -> Optional[models.Prediction]:
+):
     db_prediction = get_prediction(db, prediction_id)
+    if db_prediction is None and status == "pending" and get_archived_prediction(db, prediction_id):
+        # Снова ожидающее - возвращаем в горячую таблицу, где его подберут воркеры
+        for statement in restore_statements(prediction_id):
+            db.execute(statement)
+        db_prediction = get_prediction(db, prediction_id)
+    if db_prediction is None:
+        # Проверенное предсказание из архива обновляется на месте
+        db_prediction = get_archived_prediction(db, prediction_id)
     if db_prediction:
         db_prediction.status = status
         db_prediction.checked_at = datetime.utcnow()
         db.commit()
         db.refresh(db_prediction)
+        if status == "pending":
+            safe_schedule(prediction_id, db_prediction.due_date)
+        else:
+            safe_unschedule(prediction_id)
+        prediction_cache.invalidate([(prediction_id, db_prediction.user_id)])
     return db_prediction
 
 def delete_prediction(db: Session, prediction_id: int) -> bool:
-    db_prediction = get_prediction(db, prediction_id)
+    # Удалить можно и перенесенное в архив предсказание - чтение его тоже отдает
+    db_prediction = get_prediction_or_archived(db, prediction_id)
     if db_prediction:
+        user_id = db_prediction.user_id
         db.delete(db_prediction)
         db.commit()
+        safe_unschedule(prediction_id)
+        prediction_cache.invalidate([(prediction_id, user_id)])
         return True
     return False
\ No newline at end of file
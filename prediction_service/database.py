@@ -1,4 +1,6 @@
 # prediction_service/database.py
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from shared.config import DATABASE_URL
@@ -6,10 +8,44 @@ from shared.config import DATABASE_URL
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный режим маршрутов (asyncpg / aiosqlite), см. async_routes.py
+ASYNC_DB = os.getenv("PREDICTION_ASYNC_DB", "false").lower() == "true"
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+async_engine = None
+AsyncSessionLocal = None
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    scheme, separator, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+def init_async_engine():
+    """Создает асинхронный движок (драйвер импортируется только в этом режиме)"""
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        async_engine = create_async_engine(async_database_url())
+        # Без expire_on_commit: после коммита атрибуты читаются без ленивой загрузки
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return async_engine
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,63 @@
+# prediction_service/evaluators.py
+# Оценщики исхода предсказаний. Реализация получает всю пачку сразу, чтобы
+# делать векторные вычисления или одним запросом тянуть внешние данные.
+# Выбор - переменная PREDICTION_EVALUATOR: имя из реестра ("random") либо
+# путь "package.module:ClassName" к своему подклассу PredictionEvaluator.
+import importlib
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Sequence, Type
+
+PREDICTION_EVALUATOR = os.getenv("PREDICTION_EVALUATOR", "random")
+
+_registry: Dict[str, Type["PredictionEvaluator"]] = {}
+
+
+class PredictionEvaluator(ABC):
+    """Базовый класс оценщика"""
+
+    name: str = ""
+
+    @abstractmethod
+    def evaluate_batch(self, predictions: Sequence) -> Dict[int, Optional[bool]]:
+        """Исходы пачки: {prediction.id: сбылось ли}"""
+        # Строки у predictions - id, user_id, prediction_text. Отсутствующий
+        # id или None - исход пока неизвестен: предсказание останется pending
+        # и будет проверено повторно
+
+
+def register_evaluator(cls: Type[PredictionEvaluator]) -> Type[PredictionEvaluator]:
+    _registry[cls.name] = cls
+    return cls
+
+
+def load_evaluator(spec: str = PREDICTION_EVALUATOR) -> PredictionEvaluator:
+    """Экземпляр оценщика по имени из реестра или по пути module:Class"""
+    if spec in _registry:
+        return _registry[spec]()
+
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown evaluator '{spec}', registered: {sorted(_registry)}")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(cls, type) and issubclass(cls, PredictionEvaluator)):
+        raise TypeError(f"{spec} is not a PredictionEvaluator")
+    return cls()
+
+
+@register_evaluator
+class RandomEvaluator(PredictionEvaluator):
+    """Эталонный оценщик: случайный исход, один вызов генератора на пачку"""
+
+    name = "random"
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+
+    def evaluate_batch(self, predictions: Sequence) -> Dict[int, Optional[bool]]:
+        if not predictions:
+            return {}
+        # Один бит на предсказание из одного getrandbits вместо random.choice на каждое
+        bits = self._random.getrandbits(len(predictions))
+        return {prediction.id: bool((bits >> index) & 1) for index, prediction in enumerate(predictions)}
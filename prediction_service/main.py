@@ -1,18 +1,54 @@
 # prediction_service/main.py
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, BackgroundTasks, Query, Response
 from sqlalchemy.orm import Session
-from . import crud, models, schemas, tasks
-from .database import get_db, engine
-from auth_service.dependencies import get_current_user
+from . import async_routes, crud, models, schemas, tasks
+from .cache import prediction_cache
+from .database import ASYNC_DB, get_db, engine, init_async_engine
+from .redis_client import create_async_redis_client
+from .scheduler import due_scheduler
+from auth_service.database import engine as auth_engine
+from auth_service.dependencies import get_current_user, revocation_list
 from auth_service.schemas import UserResponse
+from shared.metrics import install_metrics, instrument_engine
+from shared.pagination import InvalidCursor
+from typing import Optional
 import asyncio
 
-models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Prediction Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Список отзывов для get_current_user: первая загрузка идет в БД - не в event loop
+    await asyncio.to_thread(revocation_list.start)
+    if not ASYNC_DB:
+        yield
+        return
 
+    # В async режиме кэш и расписание ходят в Redis через redis.asyncio;
+    # клиент создается здесь, чтобы его соединения принадлежали этому event loop
+    async_redis = create_async_redis_client()
+    prediction_cache.async_client = due_scheduler.async_client = async_redis
+    try:
+        yield
+    finally:
+        await async_redis.aclose()
+        await init_async_engine().dispose()
 
-@app.post("/predictions/", response_model=schemas.PredictionResponse)
+
+app = FastAPI(title="Prediction Service", version="1.0.0", lifespan=lifespan)
+install_metrics(app, engine=engine)
+# Синхронный get_current_user ходит в БД через движок auth_service - его запросы тоже учитываем
+instrument_engine(auth_engine)
+if ASYNC_DB:
+    # События SQLAlchemy асинхронного движка приходят через его sync_engine
+    instrument_engine(init_async_engine().sync_engine)
+
+# Синхронные маршруты (пул потоков); при PREDICTION_ASYNC_DB=true вместо них
+# подключаются async_routes.router с теми же путями
+router = APIRouter()
+
+
+@router.post("/predictions/", response_model=schemas.PredictionResponse)
 def create_prediction(
         prediction: schemas.PredictionCreate,
         db: Session = Depends(get_db),
@@ -21,40 +57,99 @@ def create_prediction(
     return crud.create_prediction(db=db, prediction=prediction, user_id=current_user.id)
 
 
-@app.get("/predictions/", response_model=list[schemas.PredictionResponse])
+@router.post("/predictions/batch", response_model=schemas.PredictionBatchResponse)
+def create_predictions_batch(
+        batch: schemas.PredictionBatchCreate,
+        db: Session = Depends(get_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    """Создание пачки предсказаний одним INSERT; невалидные элементы возвращаются в errors"""
+    valid, errors = schemas.validate_batch_items(batch)
+    created = crud.create_predictions_bulk(db, valid, user_id=current_user.id)
+    return schemas.PredictionBatchResponse(
+        created=[schemas.PredictionResponse.model_validate(row) for row in created],
+        errors=errors
+    )
+
+
+@router.get("/predictions/", response_model=list[schemas.PredictionResponse])
 def read_predictions(
-        skip: int = 0,
-        limit: int = 100,
+        response: Response,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[str] = None,
         db: Session = Depends(get_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    predictions = crud.get_user_predictions(db, user_id=current_user.id, skip=skip, limit=limit)
+    # skip > 0 без курсора - старый режим offset для совместимости
+    if skip and not cursor:
+        return crud.get_user_predictions(db, user_id=current_user.id, skip=skip, limit=limit)
+
+    # Первую страницу опрашивают чаще всего - она идет через кэш
+    if not cursor and limit <= crud.CACHED_FIRST_PAGE_SIZE:
+        predictions, next_cursor = crud.get_user_first_page_cached(db, current_user.id, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return predictions
+
+    try:
+        predictions, next_cursor = crud.get_user_predictions_page(
+            db, user_id=current_user.id, limit=limit, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return predictions
 
 
-@app.get("/predictions/{prediction_id}", response_model=schemas.PredictionResponse)
+@router.get("/predictions/search", response_model=list[schemas.PredictionSearchResult])
+def search_predictions(
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        db: Session = Depends(get_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    """Полнотекстовый поиск по своим и публичным предсказаниям (без архива)"""
+    try:
+        results, next_cursor = crud.search_predictions(
+            db, user_id=current_user.id, query=q, limit=limit, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except crud.SearchNotSupported:
+        raise HTTPException(status_code=501, detail="Full-text search is not available")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [schemas.PredictionSearchResult.model_validate(row) for row in results]
+
+
+@router.get("/predictions/{prediction_id}", response_model=schemas.PredictionResponse)
 def read_prediction(
         prediction_id: int,
         db: Session = Depends(get_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    db_prediction = crud.get_prediction(db, prediction_id=prediction_id)
-    if db_prediction is None:
+    prediction = crud.get_prediction_cached(db, prediction_id=prediction_id)
+    if prediction is None:
         raise HTTPException(status_code=404, detail="Prediction not found")
 
-    if db_prediction.user_id != current_user.id:
+    # Публичные предсказания (из результатов поиска) доступны для чтения всем
+    if prediction["user_id"] != current_user.id and not prediction["is_public"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    return db_prediction
+    return prediction
 
 
-@app.delete("/predictions/{prediction_id}")
+@router.delete("/predictions/{prediction_id}")
 def delete_prediction(
         prediction_id: int,
         db: Session = Depends(get_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    db_prediction = crud.get_prediction(db, prediction_id=prediction_id)
+    db_prediction = crud.get_prediction_or_archived(db, prediction_id=prediction_id)
     if db_prediction is None:
         raise HTTPException(status_code=404, detail="Prediction not found")
 
@@ -68,6 +163,9 @@ def delete_prediction(
     return {"message": "Prediction deleted successfully"}
 
 
+app.include_router(async_routes.router if ASYNC_DB else router)
+
+
 @app.post("/predictions/check-expired")
 async def check_expired_predictions(background_tasks: BackgroundTasks):
     """Запуск проверки истекших предсказаний"""
@@ -1,2 +1,2 @@
 # prediction_service/models.py
-from shared.models import Prediction, Base
\ No newline at end of file
+from shared.models import AwardOutbox, Prediction, PredictionArchive, Base
\ No newline at end of file
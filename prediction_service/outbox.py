@@ -0,0 +1,146 @@
+# prediction_service/outbox.py
+# Доставка наград из award_outbox в reward_service:
+#   python -m prediction_service.outbox --batch-size 1000 --metrics-port 9102
+# Строки пишет PredictionChecker в одной транзакции со статусом предсказания;
+# здесь они пачками уходят в пакетный эндпоинт и удаляются после ответа 200.
+# Эндпоинт идемпотентен по prediction_id, поэтому повтор после сбоя безопасен.
+# Порядок наград пользователя сохраняется при одном запущенном процессе.
+import argparse
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import requests
+
+from . import crud
+from .database import SessionLocal
+from shared.metrics import REGISTRY, serve_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REWARD_SERVICE_URL = os.getenv("REWARD_SERVICE_URL", "http://reward_service:8001")
+BATCH_SIZE = int(os.getenv("AWARD_OUTBOX_BATCH_SIZE", "1000"))
+POLL_INTERVAL = float(os.getenv("AWARD_OUTBOX_POLL_INTERVAL", "1"))
+REQUEST_TIMEOUT = float(os.getenv("AWARD_OUTBOX_REQUEST_TIMEOUT", "10"))
+# Экспоненциальная задержка повтора с джиттером: base * 2^attempts, не больше max
+BACKOFF_BASE = float(os.getenv("AWARD_OUTBOX_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("AWARD_OUTBOX_BACKOFF_MAX", "300"))
+METRICS_PORT = int(os.getenv("AWARD_OUTBOX_METRICS_PORT", "0"))
+
+DELIVERED = REGISTRY.counter("award_outbox_delivered_total", "Awards delivered to reward_service")
+SKIPPED = REGISTRY.counter("award_outbox_skipped_total", "Outbox awards reward_service had already applied")
+FAILED_BATCHES = REGISTRY.counter("award_outbox_failed_batches_total", "Outbox batches that failed and were deferred")
+DELIVERY_LAG = REGISTRY.histogram(
+    "award_outbox_delivery_lag_seconds", "Time from outbox write to delivery",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+BACKLOG = REGISTRY.gauge("award_outbox_backlog", "Undelivered awards in the outbox")
+OLDEST_AGE = REGISTRY.gauge("award_outbox_oldest_age_seconds", "Age of the oldest undelivered award")
+
+
+def backoff_delay(attempts: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempts))
+    return random.uniform(delay / 2, delay)
+
+
+def _age_seconds(created_at: Optional[datetime], now: datetime) -> float:
+    if created_at is None:
+        return 0.0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - created_at).total_seconds())
+
+
+class OutboxRelay:
+    def __init__(self, batch_size: int = BATCH_SIZE, reward_service_url: str = REWARD_SERVICE_URL):
+        self.batch_size = batch_size
+        self.url = f"{reward_service_url}/rewards/award-predictions"
+        self.http = requests.Session()
+
+    def deliver_batch(self) -> int:
+        """Отправляет одну пачку; возвращает число строк, снятых с outbox"""
+        db = SessionLocal()
+        try:
+            rows = crud.get_outbox_batch(db, self.batch_size)
+            if not rows:
+                return 0
+
+            try:
+                response = self.http.post(self.url, timeout=REQUEST_TIMEOUT, json={
+                    "awards": [
+                        {
+                            "user_id": row.user_id,
+                            "prediction_id": row.prediction_id,
+                            "prediction_text": row.prediction_text
+                        }
+                        for row in rows
+                    ]
+                })
+                response.raise_for_status()
+                result = response.json()
+            except Exception as e:
+                # Пачка применяется в reward_service одной транзакцией - откладываем ее целиком
+                FAILED_BATCHES.inc()
+                logger.error(f"Failed to deliver {len(rows)} awards: {e}")
+                crud.defer_outbox_rows(db, [(row.id, backoff_delay(row.attempts)) for row in rows], str(e)[:1000])
+                return 0
+
+            now = datetime.now(timezone.utc)
+            for row in rows:
+                DELIVERY_LAG.observe(_age_seconds(row.created_at, now))
+            crud.delete_outbox_rows(db, [row.id for row in rows])
+            DELIVERED.inc(len(result["awarded_prediction_ids"]))
+            SKIPPED.inc(len(result["skipped_prediction_ids"]))
+            return len(rows)
+        finally:
+            db.close()
+
+    def update_backlog(self):
+        db = SessionLocal()
+        try:
+            backlog, oldest = crud.get_outbox_backlog(db)
+        finally:
+            db.close()
+        BACKLOG.set(backlog)
+        OLDEST_AGE.set(_age_seconds(oldest, datetime.now(timezone.utc)))
+
+    def run(self, stop_event: threading.Event, poll_interval: float = POLL_INTERVAL):
+        while not stop_event.is_set():
+            try:
+                delivered = self.deliver_batch()
+                self.update_backlog()
+            except Exception as e:
+                # БД недоступна - пробуем снова после паузы
+                logger.error(f"Outbox relay error: {e}")
+                delivered = 0
+            if delivered < self.batch_size:
+                stop_event.wait(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued awards to reward_service")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 to disable")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    logger.info("Award outbox relay started")
+    OutboxRelay(batch_size=args.batch_size).run(stop_event, args.poll_interval)
+    logger.info("Award outbox relay stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# prediction_service/redis_client.py
+import redis
+from shared.config import REDIS_URL
+
+_fake_server = None
+
+
+def _get_fake_server():
+    # Синхронный и асинхронный клиенты fakeredis должны видеть одни данные
+    global _fake_server
+    if _fake_server is None:
+        import fakeredis
+        _fake_server = fakeredis.FakeServer()
+    return _fake_server
+
+
+def create_redis_client(url: str = REDIS_URL) -> redis.Redis:
+    # fakeredis:// - Redis в памяти процесса для локального запуска без сервера
+    if url.startswith("fakeredis://"):
+        import fakeredis
+        return fakeredis.FakeRedis(server=_get_fake_server())
+    return redis.Redis.from_url(url)
+
+
+def create_async_redis_client(url: str = REDIS_URL):
+    """Клиент redis.asyncio для async маршрутов; создавать в работающем event loop"""
+    if url.startswith("fakeredis://"):
+        import fakeredis
+        return fakeredis.FakeAsyncRedis(server=_get_fake_server())
+    import redis.asyncio
+    return redis.asyncio.Redis.from_url(url)
+
+
+redis_client = create_redis_client()
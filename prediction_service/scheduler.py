@@ -0,0 +1,162 @@
+# prediction_service/scheduler.py
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DUE_KEY = "predictions:due"
+REBUILD_LOCK_KEY = "predictions:due:rebuild"
+
+
+def due_score(due_date: datetime) -> float:
+    # В БД время хранится в UTC; наивные значения считаем UTC
+    if due_date.tzinfo is None:
+        due_date = due_date.replace(tzinfo=timezone.utc)
+    return due_date.timestamp()
+
+
+class DueScheduler:
+    """Индекс ожидающих предсказаний по due_date в Redis sorted set"""
+
+    def __init__(self, client: redis.Redis, key: str = DUE_KEY):
+        self.client = client
+        # redis.asyncio клиент для a*-методов, задается при старте в async режиме
+        self.async_client = None
+        self.key = key
+
+    def schedule(self, prediction_id: int, due_date: datetime):
+        self.client.zadd(self.key, {prediction_id: due_score(due_date)})
+
+    def schedule_many(self, items: Iterable[Tuple[int, datetime]]):
+        mapping = {prediction_id: due_score(due_date) for prediction_id, due_date in items}
+        if mapping:
+            self.client.zadd(self.key, mapping)
+
+    def unschedule(self, *prediction_ids: int):
+        if prediction_ids:
+            self.client.zrem(self.key, *prediction_ids)
+
+    async def aschedule(self, prediction_id: int, due_date: datetime):
+        await self.async_client.zadd(self.key, {prediction_id: due_score(due_date)})
+
+    async def aschedule_many(self, items: Iterable[Tuple[int, datetime]]):
+        mapping = {prediction_id: due_score(due_date) for prediction_id, due_date in items}
+        if mapping:
+            await self.async_client.zadd(self.key, mapping)
+
+    async def aunschedule(self, *prediction_ids: int):
+        if prediction_ids:
+            await self.async_client.zrem(self.key, *prediction_ids)
+
+    def pop_due(self, limit: int, now: Optional[float] = None) -> List[int]:
+        """Снимает с расписания наступившие предсказания (не больше limit)"""
+        now = time.time() if now is None else now
+        members = self.client.zrangebyscore(self.key, "-inf", now, start=0, num=limit)
+        if not members:
+            return []
+
+        # ZREM возвращает 1 только тому, кто удалил элемент первым, -
+        # так одно и то же предсказание не достанется двум воркерам
+        pipeline = self.client.pipeline(transaction=False)
+        for member in members:
+            pipeline.zrem(self.key, member)
+        removed = pipeline.execute()
+        return [int(member) for member, ok in zip(members, removed) if ok]
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        head = self.client.zrange(self.key, 0, 0, withscores=True)
+        if not head:
+            return None
+        now = time.time() if now is None else now
+        return max(0.0, head[0][1] - now)
+
+    def rebuild(self, db: Session, chunk_size: int = 5000) -> int:
+        """Перестраивает индекс из БД (при старте воркеров)"""
+        # Собираем во временный ключ и объединяем с основным: записи, добавленные
+        # во время перестройки, не теряются, а лишние (уже обработанные) просто
+        # не пройдут claim
+        temp_key = f"{self.key}:rebuild:{uuid.uuid4().hex}"
+        stmt = select(models.Prediction.id, models.Prediction.due_date).where(
+            models.Prediction.status == "pending",
+            models.Prediction.due_date.isnot(None)
+        ).execution_options(yield_per=chunk_size)
+
+        total = 0
+        for partition in db.execute(stmt).partitions():
+            self.client.zadd(temp_key, {row.id: due_score(row.due_date) for row in partition})
+            total += len(partition)
+
+        if total:
+            self.client.zunionstore(self.key, [self.key, temp_key], aggregate="MIN")
+            self.client.delete(temp_key)
+        return total
+
+    def rebuild_once(self, db: Session, lock_seconds: int = 60) -> Optional[int]:
+        """Перестройка, которую выполняет только один из одновременно стартующих воркеров"""
+        if not self.client.set(REBUILD_LOCK_KEY, "1", nx=True, ex=lock_seconds):
+            return None
+        return self.rebuild(db)
+
+
+due_scheduler = DueScheduler(redis_client)
+
+
+# Ошибки Redis не должны ломать запись в БД: пропущенные строки
+# подберет периодическая сверка воркеров
+def safe_schedule(prediction_id: int, due_date: Optional[datetime]):
+    if due_date is None:
+        return
+    try:
+        due_scheduler.schedule(prediction_id, due_date)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to schedule prediction {prediction_id}: {e}")
+
+
+def safe_schedule_many(items: Iterable[Tuple[int, Optional[datetime]]]):
+    items = [(prediction_id, due_date) for prediction_id, due_date in items if due_date is not None]
+    try:
+        due_scheduler.schedule_many(items)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to schedule {len(items)} predictions: {e}")
+
+
+def safe_unschedule(*prediction_ids: int):
+    try:
+        due_scheduler.unschedule(*prediction_ids)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to unschedule predictions {prediction_ids}: {e}")
+
+
+# Те же обертки для async маршрутов (due_scheduler.async_client)
+async def asafe_schedule(prediction_id: int, due_date: Optional[datetime]):
+    if due_date is None:
+        return
+    try:
+        await due_scheduler.aschedule(prediction_id, due_date)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to schedule prediction {prediction_id}: {e}")
+
+
+async def asafe_schedule_many(items: Iterable[Tuple[int, Optional[datetime]]]):
+    items = [(prediction_id, due_date) for prediction_id, due_date in items if due_date is not None]
+    try:
+        await due_scheduler.aschedule_many(items)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to schedule {len(items)} predictions: {e}")
+
+
+async def asafe_unschedule(*prediction_ids: int):
+    try:
+        await due_scheduler.aunschedule(*prediction_ids)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to unschedule predictions {prediction_ids}: {e}")
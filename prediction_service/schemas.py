@@ -1,12 +1,13 @@
 # prediction_service/schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional, Tuple
 
 
 class PredictionBase(BaseModel):
     prediction_text: str
     due_date: datetime
+    is_public: bool = False
 
 
 class PredictionCreate(PredictionBase):
@@ -24,6 +25,44 @@ class PredictionResponse(PredictionBase):
         from_attributes = True
 
 
+class PredictionSearchResult(PredictionResponse):
+    rank: float
+
+
 class PredictionUpdate(BaseModel):
     status: Optional[str] = None
-    checked_at: Optional[datetime] = None
\ No newline at end of file
+    checked_at: Optional[datetime] = None
+
+
+class PredictionBatchCreate(BaseModel):
+    # Элементы (в том числе не-объекты) проверяются по одному, чтобы ошибка
+    # в одном не отклоняла всю пачку
+    items: List[Any] = Field(..., max_length=1000)
+
+
+class PredictionBatchError(BaseModel):
+    index: int
+    errors: List[str]
+
+
+class PredictionBatchResponse(BaseModel):
+    created: List[PredictionResponse]
+    errors: List[PredictionBatchError]
+
+
+def validate_batch_items(batch: PredictionBatchCreate) -> Tuple[List[PredictionCreate], List[PredictionBatchError]]:
+    """Разделяет элементы пачки на валидные и ошибки по индексам"""
+    valid = []
+    errors = []
+    for index, item in enumerate(batch.items):
+        if not isinstance(item, dict):
+            errors.append(PredictionBatchError(index=index, errors=["item must be a JSON object"]))
+            continue
+        try:
+            valid.append(PredictionCreate.model_validate(item))
+        except ValidationError as e:
+            errors.append(PredictionBatchError(
+                index=index,
+                errors=[f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+            ))
+    return valid, errors
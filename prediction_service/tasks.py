@@ -1,72 +1,207 @@
 # prediction_service/tasks.py
-import redis
 from sqlalchemy.orm import Session
 from . import crud, models
 from .database import SessionLocal
-import requests
+from .cache import prediction_cache
+from .evaluators import PredictionEvaluator, load_evaluator
+from .redis_client import redis_client
+from .scheduler import due_scheduler, safe_schedule_many, safe_unschedule
+from shared.metrics import REGISTRY
 import logging
-from datetime import datetime
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-redis_client = redis.Redis(host='redis', port=6379, db=0)
+# Размер пачки при обработке истекших предсказаний
+CHECK_CHUNK_SIZE = int(os.getenv("PREDICTION_CHECK_CHUNK_SIZE", "500"))
+# Срок аренды пачки воркером; после падения воркера строки заберет другой
+CLAIM_LEASE_SECONDS = float(os.getenv("PREDICTION_CLAIM_LEASE_SECONDS", "300"))
+# Через сколько повторить предсказания, исход которых оценщик пока не знает
+UNDECIDED_RETRY_SECONDS = float(os.getenv("PREDICTION_UNDECIDED_RETRY_SECONDS", "60"))
+
+EVALUATOR_DURATION = REGISTRY.histogram(
+    "prediction_evaluator_duration_seconds", "Time spent in evaluate_batch per chunk",
+    ("evaluator",)
+)
+EVALUATOR_OUTCOMES = REGISTRY.counter(
+    "prediction_evaluator_outcomes_total", "Predictions evaluated, by outcome",
+    ("evaluator", "outcome")
+)
+EVALUATOR_ERRORS = REGISTRY.counter(
+    "prediction_evaluator_errors_total", "evaluate_batch calls that raised",
+    ("evaluator",)
+)
+
+
+def default_worker_id() -> str:
+    # Суффикс запуска: параллельные проверки в одном процессе (например, два
+    # /predictions/check-expired подряд) не должны делить аренду и снимать чужие claims.
+    # Имя хоста обрезаем, чтобы id помещался в claimed_by (64 символа)
+    return f"{socket.gethostname()[:45]}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
 
 
 class PredictionChecker:
-    def __init__(self):
+    def __init__(
+            self,
+            chunk_size: int = CHECK_CHUNK_SIZE,
+            worker_id: Optional[str] = None,
+            lease_seconds: float = CLAIM_LEASE_SECONDS,
+            evaluator: Optional[PredictionEvaluator] = None
+    ):
         self.db = SessionLocal()
+        self.chunk_size = chunk_size
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.evaluator = evaluator or load_evaluator()
 
-    def check_expired_predictions(self):
+    def check_expired_predictions(self) -> int:
         """Проверка предсказаний, у которых истек срок"""
+        # Пачки берутся в аренду (claim), поэтому параллельные воркеры
+        # и пересекающиеся запуски не обрабатывают одну строку дважды
+        processed = 0
         try:
-            expired_predictions = crud.get_expired_predictions(self.db)
-            logger.info(f"Found {len(expired_predictions)} expired predictions")
-
-            for prediction in expired_predictions:
-                self.evaluate_prediction(prediction)
+            while True:
+                chunk = crud.claim_due_predictions(
+                    self.db, self.worker_id, self.chunk_size, self.lease_seconds
+                )
+                if not chunk:
+                    break
+                if not self.process_chunk(self.db, chunk):
+                    # Ошибка записи: не забираем ту же пачку по кругу, повтор - в следующий запуск
+                    break
+                processed += len(chunk)
+
+            logger.info(f"Worker {self.worker_id} processed {processed} expired predictions")
 
         except Exception as e:
             logger.error(f"Error checking predictions: {e}")
         finally:
             self.db.close()
+        return processed
 
-    def evaluate_prediction(self, prediction):
-        """Оценка сбылось ли предсказание"""
+    def check_due_predictions(self) -> int:
+        """Проверка только тех предсказаний, срок которых наступил по расписанию"""
+        # Без сканирования таблицы: id берутся из sorted set, затем арендуются
+        # точечно по первичному ключу
+        processed = 0
         try:
-            # Временная логика - случайное определение
-            import random
-            is_fulfilled = random.choice([True, False])
+            while True:
+                due_ids = due_scheduler.pop_due(self.chunk_size)
+                if not due_ids:
+                    break
+                chunk = crud.claim_due_predictions(
+                    self.db, self.worker_id, self.chunk_size, self.lease_seconds, prediction_ids=due_ids
+                )
+                if chunk and not self.process_chunk(self.db, chunk):
+                    # Возвращаем в расписание то, что не удалось сохранить
+                    due_scheduler.schedule_many((p.id, datetime.utcnow()) for p in chunk)
+                    break
+                processed += len(chunk)
 
-            status = "fulfilled" if is_fulfilled else "failed"
-            crud.update_prediction_status(self.db, prediction.id, status)
-
-            # Если сбылось - награждаем пользователя
-            if is_fulfilled:
-                self.award_user(prediction)
+        except Exception as e:
+            logger.error(f"Error checking due predictions: {e}")
+        finally:
+            self.db.close()
+        return processed
 
-            logger.info(f"Prediction {prediction.id} evaluated as {status}")
+    def process_chunk(self, db: Session, chunk) -> bool:
+        """Оценка пачки предсказаний и запись результатов двумя UPDATE и outbox наград"""
+        try:
+            outcomes = self.evaluate(chunk)
+        except Exception as e:
+            logger.error(f"Evaluator '{self.evaluator.name}' failed on chunk of {len(chunk)}: {e}")
+            crud.release_claims(db, self.worker_id, [prediction.id for prediction in chunk])
+            return False
+        checked_at = datetime.utcnow()
 
+        # Исход неизвестен - отдаем строки и повторяем позже
+        undecided = [prediction for prediction in chunk if outcomes.get(prediction.id) is None]
+        try:
+            fulfilled_ids = crud.bulk_update_prediction_status(
+                db, [pid for pid, ok in outcomes.items() if ok], "fulfilled", checked_at, self.worker_id
+            )
+            failed_ids = crud.bulk_update_prediction_status(
+                db, [pid for pid, ok in outcomes.items() if ok is False], "failed", checked_at, self.worker_id
+            )
+            # Награждаем только за строки, которые обновили именно мы; доставку
+            # в reward_service выполняет отдельный процесс (outbox.py)
+            fulfilled = set(fulfilled_ids)
+            crud.enqueue_awards(db, [prediction for prediction in chunk if prediction.id in fulfilled])
+            db.commit()
         except Exception as e:
-            logger.error(f"Error evaluating prediction {prediction.id}: {e}")
+            db.rollback()
+            logger.error(f"Error saving chunk of {len(chunk)} predictions: {e}")
+            # Отдаем пачку сразу, не дожидаясь истечения аренды
+            crud.release_claims(db, self.worker_id, [prediction.id for prediction in chunk])
+            return False
+
+        logger.info(
+            f"Chunk evaluated: {len(fulfilled_ids)} fulfilled, {len(failed_ids)} failed, "
+            f"{len(undecided)} undecided"
+        )
+        if undecided:
+            retry_at = datetime.utcnow() + timedelta(seconds=UNDECIDED_RETRY_SECONDS)
+            crud.defer_claims(db, self.worker_id, [prediction.id for prediction in undecided], retry_at)
+            safe_schedule_many((prediction.id, retry_at) for prediction in undecided)
+        # Строки, найденные сканированием, тоже снимаем с расписания
+        safe_unschedule(*(pid for pid, ok in outcomes.items() if ok is not None))
+        updated = set(fulfilled_ids) | set(failed_ids)
+        prediction_cache.invalidate(
+            (prediction.id, prediction.user_id) for prediction in chunk if prediction.id in updated
+        )
+        return True
+
+    def evaluate(self, predictions) -> dict:
+        """Исходы пачки от оценщика с замером времени"""
+        name = self.evaluator.name or type(self.evaluator).__name__
+        started = time.perf_counter()
+        try:
+            outcomes = self.evaluator.evaluate_batch(predictions)
+        except Exception:
+            EVALUATOR_ERRORS.inc(evaluator=name)
+            raise
+        finally:
+            EVALUATOR_DURATION.observe(time.perf_counter() - started, evaluator=name)
+
+        counts = Counter(
+            "undecided" if ok is None else ("fulfilled" if ok else "failed")
+            for ok in (outcomes.get(prediction.id) for prediction in predictions)
+        )
+        for outcome, count in counts.items():
+            EVALUATOR_OUTCOMES.inc(count, evaluator=name, outcome=outcome)
+        return outcomes
+
+    def decide(self, prediction) -> Optional[bool]:
+        """Сбылось ли предсказание (None - пока неизвестно)"""
+        return self.evaluate([prediction]).get(prediction.id)
 
-    def award_user(self, prediction):
-        """Выдача награды пользователю"""
+    def evaluate_prediction(self, prediction):
+        """Оценка сбылось ли предсказание"""
         try:
-            reward_service_url = "http://reward_service:8001/rewards/award-prediction"
+            is_fulfilled = self.decide(prediction)
+            if is_fulfilled is None:
+                logger.info(f"Prediction {prediction.id} outcome is not known yet")
+                return
 
-            award_data = {
-                "user_id": prediction.user_id,
-                "prediction_id": prediction.id,
-                "prediction_text": prediction.prediction_text
-            }
+            status = "fulfilled" if is_fulfilled else "failed"
+            updated = crud.bulk_update_prediction_status(self.db, [prediction.id], status, datetime.utcnow())
 
-            response = requests.post(reward_service_url, json=award_data)
+            # Если сбылось - награда попадает в outbox в той же транзакции
+            if is_fulfilled and updated:
+                crud.enqueue_awards(self.db, [prediction])
+            self.db.commit()
+            safe_unschedule(prediction.id)
+            prediction_cache.invalidate([(prediction.id, prediction.user_id)])
 
-            if response.status_code == 200:
-                logger.info(f"User {prediction.user_id} awarded for prediction {prediction.id}")
-            else:
-                logger.error(f"Failed to award user: {response.text}")
+            logger.info(f"Prediction {prediction.id} evaluated as {status}")
 
         except Exception as e:
-            logger.error(f"Error awarding user: {e}")
\ No newline at end of file
+            self.db.rollback()
+            logger.error(f"Error evaluating prediction {prediction.id}: {e}")
@@ -0,0 +1,118 @@
+# prediction_service/workers.py
+# Несколько процессов проверки истекших предсказаний:
+#   python -m prediction_service.workers --processes 4
+# Наступившие предсказания берутся из расписания в Redis (scheduler.py), без
+# сканирования таблицы; редкий полный проход (--reconcile-interval) подбирает
+# то, что не попало в расписание. Строки распределяются через аренду в БД
+# (FOR UPDATE SKIP LOCKED), поэтому можно запускать несколько контейнеров.
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+import redis
+
+from .database import SessionLocal, engine
+from .scheduler import due_scheduler
+from .tasks import CHECK_CHUNK_SIZE, CLAIM_LEASE_SECONDS, PredictionChecker, default_worker_id
+
+logger = logging.getLogger(__name__)
+
+WORKER_PROCESSES = int(os.getenv("PREDICTION_WORKER_PROCESSES", "2"))
+# Максимальная пауза, когда в расписании нет наступивших предсказаний
+POLL_INTERVAL = float(os.getenv("PREDICTION_WORKER_POLL_INTERVAL", "1"))
+# Интервал страховочного полного прохода по таблице
+RECONCILE_INTERVAL = float(os.getenv("PREDICTION_RECONCILE_INTERVAL", "300"))
+
+
+def rebuild_schedule():
+    """Заполняет расписание из БД при старте (выполняет один процесс из всех)"""
+    db = SessionLocal()
+    try:
+        total = due_scheduler.rebuild_once(db)
+        if total is not None:
+            logger.info(f"Due schedule rebuilt: {total} pending predictions")
+    except Exception as e:
+        logger.error(f"Due schedule rebuild failed: {e}")
+    finally:
+        db.close()
+
+
+def idle_timeout(poll_interval: float) -> float:
+    # Спим до ближайшего due_date, но не дольше poll_interval: новые
+    # предсказания с близким сроком могут появиться в любой момент
+    try:
+        wait = due_scheduler.seconds_until_next()
+    except redis.RedisError:
+        return poll_interval
+    return poll_interval if wait is None else min(wait, poll_interval)
+
+
+def run_worker(
+        stop_event,
+        chunk_size: int,
+        lease_seconds: float,
+        poll_interval: float,
+        reconcile_interval: float
+):
+    """Цикл одного процесса: разбирает наступившие предсказания по расписанию"""
+    # Соединения пула, открытые родителем до fork (rebuild_schedule), нельзя
+    # делить с ним: бросаем их, не закрывая, и открываем свои
+    engine.dispose(close=False)
+    # Остановкой управляет родительский процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    worker_id = default_worker_id()
+    logger.info(f"Expiry worker {worker_id} started")
+    next_reconcile = time.monotonic() + reconcile_interval
+    while not stop_event.is_set():
+        checker = PredictionChecker(chunk_size=chunk_size, worker_id=worker_id, lease_seconds=lease_seconds)
+        if time.monotonic() >= next_reconcile:
+            next_reconcile = time.monotonic() + reconcile_interval
+            processed = checker.check_expired_predictions()
+        else:
+            processed = checker.check_due_predictions()
+        if processed == 0:
+            stop_event.wait(idle_timeout(poll_interval))
+    logger.info(f"Expiry worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run expired prediction workers")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES)
+    parser.add_argument("--chunk-size", type=int, default=CHECK_CHUNK_SIZE)
+    parser.add_argument("--lease-seconds", type=float, default=CLAIM_LEASE_SECONDS)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--reconcile-interval", type=float, default=RECONCILE_INTERVAL)
+    args = parser.parse_args()
+
+    rebuild_schedule()
+
+    stop_event = multiprocessing.Event()
+
+    def stop(signum, frame):
+        logger.info("Stopping expiry workers")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(stop_event, args.chunk_size, args.lease_seconds, args.poll_interval, args.reconcile_interval),
+            name=f"expiry-worker-{index}"
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
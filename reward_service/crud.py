@@ -1,6 +1,9 @@
+from collections import Counter
+from sqlalchemy import Integer, bindparam, column, func, update, values
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 import models, schemas
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 def get_reward_rule(db: Session, rule_name: str) -> Optional[models.RewardRule]:
@@ -14,6 +17,22 @@ def get_user_balance(db: Session, user_id: int) -> Optional[models.UserBalance]:
     return db.query(models.UserBalance).filter(models.UserBalance.user_id == user_id).first()
 
 
+def get_user_reward_stats(db: Session, user_id: int) -> schemas.UserRewardStatsResponse:
+    # Одна агрегирующая выборка вместо загрузки всех наград пользователя
+    rewards_count, points_awarded, last_awarded_at = db.query(
+        func.count(models.UserReward.id),
+        func.coalesce(func.sum(models.UserReward.points_awarded), 0),
+        func.max(models.UserReward.awarded_at)
+    ).filter(models.UserReward.user_id == user_id).one()
+
+    return schemas.UserRewardStatsResponse(
+        user_id=user_id,
+        rewards_count=rewards_count,
+        points_awarded=points_awarded,
+        last_awarded_at=last_awarded_at
+    )
+
+
 def create_user_balance(db: Session, user_id: int) -> models.UserBalance:
     db_balance = models.UserBalance(user_id=user_id)
     db.add(db_balance)
@@ -34,6 +53,13 @@ def update_user_balance(db: Session, user_id: int, points: int) -> models.UserBa
     return balance
 
 
+def _insert(db: Session, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей БД"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
 def create_user_reward(
         db: Session,
         user_id: int,
@@ -42,27 +68,124 @@ def create_user_reward(
         award_type: str,
         description: str
 ) -> models.UserReward:
-    # Проверяем, не выдавалась ли уже награда за это предсказание
-    existing_reward = db.query(models.UserReward).filter(
-        models.UserReward.prediction_id == prediction_id
-    ).first()
+    # Порядок как в пакетной выдаче: сначала баланс, затем награда - иначе
+    # одиночная и пакетная выдача за одно предсказание могут взаимоблокироваться
+    _ensure_balances(db, [user_id])
+    _lock_balances(db, [user_id])
 
-    if existing_reward:
-        return existing_reward
+    # Повторная награда за то же предсказание отсекается уникальным индексом
+    # по prediction_id - в том числе при гонке с пакетной выдачей
+    reward_id = db.execute(
+        _insert(db, models.UserReward).values(
+            user_id=user_id,
+            prediction_id=prediction_id,
+            points_awarded=points,
+            award_type=award_type,
+            description=description,
+            is_claimed=True
+        ).on_conflict_do_nothing(index_elements=["prediction_id"]).returning(models.UserReward.id)
+    ).scalar()
 
-    db_reward = models.UserReward(
-        user_id=user_id,
-        prediction_id=prediction_id,
-        points_awarded=points,
-        award_type=award_type,
-        description=description,
-        is_claimed=True
-    )
-    db.add(db_reward)
+    if reward_id is not None:
+        # Баланс обновляется в той же транзакции, что и запись награды
+        _apply_deltas(db, {user_id: points})
     db.commit()
-    db.refresh(db_reward)
 
-    # Обновляем баланс пользователя
-    update_user_balance(db, user_id, points)
+    return db.query(models.UserReward).filter(models.UserReward.prediction_id == prediction_id).one()
+
+
+def _ensure_balances(db: Session, user_ids: List[int]):
+    """Создает недостающие балансы одним INSERT, не завершая транзакцию"""
+    # Баланс мог создать параллельный запрос - тогда строка просто пропускается
+    db.execute(
+        _insert(db, models.UserBalance).values(
+            [{"user_id": user_id} for user_id in user_ids]
+        ).on_conflict_do_nothing(index_elements=["user_id"])
+    )
+
+
+def _lock_balances(db: Session, user_ids: List[int]):
+    # Блокируем балансы в фиксированном порядке: параллельные выдачи по тем же
+    # пользователям ждут друг друга, а не взаимоблокируются
+    db.query(models.UserBalance.id).filter(
+        models.UserBalance.user_id.in_(user_ids)
+    ).order_by(models.UserBalance.user_id).with_for_update().all()
 
-    return db_reward
\ No newline at end of file
+
+def _apply_deltas(db: Session, deltas: Dict[int, int]):
+    """Начисляет очки всем пользователям одним UPDATE ... FROM (VALUES ...)"""
+    balances = models.UserBalance.__table__
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite не поддерживает список колонок у VALUES; запросы там идут в
+        # процессе, поэтому executemany не стоит лишних round trip
+        db.execute(
+            update(balances).where(balances.c.user_id == bindparam("b_user_id")).values(
+                total_points=balances.c.total_points + bindparam("delta"),
+                available_points=balances.c.available_points + bindparam("delta")
+            ),
+            [{"b_user_id": user_id, "delta": delta} for user_id, delta in deltas.items()]
+        )
+        return
+
+    rows = values(column("user_id", Integer), column("delta", Integer), name="deltas").data(
+        list(deltas.items())
+    )
+    db.execute(
+        update(balances).where(balances.c.user_id == rows.c.user_id).values(
+            total_points=balances.c.total_points + rows.c.delta,
+            available_points=balances.c.available_points + rows.c.delta
+        )
+    )
+
+
+def award_insert_statement(stmt, rows: List[dict]):
+    """Многострочный INSERT наград; stmt - insert(UserReward) диалекта БД"""
+    return stmt.values(rows).on_conflict_do_nothing(index_elements=["prediction_id"]).returning(
+        models.UserReward.prediction_id, models.UserReward.user_id
+    )
+
+
+def award_predictions_bulk(
+        db: Session,
+        awards: Iterable[schemas.AwardPredictionRequest],
+        points: int,
+        award_type: str
+) -> Tuple[List[int], List[int]]:
+    """Выдает награды пачкой в одной транзакции; возвращает (выданные, пропущенные) prediction_id"""
+    unique = {}
+    skipped = []
+    for award in awards:
+        if award.prediction_id in unique:
+            skipped.append(award.prediction_id)
+        else:
+            unique[award.prediction_id] = award
+    if not unique:
+        return [], skipped
+
+    user_ids = sorted({award.user_id for award in unique.values()})
+    _ensure_balances(db, user_ids)
+    _lock_balances(db, user_ids)
+
+    # Уже выданные награды (в том числе параллельной одиночной выдачей) отсекает
+    # уникальный индекс; RETURNING возвращает только реально вставленные строки
+    inserted = db.execute(award_insert_statement(_insert(db, models.UserReward), [
+        {
+            "user_id": award.user_id,
+            "prediction_id": award.prediction_id,
+            "points_awarded": points,
+            "award_type": award_type,
+            "description": f"Предсказание сбылось: '{award.prediction_text}'",
+            "is_claimed": True
+        }
+        for award in unique.values()
+    ])).all()
+
+    awarded = {row.prediction_id for row in inserted}
+    skipped.extend(prediction_id for prediction_id in unique if prediction_id not in awarded)
+    if inserted:
+        deltas = Counter()
+        for row in inserted:
+            deltas[row.user_id] += points
+        _apply_deltas(db, deltas)
+    db.commit()
+    return [prediction_id for prediction_id in unique if prediction_id in awarded], skipped
@@ -5,10 +5,10 @@ import SessionLocal, engine
 import requests
 import os
 import json
-
-models.Base.metadata.create_all(bind=engine)
+from shared.metrics import install_metrics
 
 app = FastAPI(title="Reward Service", version="1.0.0")
+install_metrics(app, engine=engine)
 
 
 def get_db():
@@ -52,6 +52,30 @@ async def award_prediction_success(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/rewards/award-predictions", response_model=schemas.BulkAwardResponse)
+def award_predictions_bulk(
+        request: schemas.BulkAwardRequest,
+        db: Session = Depends(get_db)
+):
+    """Пакетная выдача наград за сбывшиеся предсказания"""
+    rule = crud.get_reward_rule(db, "prediction_success")
+    if not rule:
+        raise HTTPException(status_code=500, detail="Reward rule not configured")
+
+    try:
+        awarded, skipped = crud.award_predictions_bulk(db, request.awards, rule.points, "prediction_success")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return schemas.BulkAwardResponse(
+        status="success",
+        points_per_award=rule.points,
+        awarded_prediction_ids=awarded,
+        skipped_prediction_ids=skipped
+    )
+
+
 @app.get("/rewards/balance/{user_id}")
 async def get_user_balance(user_id: int, db: Session = Depends(get_db)):
     """Получение баланса пользователя"""
@@ -68,6 +92,12 @@ async def get_user_balance(user_id: int, db: Session = Depends(get_db)):
     )
 
 
+@app.get("/rewards/stats/{user_id}", response_model=schemas.UserRewardStatsResponse)
+def get_user_reward_stats(user_id: int, db: Session = Depends(get_db)):
+    """Статистика наград пользователя"""
+    return crud.get_user_reward_stats(db, user_id)
+
+
 @app.post("/rewards/init-rules")
 async def initialize_reward_rules(db: Session = Depends(get_db)):
     """Инициализация стандартных правил наград"""
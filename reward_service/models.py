@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -9,14 +9,23 @@ class UserReward(Base):
     __tablename__ = "user_rewards"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
-    prediction_id = Column(Integer, index=True)
+    user_id = Column(Integer)
+    # Одна награда на предсказание; на индекс опирается ON CONFLICT в crud
+    prediction_id = Column(Integer, unique=True, index=True)
     points_awarded = Column(Integer, default=0)
     award_type = Column(String(50))  # 'prediction_success', 'streak', 'achievement'
     description = Column(Text)
     awarded_at = Column(DateTime(timezone=True), server_default=func.now())
     is_claimed = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Статистика пользователя считается только по индексу (index-only scan)
+        Index(
+            "ix_user_rewards_user_awarded", "user_id", "awarded_at",
+            postgresql_include=["points_awarded"]
+        ),
+    )
+
 
 class RewardRule(Base):
     __tablename__ = "reward_rules"
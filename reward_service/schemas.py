@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class RewardRuleBase(BaseModel):
@@ -26,7 +26,26 @@ class UserBalanceResponse(BaseModel):
     streak_days: int
 
 
+class UserRewardStatsResponse(BaseModel):
+    user_id: int
+    rewards_count: int
+    points_awarded: int
+    last_awarded_at: Optional[datetime] = None
+
+
 class AwardPredictionRequest(BaseModel):
     user_id: int
     prediction_id: int
-    prediction_text: str
\ No newline at end of file
+    prediction_text: str
+
+
+class BulkAwardRequest(BaseModel):
+    awards: List[AwardPredictionRequest] = Field(..., max_length=10000)
+
+
+class BulkAwardResponse(BaseModel):
+    status: str
+    points_per_award: int
+    awarded_prediction_ids: List[int]
+    # Уже награжденные ранее или повторы внутри пачки
+    skipped_prediction_ids: List[int]
@@ -1,5 +1,5 @@
 # shared/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, false, text
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -26,4 +26,80 @@ class Prediction(Base):
     due_date = Column(DateTime(timezone=True))
     status = Column(String(20), default="pending")  # pending, fulfilled, failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    checked_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
+    checked_at = Column(DateTime(timezone=True), nullable=True)
+    # Публичные предсказания видны в поиске всем пользователям
+    is_public = Column(Boolean, default=False, server_default=false(), nullable=False)
+    # Аренда строки воркером проверки: кто взял и до какого момента
+    claimed_by = Column(String(64), nullable=True)
+    claim_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Индексы создаются миграциями (migrations/versions), здесь - для согласованности метаданных
+    __table_args__ = (
+        # Keyset пагинация ленты пользователя: (created_at, id) в пределах user_id
+        Index("ix_predictions_user_created_id", "user_id", "created_at", "id"),
+        # Выборка истекших: в индекс попадают только ожидающие строки
+        Index(
+            "ix_predictions_pending_due", "due_date",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'")
+        ),
+        # Счетчики по статусам для статистики пользователя
+        Index("ix_predictions_user_status", "user_id", "status"),
+        # Кандидаты на перенос в архив (prediction_service/archive.py)
+        Index(
+            "ix_predictions_resolved_checked", "checked_at",
+            postgresql_where=text("status IN ('fulfilled', 'failed')"),
+            sqlite_where=text("status IN ('fulfilled', 'failed')")
+        ),
+        # Полнотекстовый индекс (tsvector/FTS5) зависит от диалекта - только в миграции 0003
+    )
+
+
+class PredictionArchive(Base):
+    __tablename__ = "predictions_archive"
+
+    # Холодное хранилище проверенных предсказаний (prediction_service/archive.py);
+    # id сохраняется прежним, поэтому ссылки из наград остаются верными
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    prediction_text = Column(Text, nullable=False)
+    due_date = Column(DateTime(timezone=True))
+    status = Column(String(20), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    checked_at = Column(DateTime(timezone=True))
+    is_public = Column(Boolean, default=False, server_default=false(), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_predictions_archive_user_created_id", "user_id", "created_at", "id"),
+    )
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class AwardOutbox(Base):
+    __tablename__ = "award_outbox"
+
+    # Награды, ожидающие отправки в reward_service; пишутся в одной транзакции
+    # со статусом предсказания и удаляются после доставки
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    prediction_id = Column(Integer, unique=True, nullable=False)
+    prediction_text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Проверка "нет ли более ранней награды пользователя в ожидании" (get_outbox_batch)
+        Index("ix_award_outbox_user_id_id", "user_id", "id"),
+    )
@@ -0,0 +1,216 @@
+# shared/revocation.py
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from .models import RevokedToken
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Bloom фильтр: отвечает "точно нет" или "возможно да" без хранения самих ключей"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Двойное хеширование: k позиций из одного 128-битного дайджеста
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """Отозванные токены (jti) в памяти процесса, инкрементально синхронизируемые с БД"""
+
+    # Проверка на горячем пути не ходит в БД: отрицательный ответ дает Bloom
+    # фильтр, положительный подтверждается точным словарем. Фоновый поток
+    # подгружает только новые строки revoked_tokens (по revoked_at с окном
+    # перекрытия) и периодически перестраивает структуры, выбрасывая истекшие.
+    # Фильтр и словарь лежат одной парой: перестройка подменяет ее целиком,
+    # и читатель без блокировки никогда не видит пустую или половинчатую копию.
+
+    def __init__(
+            self,
+            session_factory: Callable,
+            refresh_interval: float = 2.0,
+            rebuild_interval: float = 600.0,
+            capacity: int = 10000,
+            purge_expired: bool = False,
+            overlap: float = 30.0
+    ):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.capacity = capacity
+        self.purge_expired = purge_expired
+        self.overlap = timedelta(seconds=overlap)
+        self.checks = 0
+        self.revoked_hits = 0
+        self._state: Tuple[BloomFilter, Dict[str, datetime]] = (BloomFilter(capacity), {})
+        self._last_seen: Optional[datetime] = None
+        self._last_rebuild = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_revoked(self, jti: str) -> bool:
+        self.checks += 1
+        bloom, exact = self._state
+        if jti not in bloom:
+            return False
+        revoked = jti in exact
+        if revoked:
+            self.revoked_hits += 1
+        return revoked
+
+    def add(self, jti: str, expires_at: datetime):
+        """Локальная отметка сразу после отзыва, не дожидаясь синхронизации"""
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def _add(self, jti: str, expires_at: datetime):
+        bloom, exact = self._state
+        if jti in exact:
+            return
+        if bloom.count >= bloom.capacity:
+            bloom = _build_bloom(exact, bloom.capacity * 2)
+            self._state = (bloom, exact)
+        # Сначала словарь, потом фильтр: пока jti нет в фильтре, проверка просто
+        # отвечает "не отозван", как и мгновением раньше
+        exact[jti] = expires_at
+        bloom.add(jti)
+
+    def refresh(self):
+        """Загружает новые отзывы из БД; раз в rebuild_interval - полная перестройка"""
+        now = datetime.now(timezone.utc)
+        rebuild = time.monotonic() - self._last_rebuild >= self.rebuild_interval
+        db = self.session_factory()
+        try:
+            if rebuild and self.purge_expired:
+                db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+                db.commit()
+
+            query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).filter(
+                RevokedToken.expires_at > now
+            )
+            if not rebuild and self._last_seen is not None:
+                # revoked_at - время начала транзакции по часам БД: строка, закоммиченная
+                # позже уже прочитанных, может быть старше их. Окно overlap ловит такие
+                # транзакции (более долгие подберет перестройка); повторы _add игнорирует
+                query = query.filter(RevokedToken.revoked_at >= self._last_seen - self.overlap)
+            rows = query.all()
+        finally:
+            db.close()
+
+        if rebuild:
+            self._rebuild(rows, now)
+            return
+
+        with self._lock:
+            for row in rows:
+                self._add(row.jti, row.expires_at)
+            self._advance(rows)
+
+    def _rebuild(self, rows, now: datetime):
+        # Истекшие токены и так не пройдут проверку exp - в новую копию их не берем.
+        # Копия строится в стороне и подменяется одним присваиванием
+        exact = {row.jti: row.expires_at for row in rows}
+        bloom = _build_bloom(exact, max(self.capacity, len(exact) * 2))
+        with self._lock:
+            # Отзывы, добавленные через add() во время загрузки, могли не попасть в rows
+            for jti, expires_at in self._state[1].items():
+                if jti not in exact and _as_utc(expires_at) > now:
+                    exact[jti] = expires_at
+                    bloom.add(jti)
+            self._state = (bloom, exact)
+            self._last_rebuild = time.monotonic()
+            self._advance(rows)
+
+    def _advance(self, rows):
+        # Водяной знак берется из БД, а не из локальных часов - расхождение часов не важно
+        seen = [_as_utc(row.revoked_at) for row in rows if row.revoked_at is not None]
+        if self._last_seen is not None:
+            seen.append(self._last_seen)
+        if seen:
+            self._last_seen = max(seen)
+
+    def start(self):
+        """Первая загрузка списка и запуск фонового обновления (идемпотентно)"""
+        # Первая загрузка синхронная и идет в БД - вызывать при старте приложения,
+        # а в async коде через asyncio.to_thread
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="revocation-refresh", daemon=True)
+
+        # Загружаем до запуска потока, чтобы ранее отозванные токены не проскочили после старта
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Initial revocation list load failed: {e}")
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                # БД недоступна - продолжаем работать с последним известным списком
+                logger.warning(f"Revocation list refresh failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._state[1]),
+            "checks": self.checks,
+            "revoked_hits": self.revoked_hits,
+            "last_seen": self._last_seen.isoformat() if self._last_seen else None,
+        }
+
+
+def _build_bloom(keys, capacity: int) -> BloomFilter:
+    bloom = BloomFilter(capacity)
+    for key in keys:
+        bloom.add(key)
+    return bloom
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает наивные значения; в БД время хранится в UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def register_metrics(revocations: RevocationList):
+    REGISTRY.callback(
+        "revocation_list_size", "Revoked, not yet expired tokens held in memory",
+        lambda: revocations.stats()["revoked"]
+    )
+    REGISTRY.callback(
+        "revocation_checks_total", "Token revocation checks",
+        lambda: revocations.checks, kind="counter"
+    )
+    REGISTRY.callback(
+        "revocation_rejections_total", "Requests rejected because the token was revoked",
+        lambda: revocations.revoked_hits, kind="counter"
+    )
@@ -0,0 +1,42 @@
+# tests/conftest.py
+# Тесты идут без внешних сервисов: SQLite в памяти и fakeredis вместо Redis.
+# Зависимости - tests/requirements.txt
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_flat_modules = {}
+
+
+def _import_flat(service: str, name: str):
+    # api_gateway и reward_service импортируют свои модули без пакета (import models),
+    # а имена у них совпадают. Модули сервиса загружаются с его каталогом в sys.path
+    # и сразу убираются из sys.modules: ссылки на соседей остаются у самих модулей
+    key = (service, name)
+    if key not in _flat_modules:
+        service_dir = str(ROOT / service)
+        before = set(sys.modules)
+        sys.path.insert(0, service_dir)
+        try:
+            _flat_modules[key] = importlib.import_module(name)
+        finally:
+            sys.path.remove(service_dir)
+            for loaded in set(sys.modules) - before:
+                if (getattr(sys.modules[loaded], "__file__", None) or "").startswith(service_dir):
+                    _flat_modules.setdefault((service, loaded), sys.modules.pop(loaded))
+    return _flat_modules[key]
+
+
+@pytest.fixture(scope="session")
+def import_flat():
+    """import_flat("api_gateway", "main") - модуль сервиса с плоскими импортами"""
+    return _import_flat
@@ -0,0 +1,96 @@
+# tests/test_archive.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from prediction_service import archive, crud, models
+
+NOW = datetime.utcnow()
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(
+        engine, tables=[models.Prediction.__table__, models.PredictionArchive.__table__]
+    )
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(archive, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def add(session_factory, prediction_id: int, status: str, checked_days_ago=None, user_id: int = 1):
+    db = session_factory()
+    checked_at = NOW - timedelta(days=checked_days_ago) if checked_days_ago is not None else None
+    db.add(models.Prediction(
+        id=prediction_id,
+        user_id=user_id,
+        prediction_text=f"prediction {prediction_id}",
+        due_date=NOW - timedelta(days=90),
+        status=status,
+        created_at=NOW - timedelta(days=100) + timedelta(minutes=prediction_id),
+        checked_at=checked_at
+    ))
+    db.commit()
+    db.close()
+
+
+def table_ids(session_factory, model) -> list:
+    db = session_factory()
+    try:
+        return sorted(row.id for row in db.query(model))
+    finally:
+        db.close()
+
+
+def test_archive_moves_only_old_resolved_rows(session_factory):
+    add(session_factory, 1, "fulfilled", checked_days_ago=60)
+    add(session_factory, 2, "failed", checked_days_ago=45)
+    add(session_factory, 3, "fulfilled", checked_days_ago=5)
+    add(session_factory, 4, "pending")
+
+    assert archive.archive_resolved(days=30, batch_size=1) == 2
+
+    assert table_ids(session_factory, models.Prediction) == [3, 4]
+    assert table_ids(session_factory, models.PredictionArchive) == [1, 2]
+    db = session_factory()
+    moved = db.get(models.PredictionArchive, 2)
+    assert (moved.status, moved.prediction_text, moved.user_id) == ("failed", "prediction 2", 1)
+    assert moved.archived_at is not None
+    db.close()
+
+
+def test_archive_batch_respects_batch_size(session_factory):
+    for prediction_id in range(1, 6):
+        add(session_factory, prediction_id, "fulfilled", checked_days_ago=60 - prediction_id)
+    db = session_factory()
+    # Сначала уходят проверенные раньше всех
+    assert archive.archive_batch(db, NOW - timedelta(days=30), batch_size=2) == 2
+    db.close()
+    assert table_ids(session_factory, models.PredictionArchive) == [1, 2]
+    assert archive.archive_resolved(days=30, batch_size=2) == 3
+    assert archive.archive_resolved(days=30, batch_size=2) == 0
+
+
+def test_history_reads_hot_and_archived_rows(session_factory):
+    for prediction_id in range(1, 7):
+        add(session_factory, prediction_id, "fulfilled", checked_days_ago=60 if prediction_id % 2 else 1)
+    add(session_factory, 7, "fulfilled", checked_days_ago=60, user_id=2)
+    archive.archive_resolved(days=30, batch_size=100)
+    assert table_ids(session_factory, models.PredictionArchive) == [1, 3, 5, 7]
+
+    db = session_factory()
+    pages, cursor = [], None
+    while True:
+        rows, cursor = crud.get_user_predictions_page(db, 1, limit=4, cursor=cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            break
+    assert pages == [[6, 5, 4, 3], [2, 1]]
+    assert [row.id for row in crud.get_user_predictions(db, 1, skip=1, limit=3)] == [5, 4, 3]
+    assert isinstance(crud.get_prediction_or_archived(db, 5), models.PredictionArchive)
+    db.close()
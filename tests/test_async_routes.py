@@ -0,0 +1,103 @@
+# tests/test_async_routes.py
+# Маршруты режима PREDICTION_ASYNC_DB: aiosqlite вместо asyncpg, fakeredis вместо Redis
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from jose import jwt
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from auth_service.user_cache import user_cache
+from prediction_service import async_routes, models
+from prediction_service.cache import prediction_cache
+from prediction_service.redis_client import create_async_redis_client
+from prediction_service.scheduler import due_scheduler
+from shared.config import JWT_ALGORITHM, JWT_SECRET
+from shared.models import User
+
+
+def token(username: str) -> dict:
+    expire = datetime.utcnow() + timedelta(minutes=5)
+    return {"Authorization": f"Bearer {jwt.encode({'sub': username, 'exp': expire}, JWT_SECRET, algorithm=JWT_ALGORITHM)}"}
+
+
+@pytest.fixture
+def run():
+    async def scenario(body):
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(models.Base.metadata.create_all, tables=[
+                User.__table__, models.Prediction.__table__, models.PredictionArchive.__table__
+            ])
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        async with session_factory() as db:
+            db.add(User(id=1, username="alice", email="alice@example.com", hashed_password="x"))
+            await db.commit()
+
+        async def override_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(async_routes.router)
+        app.dependency_overrides[async_routes.get_async_db] = override_db
+
+        async_redis = create_async_redis_client("fakeredis://")
+        prediction_cache.async_client = due_scheduler.async_client = async_redis
+        prediction_cache.local.clear()
+        user_cache.clear()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await body(client)
+        finally:
+            prediction_cache.async_client = due_scheduler.async_client = None
+            await async_redis.aclose()
+            await engine.dispose()
+
+    return lambda body: asyncio.run(scenario(body))
+
+
+def test_user_is_resolved_on_async_session(run):
+    async def body(client):
+        response = await client.post(
+            "/predictions/", headers=token("alice"),
+            json={"prediction_text": "rain", "due_date": "2030-01-01T00:00:00"}
+        )
+        assert response.status_code == 200
+        assert response.json()["user_id"] == 1
+        assert user_cache.get("alice").id == 1
+
+    run(body)
+
+
+def test_unknown_user_is_rejected(run):
+    async def body(client):
+        response = await client.get("/predictions/", headers=token("mallory"))
+        assert response.status_code == 401
+
+    run(body)
+
+
+def test_async_routes_use_async_redis(run):
+    async def body(client):
+        headers = token("alice")
+        created = await client.post(
+            "/predictions/", headers=headers,
+            json={"prediction_text": "rain", "due_date": "2030-01-01T00:00:00"}
+        )
+        prediction_id = created.json()["id"]
+        # Расписание и кэш видны синхронному клиенту воркеров
+        assert due_scheduler.client.zscore(due_scheduler.key, prediction_id) is not None
+
+        assert (await client.get(f"/predictions/{prediction_id}", headers=headers)).status_code == 200
+        assert prediction_cache._get_remote(prediction_cache.prediction_key(prediction_id))["id"] == prediction_id
+
+        assert (await client.delete(f"/predictions/{prediction_id}", headers=headers)).status_code == 200
+        assert due_scheduler.client.zscore(due_scheduler.key, prediction_id) is None
+        assert (await client.get(f"/predictions/{prediction_id}", headers=headers)).status_code == 404
+
+    run(body)
@@ -0,0 +1,97 @@
+# tests/test_auth_routes.py
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth_service.database import get_db
+from auth_service.dependencies import revocation_list
+from auth_service.main import app
+from auth_service.user_cache import user_cache
+from shared.config import JWT_ALGORITHM, JWT_SECRET
+from shared.models import Base, User
+
+
+def make_token(username: str, minutes: int = 5, **claims) -> str:
+    payload = {"sub": username, "exp": datetime.utcnow() + timedelta(minutes=minutes), **claims}
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": 1, "username": "alice", "email": "alice@example.com", "hashed_password": "x"},
+            {"id": 2, "username": "bob", "email": "bob@example.com", "hashed_password": "x"},
+        ])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine):
+    factory = sessionmaker(bind=engine, autoflush=False)
+
+    def override_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    user_cache.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    user_cache.clear()
+
+
+def test_introspect_reports_each_token(client):
+    revoked_jti = uuid.uuid4().hex
+    revocation_list.add(revoked_jti, datetime.now(timezone.utc) + timedelta(minutes=5))
+    tokens = [
+        make_token("alice"),
+        make_token("alice", minutes=-1),
+        "garbage",
+        make_token("bob", jti=revoked_jti),
+        make_token("mallory"),
+        jwt.encode({"exp": datetime.utcnow() + timedelta(minutes=5)}, JWT_SECRET, algorithm=JWT_ALGORITHM),
+    ]
+
+    response = client.post("/auth/introspect", json={"tokens": tokens})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["active"], r["error"]) for r in results] == [
+        (True, None),
+        (False, "expired"),
+        (False, "invalid_token"),
+        (False, "revoked"),
+        (False, "unknown_user"),
+        (False, "invalid_token"),
+    ]
+    assert results[0]["user"]["id"] == 1
+
+
+def test_introspect_loads_users_in_one_query(client, engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    tokens = [make_token("alice"), make_token("bob"), make_token("alice")]
+    first = client.post("/auth/introspect", json={"tokens": tokens}).json()["results"]
+    assert [r["user"]["username"] for r in first] == ["alice", "bob", "alice"]
+    assert len(statements) == 1
+
+    # Повторная проверка берет пользователей из кэша
+    client.post("/auth/introspect", json={"tokens": tokens})
+    assert len(statements) == 1
+
+
+def test_introspect_limits_batch_size(client):
+    assert client.post("/auth/introspect", json={"tokens": ["x"] * 1001}).status_code == 422
@@ -0,0 +1,92 @@
+# tests/test_bulk_import.py
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_service import bulk_import
+from auth_service.bulk_import import ImportReport, import_users
+from auth_service.hashing import pwd_context
+from shared.models import Base, User
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    factory = sessionmaker(bind=engine, autoflush=False)
+    db = factory()
+    db.add(User(username="taken", email="taken@example.com", hashed_password="x"))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(bulk_import, "SessionLocal", factory)
+    # Минимальная стоимость bcrypt - хеширование в тестах почти бесплатно
+    bulk_import._init_hash_worker(4)
+    yield factory
+    engine.dispose()
+
+
+def run_import(text: str, fmt: str = "ndjson", batch_size: int = 10):
+    errors = io.StringIO()
+    report = ImportReport(errors)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        import_users(io.StringIO(text), fmt, batch_size, executor, 2, report)
+    return report, [json.loads(line) for line in errors.getvalue().splitlines()]
+
+
+def test_imports_valid_rows_and_reports_the_rest(session_factory):
+    prehashed = pwd_context.hash("prehashed-pass")
+    lines = [
+        {"username": "alice", "email": "alice@example.com", "password": "secret1"},
+        "{not json",
+        {"username": "taken", "email": "new@example.com", "password": "secret1"},
+        {"username": "bob", "email": "alice@example.com", "password": "secret1"},
+        {"username": "carol", "email": "carol@example.com", "hashed_password": prehashed},
+        {"username": "dave", "email": "dave@example.com", "hashed_password": "plain"},
+    ]
+    text = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+    report, errors = run_import(text, batch_size=4)
+
+    assert (report.processed, report.imported, report.failed) == (6, 2, 4)
+    assert [(error["line"], error["username"]) for error in errors] == [
+        (2, None), (3, "taken"), (4, "bob"), (6, "dave")
+    ]
+    db = session_factory()
+    users = {user.username: user for user in db.query(User)}
+    assert set(users) == {"taken", "alice", "carol"}
+    assert pwd_context.verify("secret1", users["alice"].hashed_password)
+    # Импорт со сниженной стоимостью - хеш обновится при первом входе
+    assert pwd_context.needs_update(users["alice"].hashed_password)
+    assert users["carol"].hashed_password == prehashed
+    db.close()
+
+
+def test_reads_csv(session_factory):
+    text = "username,email,password\nerin,erin@example.com,secret1\n"
+    report, errors = run_import(text, fmt="csv")
+    assert (report.imported, report.failed, errors) == (1, 0, [])
+
+
+def test_insert_conflict_falls_back_to_savepoints(session_factory):
+    # Конфликт, появившийся после _drop_conflicts: пачка целиком не вставляется,
+    # поэтому строки вставляются по одной в SAVEPOINT
+    rows = [
+        {"line": 1, "username": "frank", "email": "frank@example.com", "hashed_password": "h"},
+        {"line": 2, "username": "taken", "email": "other@example.com", "hashed_password": "h"},
+        {"line": 3, "username": "grace", "email": "grace@example.com", "hashed_password": "h"},
+    ]
+    errors = io.StringIO()
+    report = ImportReport(errors)
+    db = session_factory()
+    bulk_import._insert_batch(db, rows, report)
+    db.close()
+
+    assert (report.imported, report.failed) == (2, 1)
+    assert json.loads(errors.getvalue())["line"] == 2
+    db = session_factory()
+    assert {username for (username,) in db.query(User.username)} == {"taken", "frank", "grace"}
+    db.close()
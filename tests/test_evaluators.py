@@ -0,0 +1,87 @@
+# tests/test_evaluators.py
+from types import SimpleNamespace
+
+import pytest
+
+from prediction_service import evaluators, tasks
+from prediction_service.evaluators import PredictionEvaluator, RandomEvaluator, load_evaluator, register_evaluator
+from prediction_service.tasks import PredictionChecker
+
+
+def rows(*ids):
+    return [SimpleNamespace(id=prediction_id, user_id=1, prediction_text="text") for prediction_id in ids]
+
+
+class OnlyEven(PredictionEvaluator):
+    """Знает исход только четных id"""
+
+    name = "only-even"
+
+    def evaluate_batch(self, predictions):
+        return {prediction.id: prediction.id % 4 == 0 for prediction in predictions if prediction.id % 2 == 0}
+
+
+def test_load_by_registered_name(monkeypatch):
+    monkeypatch.setitem(evaluators._registry, "only-even", OnlyEven)
+    assert isinstance(load_evaluator("random"), RandomEvaluator)
+    assert isinstance(load_evaluator("only-even"), OnlyEven)
+
+
+def test_register_evaluator_uses_class_name(monkeypatch):
+    monkeypatch.setattr(evaluators, "_registry", dict(evaluators._registry))
+    assert register_evaluator(OnlyEven) is OnlyEven
+    assert evaluators._registry["only-even"] is OnlyEven
+
+
+def test_load_by_module_path():
+    assert isinstance(load_evaluator("prediction_service.evaluators:RandomEvaluator"), RandomEvaluator)
+
+
+def test_load_rejects_unknown_and_foreign_classes():
+    with pytest.raises(ValueError):
+        load_evaluator("no-such-evaluator")
+    with pytest.raises(TypeError):
+        load_evaluator("prediction_service.evaluators:load_evaluator")
+    with pytest.raises(ImportError):
+        load_evaluator("no_such_module:Evaluator")
+
+
+def test_random_evaluator_decides_every_prediction():
+    predictions = rows(*range(1, 101))
+    first = RandomEvaluator(seed=7).evaluate_batch(predictions)
+    assert set(first) == set(range(1, 101))
+    assert set(first.values()) == {True, False}
+    # С тем же seed исходы повторяются
+    assert RandomEvaluator(seed=7).evaluate_batch(predictions) == first
+    assert RandomEvaluator().evaluate_batch([]) == {}
+
+
+def test_checker_records_outcomes_and_treats_missing_as_undecided():
+    checker = PredictionChecker(evaluator=OnlyEven())
+    checker.db.close()
+    before = dict(tasks.EVALUATOR_OUTCOMES._values)
+
+    outcomes = checker.evaluate(rows(1, 2, 3, 4))
+    assert outcomes == {2: False, 4: True}
+    assert checker.decide(rows(3)[0]) is None
+
+    def delta(outcome):
+        key = ("only-even", outcome)
+        return tasks.EVALUATOR_OUTCOMES._values.get(key, 0) - before.get(key, 0)
+
+    assert (delta("fulfilled"), delta("failed"), delta("undecided")) == (1, 1, 3)
+
+
+def test_checker_counts_evaluator_errors():
+    class Broken(PredictionEvaluator):
+        name = "broken-test"
+
+        def evaluate_batch(self, predictions):
+            raise RuntimeError("boom")
+
+    checker = PredictionChecker(evaluator=Broken())
+    checker.db.close()
+    errors_before = tasks.EVALUATOR_ERRORS._values.get(("broken-test",), 0)
+    with pytest.raises(RuntimeError):
+        checker.evaluate(rows(1))
+    assert tasks.EVALUATOR_ERRORS._values[("broken-test",)] == errors_before + 1
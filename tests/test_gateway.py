@@ -0,0 +1,233 @@
+# tests/test_gateway.py
+# Маршруты gateway без сети: upstream-сервисы заменены httpx.MockTransport
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from jose import jwt
+
+from shared.config import JWT_ALGORITHM, JWT_SECRET
+
+
+def make_token(user_id=1, minutes: int = 5, **claims) -> str:
+    payload = {"sub": "alice", "user_id": user_id, "exp": datetime.utcnow() + timedelta(minutes=minutes), **claims}
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+class Upstreams:
+    """Заглушки сервисов: handlers[(service, path)] -> httpx.Response; запросы пишутся в calls"""
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.handlers = {}
+        self.calls = []
+        for service, base_url in gateway.SERVICES.items():
+            gateway.upstreams._clients[service] = httpx.AsyncClient(
+                base_url=base_url, transport=httpx.MockTransport(self._handler(service))
+            )
+
+    def _handler(self, service: str):
+        async def handle(request: httpx.Request) -> httpx.Response:
+            self.calls.append((service, request.url.path, request.headers.get("authorization")))
+            handler = self.handlers.get((service, request.url.path))
+            if handler is None:
+                return httpx.Response(404, json={"detail": "Not Found"})
+            return await handler(request)
+
+        return handle
+
+    def json(self, service: str, path: str, body, delay: float = 0.0):
+        async def handler(request):
+            await asyncio.sleep(delay)
+            return httpx.Response(200, json=body)
+
+        self.handlers[(service, path)] = handler
+
+
+@pytest.fixture
+def gateway(import_flat, monkeypatch):
+    main = import_flat("api_gateway", "main")
+    upstream = import_flat("api_gateway", "upstream")
+    # Свежие пулы, breaker-ы и кэши на каждый тест
+    monkeypatch.setattr(main, "upstreams", upstream.UpstreamClients(main.SERVICES))
+    monkeypatch.setattr(main, "token_cache", import_flat("api_gateway", "token_cache").TokenCache())
+    monkeypatch.setattr(main, "singleflight", import_flat("api_gateway", "singleflight").SingleFlight())
+    return main
+
+
+def call(gateway, scenario):
+    """Выполняет scenario(upstreams, client) против ASGI приложения gateway"""
+    async def run():
+        upstreams = Upstreams(gateway)
+        transport = httpx.ASGITransport(app=gateway.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+                return await scenario(upstreams, client)
+        finally:
+            await gateway.upstreams.close()
+
+    return asyncio.run(run())
+
+
+def test_dashboard_with_all_upstreams_healthy(gateway):
+    token = make_token(user_id=7)
+
+    async def scenario(upstreams, client):
+        upstreams.json("predictions", "/predictions/", [{"id": 1, "user_id": 7}])
+        upstreams.json("rewards", "/rewards/balance/7", {"user_id": 7, "total_points": 30})
+        upstreams.json("rewards", "/rewards/stats/7", {"user_id": 7, "total_rewards": 3})
+        response = await client.get("/user/dashboard", params={"token": token})
+        return response, upstreams.calls
+
+    response, calls = call(gateway, scenario)
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": 7,
+        "errors": {},
+        "predictions": [{"id": 1, "user_id": 7}],
+        "balance": {"user_id": 7, "total_points": 30},
+        "stats": {"user_id": 7, "total_rewards": 3},
+        "partial": False,
+    }
+    # Предсказания выбираются по проброшенному токену, а не по id в пути
+    assert ("predictions", "/predictions/", f"Bearer {token}") in calls
+
+
+def test_dashboard_reports_failed_part(gateway):
+    async def scenario(upstreams, client):
+        upstreams.json("predictions", "/predictions/", [])
+        upstreams.json("rewards", "/rewards/balance/1", {"user_id": 1})
+        response = await client.get("/user/dashboard", params={"token": make_token()})
+        return response.json()
+
+    dashboard = call(gateway, scenario)
+    assert dashboard["partial"] is True
+    assert dashboard["stats"] is None
+    assert dashboard["errors"] == {"stats": "upstream returned 404"}
+    assert dashboard["predictions"] == []
+
+
+def test_token_verified_locally_and_cached(gateway):
+    token = make_token(user_id=3)
+
+    async def scenario(upstreams, client):
+        upstreams.json("rewards", "/rewards/balance/3", {"user_id": 3})
+        for _ in range(2):
+            assert (await client.get("/user/rewards", params={"token": token})).status_code == 200
+        return upstreams.calls
+
+    calls = call(gateway, scenario)
+    assert [service for service, _, _ in calls] == ["rewards", "rewards"]
+    assert gateway.token_cache.hits == 1
+
+
+def test_token_without_user_id_resolved_once_via_auth(gateway):
+    token = make_token(user_id=None)
+
+    async def scenario(upstreams, client):
+        upstreams.json("auth", "/auth/verify", {"status": "valid", "user": {"id": 5}})
+        upstreams.json("rewards", "/rewards/balance/5", {"user_id": 5})
+        for _ in range(3):
+            assert (await client.get("/user/rewards", params={"token": token})).json() == {"user_id": 5}
+        return upstreams.calls
+
+    calls = call(gateway, scenario)
+    assert [path for service, path, _ in calls if service == "auth"] == ["/auth/verify"]
+
+
+@pytest.mark.parametrize("token", [make_token(minutes=-1), jwt.encode({"sub": "alice"}, "wrong-secret"), "garbage"])
+def test_invalid_token_rejected_without_upstream_calls(gateway, token):
+    async def scenario(upstreams, client):
+        response = await client.get("/user/rewards", params={"token": token})
+        return response.status_code, upstreams.calls
+
+    assert call(gateway, scenario) == (401, [])
+
+
+def test_token_cache_entry_expires_with_token(import_flat, monkeypatch):
+    token_cache = import_flat("api_gateway", "token_cache")
+    now = [1000.0]
+    monkeypatch.setattr(token_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = token_cache.TokenCache(max_size=2, ttl=300)
+
+    cache.put("a", {"sub": "alice"}, exp=1010)
+    now[0] = 1009
+    assert cache.get("a") == {"sub": "alice"}
+    now[0] = 1010
+    assert cache.get("a") is None
+
+    for name in ("b", "c", "d"):
+        cache.put(name, {"sub": name})
+    assert cache.get("b") is None and cache.stats()["size"] == 2
+
+
+class ChunkStream(httpx.AsyncByteStream):
+    """Тело upstream по кускам; fail_after - оборвать поток после стольких кусков"""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def __aiter__(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise httpx.ReadError("upstream reset")
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_stream_proxy_passes_body_through_undecoded(gateway):
+    body = gzip.compress(json.dumps({"user_id": 1, "total_points": 10}).encode())
+    stream = ChunkStream([body[:10], body[10:]])
+
+    async def scenario(upstreams, client):
+        async def handler(request):
+            return httpx.Response(
+                200, stream=stream,
+                headers={"content-encoding": "gzip", "content-length": str(len(body)), "keep-alive": "timeout=5"}
+            )
+
+        upstreams.handlers[("rewards", "/rewards/balance/1")] = handler
+        return await client.get("/user/rewards", params={"token": make_token(), "stream": "true"})
+
+    response = call(gateway, scenario)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "keep-alive" not in response.headers
+    assert response.json() == {"user_id": 1, "total_points": 10}
+    assert stream.closed
+
+
+def test_stream_proxy_closes_upstream_when_body_breaks(gateway):
+    stream = ChunkStream([b'{"user_id": 1', b', "x": 2}'], fail_after=1)
+
+    async def scenario(upstreams, client):
+        async def handler(request):
+            return httpx.Response(200, stream=stream)
+
+        upstreams.handlers[("rewards", "/rewards/balance/1")] = handler
+        with pytest.raises(httpx.ReadError):
+            await client.get("/user/rewards", params={"token": make_token(), "stream": "true"})
+
+    call(gateway, scenario)
+    assert stream.closed
+
+
+def test_stream_proxy_keeps_upstream_status(gateway):
+    async def scenario(upstreams, client):
+        async def handler(request):
+            return httpx.Response(404, stream=ChunkStream([b'{"detail": "Not Found"}']))
+
+        upstreams.handlers[("rewards", "/rewards/balance/1")] = handler
+        return await client.get("/user/rewards", params={"token": make_token(), "stream": "true"})
+
+    response = call(gateway, scenario)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Not Found"}
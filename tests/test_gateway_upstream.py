@@ -0,0 +1,235 @@
+# tests/test_gateway_upstream.py
+import asyncio
+import gc
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def upstream(import_flat):
+    return import_flat("api_gateway", "upstream")
+
+
+def test_one_pooled_client_per_upstream(upstream, monkeypatch):
+    monkeypatch.setenv("UPSTREAM_REWARDS_MAX_CONNECTIONS", "7")
+    clients = upstream.UpstreamClients({"auth": "http://auth", "rewards": "http://rewards"})
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            clients.client("auth")
+        await clients.start()
+        try:
+            assert clients.client("auth") is clients.client("auth")
+            assert clients.client("auth") is not clients.client("rewards")
+            # Лимиты пула задаются на каждый upstream отдельно
+            assert clients.client("rewards")._transport._pool._max_connections == 7
+            assert clients.client("auth")._transport._pool._max_connections == upstream.UPSTREAM_MAX_CONNECTIONS
+        finally:
+            await clients.close()
+        with pytest.raises(RuntimeError):
+            clients.client("auth")
+
+    asyncio.run(scenario())
+
+
+def test_per_call_timeout_overrides_pool_timeout(upstream):
+    clients = upstream.UpstreamClients({"auth": "http://auth"})
+    seen = []
+
+    async def handler(request):
+        seen.append(request.extensions["timeout"])
+        return httpx.Response(200)
+
+    async def scenario():
+        clients._clients["auth"] = httpx.AsyncClient(base_url="http://auth", transport=httpx.MockTransport(handler))
+        await clients.get("auth", "/a", timeout=0.25)
+        await clients.get("auth", "/b")
+        await clients.close()
+
+    asyncio.run(scenario())
+    assert seen[0]["read"] == 0.25
+    assert seen[1]["read"] != 0.25
+
+
+def make_clients(upstream, handler, **policy):
+    clients = upstream.UpstreamClients({"svc": "http://svc"})
+    for name, value in policy.items():
+        setattr(clients.policies["svc"], name, value)
+    clients._clients["svc"] = httpx.AsyncClient(base_url="http://svc", transport=httpx.MockTransport(handler))
+    return clients
+
+
+def responder(*statuses):
+    """Обработчик, отвечающий статусами по очереди (последний - дальше всегда)"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request.method)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1])
+
+    return handler, calls
+
+
+def test_breaker_opens_and_recovers_after_reset(upstream):
+    handler, calls = responder(500, 500, 200)
+    clients = make_clients(upstream, handler, max_retries=0)
+    breaker = clients.policies["svc"].breaker
+    breaker.failure_threshold, breaker.reset_timeout = 2, 0.05
+
+    async def scenario():
+        for _ in range(2):
+            assert (await clients.get("svc", "/")).status_code == 500
+        with pytest.raises(upstream.CircuitOpenError):
+            await clients.get("svc", "/")
+        assert len(calls) == 2
+
+        await asyncio.sleep(0.06)
+        # Пробный запрос в half-open прошел - breaker снова замкнут
+        assert (await clients.get("svc", "/")).status_code == 200
+        assert breaker.state == breaker.CLOSED
+
+    asyncio.run(scenario())
+    assert breaker.trips == 1
+
+
+def test_retries_idempotent_requests_within_budget(upstream):
+    handler, calls = responder(503, 200)
+    clients = make_clients(upstream, handler, max_retries=1)
+
+    assert asyncio.run(clients.get("svc", "/")).status_code == 200
+    assert len(calls) == 2
+    assert clients.policies["svc"].retries == 1
+
+
+def test_no_retry_for_post_or_empty_budget(upstream):
+    handler, calls = responder(503)
+    clients = make_clients(upstream, handler, max_retries=3)
+    clients.policies["svc"].budget._tokens = 0
+
+    async def scenario():
+        assert (await clients.get("svc", "/")).status_code == 503
+        assert (await clients.request("svc", "POST", "/")).status_code == 503
+
+    asyncio.run(scenario())
+    assert calls == ["GET", "POST"]
+
+
+def test_hedged_request_returns_faster_copy(upstream):
+    delays = [0.5, 0.0]
+
+    async def handler(request):
+        await asyncio.sleep(delays.pop(0))
+        return httpx.Response(200, json={"fast": not delays})
+
+    clients = make_clients(upstream, handler, hedge_delay=0.02)
+    response = asyncio.run(clients.get("svc", "/"))
+    assert response.json() == {"fast": True}
+    assert clients.policies["svc"].hedges == 1
+
+
+def test_failed_hedge_loser_is_not_reported_as_unretrieved(upstream):
+    unretrieved = []
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        for _ in range(20):
+            release = asyncio.Event()
+            arrived = []
+
+            async def handler(request):
+                arrived.append(request)
+                if len(arrived) == 2:
+                    release.set()
+                await release.wait()
+                # Оба запроса завершаются в одной итерации: основной успешно, копия с ошибкой
+                if request is arrived[0]:
+                    return httpx.Response(200)
+                raise httpx.ConnectError("boom", request=request)
+
+            clients = make_clients(upstream, handler, hedge_delay=0.01)
+            assert (await clients.get("svc", "/")).status_code == 200
+            await clients.close()
+        gc.collect()
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert unretrieved == []
+
+
+@pytest.fixture
+def singleflight(import_flat):
+    return import_flat("api_gateway", "singleflight").SingleFlight()
+
+
+def test_singleflight_coalesces_concurrent_calls(singleflight):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return len(calls)
+
+    async def scenario():
+        first = await asyncio.gather(*(singleflight.do("key", fetch) for _ in range(5)))
+        # Завершенный вызов не кэшируется: следующий запрос идет в upstream
+        second = await singleflight.do("key", fetch)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == [1] * 5 and second == 2
+    assert singleflight.stats() == {"calls": 2, "coalesced": 4, "inflight": 0}
+
+
+def test_singleflight_waiter_cancel_does_not_cancel_others(singleflight):
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        impatient = asyncio.ensure_future(asyncio.wait_for(singleflight.do("key", fetch), 0.01))
+        patient = asyncio.ensure_future(singleflight.do("key", fetch))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_singleflight_shares_errors(singleflight):
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise httpx.ConnectError("down")
+
+    async def scenario():
+        return await asyncio.gather(*(singleflight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+    assert singleflight.calls == 1
+
+
+def test_gateway_coalesces_only_same_user_and_timeout(import_flat, monkeypatch):
+    main = import_flat("api_gateway", "main")
+    monkeypatch.setattr(main, "singleflight", import_flat("api_gateway", "singleflight").SingleFlight())
+    sent = []
+
+    async def get(service, path, headers, timeout):
+        sent.append((path, headers["Authorization"], timeout))
+        await asyncio.sleep(0.02)
+        return httpx.Response(200)
+
+    monkeypatch.setattr(main.upstreams, "get", get)
+
+    async def scenario():
+        await asyncio.gather(
+            main.coalesced_get("rewards", "/b", "t1", user_id=1),
+            main.coalesced_get("rewards", "/b", "t1", user_id=1),
+            main.coalesced_get("rewards", "/b", "t2", user_id=2),
+            main.coalesced_get("rewards", "/b", "t1", user_id=1, timeout=0.5),
+        )
+
+    asyncio.run(scenario())
+    assert sorted(sent, key=str) == sorted(
+        [("/b", "Bearer t1", None), ("/b", "Bearer t2", None), ("/b", "Bearer t1", 0.5)], key=str
+    )
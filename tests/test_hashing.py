@@ -0,0 +1,46 @@
+# tests/test_hashing.py
+import threading
+
+import pytest
+
+from auth_service.hashing import HashingOverloaded, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_in_spawned_pool(hasher):
+    hashed = hasher.hash("secret")
+    assert hasher.verify_and_update("secret", hashed) == (True, None)
+    assert hasher.verify_and_update("wrong", hashed)[0] is False
+    assert hasher._executor._mp_context.get_start_method() == "spawn"
+    assert hasher.pending == 0
+
+
+def test_sheds_load_over_queue_limit(hasher):
+    hasher.queue_limit = 1
+    hashed = hasher.hash("warm-up")
+    started = threading.Event()
+    release = threading.Event()
+    original = hasher._executor.submit
+
+    def slow_submit(fn, *args):
+        started.set()
+        release.wait(5)
+        return original(fn, *args)
+
+    hasher._executor.submit = slow_submit
+    worker = threading.Thread(target=hasher.verify_and_update, args=("warm-up", hashed))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HashingOverloaded):
+            hasher.hash("second")
+    finally:
+        release.set()
+        worker.join()
+    assert hasher.rejected == 1 and hasher.pending == 0
@@ -0,0 +1,70 @@
+# tests/test_metrics.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from shared.metrics import CallbackMetric, Counter, Histogram, Metric, Registry, install_metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, route="/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 4.05',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("reason",))
+    counter.inc(reason='bad "quote"\nline')
+    assert counter.render()[-1] == 'errors_total{reason="bad \\"quote\\"\\nline"} 1'
+
+
+def test_callback_metric_with_labels():
+    metric = CallbackMetric("state", "State", lambda: {("a",): 1, ("b",): 2}, labelnames=("name",))
+    assert metric.render()[2:] == ['state{name="a"} 1', 'state{name="b"} 2']
+
+
+def test_registry_returns_existing_metric_on_reregistration():
+    registry = Registry()
+    first = registry.counter("requests_total", "Requests")
+    assert registry.counter("requests_total", "Requests") is first
+    first.inc()
+    assert registry.render().count("requests_total 1") == 1
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("x", "x")
+
+
+def test_middleware_labels_route_template_and_db_time():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    app = FastAPI()
+    install_metrics(app, engine=engine)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for item_id in (1, 2):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in body
+    assert "/items/1" not in body
+    assert 'http_request_db_queries_bucket{method="GET",route="/items/{item_id}",le="2.0"} 2' in body
@@ -0,0 +1,132 @@
+# tests/test_outbox.py
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from prediction_service import models, outbox
+from prediction_service.outbox import OutboxRelay
+
+
+class FakeRewardService:
+    """Подмена requests.Session: записывает пачки и отвечает как reward_service"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def post(self, url, timeout, **kwargs):
+        awards = kwargs["json"]["awards"]
+        self.batches.append([(award["user_id"], award["prediction_id"]) for award in awards])
+        response = requests.Response()
+        if self.fail:
+            response.status_code = 503
+            response.url = url
+            return response
+        response.status_code = 200
+        response._content = json.dumps({
+            "status": "success",
+            "points_per_award": 100,
+            "awarded_prediction_ids": [award["prediction_id"] for award in awards],
+            "skipped_prediction_ids": []
+        }).encode()
+        return response
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine, tables=[models.AwardOutbox.__table__])
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(outbox, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def relay():
+    relay = OutboxRelay(batch_size=10, reward_service_url="http://rewards")
+    relay.http = FakeRewardService()
+    return relay
+
+
+def enqueue(session_factory, *awards, next_attempt_at=None):
+    db = session_factory()
+    past = datetime.utcnow() - timedelta(seconds=5)
+    db.add_all(
+        models.AwardOutbox(
+            user_id=user_id, prediction_id=prediction_id, prediction_text=f"p{prediction_id}",
+            next_attempt_at=next_attempt_at or past
+        )
+        for user_id, prediction_id in awards
+    )
+    db.commit()
+    db.close()
+
+
+def outbox_rows(session_factory):
+    db = session_factory()
+    try:
+        return {row.prediction_id: row for row in db.query(models.AwardOutbox)}
+    finally:
+        db.close()
+
+
+def test_delivers_batch_and_removes_rows(relay, session_factory):
+    enqueue(session_factory, (1, 10), (2, 20), (1, 11))
+    assert relay.deliver_batch() == 3
+    assert relay.http.batches == [[(1, 10), (2, 20), (1, 11)]]
+    assert outbox_rows(session_factory) == {}
+    assert relay.deliver_batch() == 0
+
+
+def test_failed_batch_is_deferred_whole(relay, session_factory, monkeypatch):
+    monkeypatch.setattr(outbox, "backoff_delay", lambda attempts: 60)
+    enqueue(session_factory, (1, 10), (2, 20))
+    relay.http.fail = True
+
+    assert relay.deliver_batch() == 0
+    rows = outbox_rows(session_factory)
+    assert {row.attempts for row in rows.values()} == {1}
+    assert all("503" in row.last_error for row in rows.values())
+    assert all(row.next_attempt_at > datetime.utcnow() for row in rows.values())
+    # Отложенные строки не берутся до истечения задержки
+    assert relay.deliver_batch() == 0
+    assert len(relay.http.batches) == 1
+
+
+def test_keeps_per_user_order_behind_a_deferred_award(relay, session_factory):
+    # Ранняя награда пользователя 1 ждет повтора - его более поздние награды
+    # тоже ждут, а награды других пользователей уходят
+    enqueue(session_factory, (1, 10), next_attempt_at=datetime.utcnow() + timedelta(minutes=5))
+    enqueue(session_factory, (1, 11), (2, 20), (1, 12))
+
+    assert relay.deliver_batch() == 1
+    assert relay.http.batches == [[(2, 20)]]
+    assert sorted(outbox_rows(session_factory)) == [10, 11, 12]
+
+    db = session_factory()
+    db.query(models.AwardOutbox).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+    assert relay.deliver_batch() == 3
+    assert relay.http.batches[-1] == [(1, 10), (1, 11), (1, 12)]
+
+
+def test_run_updates_backlog_until_stopped(relay, session_factory, monkeypatch):
+    enqueue(session_factory, (1, 10))
+    enqueue(session_factory, (2, 20), next_attempt_at=datetime.utcnow() + timedelta(minutes=5))
+    backlog = []
+    monkeypatch.setattr(outbox.BACKLOG, "set", backlog.append)
+    stop_event = threading.Event()
+    stop_event.wait = lambda timeout: stop_event.set()
+
+    relay.run(stop_event, poll_interval=0)
+
+    assert relay.http.batches == [[(1, 10)]]
+    assert backlog == [1]
@@ -0,0 +1,92 @@
+# tests/test_pagination.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from shared.pagination import (
+    InvalidCursor, decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor, keyset_page
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    # Пары с одинаковым created_at: порядок внутри пары решает id
+    start = datetime(2024, 1, 1, 12, 0, 0, 250000)
+    session.add_all(Item(id=i, created_at=start + timedelta(minutes=i // 2)) for i in range(1, 11))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 8, 30, 1, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_rank_cursor_round_trip_is_exact():
+    rank = 0.1 + 0.2
+    assert decode_rank_cursor(encode_rank_cursor(rank, 7)) == (rank, 7)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2024, 1, 1), 10 ** 12)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "!!!", encode_rank_cursor(1.5, 1)[:-2], "W10"])
+def test_invalid_cursor_raises(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_wrong_cursor_kind_raises():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_rank_cursor(1.5, 1))
+
+
+def page_through(db, limit):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(db.query(Item), Item, limit, cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 9])
+def test_keyset_pages_cover_all_rows_in_order(db, limit):
+    pages = page_through(db, limit)
+    assert [row_id for page in pages for row_id in page] == list(range(10, 0, -1))
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_exact_multiple_has_no_empty_last_page(db):
+    # 10 строк по 5: вторая страница последняя, курсора на пустую третью нет
+    assert page_through(db, 5) == [[10, 9, 8, 7, 6], [5, 4, 3, 2, 1]]
+
+
+def test_limit_larger_than_table(db):
+    rows, cursor = keyset_page(db.query(Item), Item, 100)
+    assert len(rows) == 10 and cursor is None
+
+
+def test_cursor_splits_rows_with_equal_created_at(db):
+    # id 4 и 5 имеют одинаковый created_at; граница страницы проходит между ними
+    rows, cursor = keyset_page(db.query(Item), Item, 6)
+    assert [row.id for row in rows][-1] == 5
+    rows, _ = keyset_page(db.query(Item), Item, 1, cursor)
+    assert [row.id for row in rows] == [4]
@@ -0,0 +1,191 @@
+# tests/test_prediction_cache.py
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from prediction_service.cache import LocalCache, PredictionCache
+
+KEY = PredictionCache.prediction_key(1)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def cache(server):
+    return PredictionCache(fakeredis.FakeRedis(server=server), lock_wait=0.2)
+
+
+class Loader:
+    def __init__(self, value, delay: float = 0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+def test_miss_loads_and_fills_both_layers(cache):
+    loader = Loader({"id": 1})
+    assert cache.get_or_load("prediction", KEY, loader) == {"id": 1}
+    assert loader.calls == 1
+    assert cache.local.get(KEY) == {"id": 1}
+    assert cache._get_remote(KEY) == {"id": 1}
+
+
+def test_hits_do_not_call_loader(cache):
+    loader = Loader({"id": 1})
+    cache.get_or_load("prediction", KEY, loader)
+    cache.get_or_load("prediction", KEY, loader)
+    cache.local.clear()
+    # L1 пуст - значение приходит из Redis
+    assert cache.get_or_load("prediction", KEY, loader) == {"id": 1}
+    assert loader.calls == 1
+    assert cache.hits == 2
+
+
+def test_none_is_not_cached(cache):
+    loader = Loader(None)
+    assert cache.get_or_load("prediction", KEY, loader) is None
+    assert cache.get_or_load("prediction", KEY, loader) is None
+    assert loader.calls == 2
+
+
+def test_invalidate_drops_prediction_and_first_page(cache):
+    page_key = cache.first_page_key(7)
+    cache.get_or_load("prediction", KEY, Loader({"id": 1}))
+    cache.get_or_load("first_page", page_key, Loader({"items": []}))
+
+    cache.invalidate([(1, 7)])
+    assert cache.local.get(KEY) is None and cache._get_remote(KEY) is None
+    assert cache.local.get(page_key) is None and cache._get_remote(page_key) is None
+
+    loader = Loader({"id": 1, "status": "fulfilled"})
+    assert cache.get_or_load("prediction", KEY, loader) == {"id": 1, "status": "fulfilled"}
+    assert loader.calls == 1
+
+
+def test_load_racing_with_invalidate_does_not_store_stale_value(cache):
+    # Загрузка прочитала строку до записи, запись закоммитилась и сбросила кэш
+    # до того, как загрузка успела положить значение
+    def stale_loader():
+        cache.invalidate([(1, 7)])
+        return {"id": 1, "status": "pending"}
+
+    assert cache.get_or_load("prediction", KEY, stale_loader) == {"id": 1, "status": "pending"}
+    assert cache.local.get(KEY) is None
+    assert cache._get_remote(KEY) is None
+
+    fresh = Loader({"id": 1, "status": "fulfilled"})
+    assert cache.get_or_load("prediction", KEY, fresh)["status"] == "fulfilled"
+    assert cache._get_remote(KEY)["status"] == "fulfilled"
+
+
+def test_invalidate_from_another_process_blocks_stale_store(server):
+    cache = PredictionCache(fakeredis.FakeRedis(server=server))
+    writer = PredictionCache(fakeredis.FakeRedis(server=server))
+
+    def stale_loader():
+        writer.invalidate([(1, 7)])
+        return {"id": 1, "status": "pending"}
+
+    cache.get_or_load("prediction", KEY, stale_loader)
+    assert cache._get_remote(KEY) is None
+
+
+def test_concurrent_misses_in_one_process_load_once(cache):
+    loader = Loader({"id": 1}, delay=0.05)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("prediction", KEY, loader)))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"id": 1}] * 10
+    assert loader.calls == 1
+
+
+def test_stampede_lock_makes_other_processes_wait(server):
+    first = PredictionCache(fakeredis.FakeRedis(server=server), lock_wait=1.0)
+    second = PredictionCache(fakeredis.FakeRedis(server=server), lock_wait=1.0)
+    slow = Loader({"id": 1}, delay=0.2)
+    waiting = Loader({"id": 1})
+
+    thread = threading.Thread(target=first.get_or_load, args=("prediction", KEY, slow))
+    thread.start()
+    time.sleep(0.05)
+    # Блокировка загрузки занята первым процессом - второй дожидается его значения
+    assert second.get_or_load("prediction", KEY, waiting) == {"id": 1}
+    thread.join()
+
+    assert slow.calls == 1
+    assert waiting.calls == 0
+
+
+def test_lock_wait_timeout_falls_back_to_loader(server):
+    cache = PredictionCache(fakeredis.FakeRedis(server=server), lock_wait=0.05)
+    fakeredis.FakeRedis(server=server).set(f"{KEY}:lock", "1")
+    loader = Loader({"id": 1})
+
+    assert cache.get_or_load("prediction", KEY, loader) == {"id": 1}
+    assert loader.calls == 1
+    # Без блокировки значение не пишется в Redis
+    assert cache._get_remote(KEY) is None
+
+
+def test_redis_unavailable_serves_from_loader():
+    client = fakeredis.FakeRedis()
+    client.connected = False
+    cache = PredictionCache(client)
+    loader = Loader({"id": 1})
+
+    assert cache.get_or_load("prediction", KEY, loader) == {"id": 1}
+    cache.invalidate([(1, 7)])
+    assert loader.calls == 1
+
+
+def test_async_load_racing_with_invalidate(cache, server):
+    async def stale_loader():
+        cache.invalidate([(1, 7)])
+        return {"id": 1, "status": "pending"}
+
+    async def fresh_loader():
+        return {"id": 1, "status": "fulfilled"}
+
+    async def scenario():
+        cache.async_client = fakeredis.FakeAsyncRedis(server=server)
+        await cache.aget_or_load("prediction", KEY, stale_loader)
+        assert cache._get_remote(KEY) is None
+        return await cache.aget_or_load("prediction", KEY, fresh_loader)
+
+    assert asyncio.run(scenario())["status"] == "fulfilled"
+    assert cache._get_remote(KEY)["status"] == "fulfilled"
+
+
+def test_local_cache_put_after_delete_is_ignored():
+    local = LocalCache(max_size=2, ttl=60)
+    version = local.version("a")
+    local.delete("a")
+    local.put("a", 1, version)
+    assert local.get("a") is None
+
+    # Очистка словаря версий при переполнении не должна разрешать старые записи
+    version = local.version("b")
+    local.delete("x", "y", "z")
+    local.delete("b")
+    local.put("b", 1, version)
+    assert local.get("b") is None
+    local.put("b", 2, local.version("b"))
+    assert local.get("b") == 2
@@ -0,0 +1,134 @@
+# tests/test_prediction_checker.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from prediction_service import models, tasks
+from prediction_service.evaluators import PredictionEvaluator
+from prediction_service.tasks import PredictionChecker
+
+
+class ByText(PredictionEvaluator):
+    """Исход по тексту: "yes" - сбылось, "no" - нет, остальное - неизвестно"""
+
+    name = "by-text"
+
+    def __init__(self):
+        self.batches = []
+
+    def evaluate_batch(self, predictions):
+        self.batches.append([prediction.id for prediction in predictions])
+        outcomes = {"yes": True, "no": False}
+        return {prediction.id: outcomes.get(prediction.prediction_text) for prediction in predictions}
+
+
+class Broken(PredictionEvaluator):
+    name = "broken"
+
+    def evaluate_batch(self, predictions):
+        raise RuntimeError("upstream is down")
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine, tables=[models.Prediction.__table__, models.AwardOutbox.__table__])
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(tasks, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def add_predictions(session_factory, texts, due_in: timedelta = timedelta(days=-1), **values):
+    db = session_factory()
+    predictions = [
+        models.Prediction(user_id=1, prediction_text=text, due_date=datetime.utcnow() + due_in, **values)
+        for text in texts
+    ]
+    db.add_all(predictions)
+    db.commit()
+    ids = [prediction.id for prediction in predictions]
+    db.close()
+    return ids
+
+
+def statuses(session_factory) -> dict:
+    db = session_factory()
+    try:
+        return {p.id: (p.status, p.claimed_by) for p in db.query(models.Prediction)}
+    finally:
+        db.close()
+
+
+def test_processes_due_predictions_in_chunks_with_bulk_updates(session_factory):
+    due = add_predictions(session_factory, ["yes", "no", "yes", "no", "yes", "no", "yes"])
+    future = add_predictions(session_factory, ["yes"], due_in=timedelta(days=1))
+    updates = []
+
+    @event.listens_for(session_factory.kw["bind"], "before_cursor_execute")
+    def count_updates(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE"):
+            updates.append(statement)
+
+    evaluator = ByText()
+    processed = PredictionChecker(chunk_size=3, worker_id="w1", evaluator=evaluator).check_expired_predictions()
+
+    assert processed == 7
+    assert [len(batch) for batch in evaluator.batches] == [3, 3, 1]
+    # На пачку: аренда и по одному UPDATE на исход (в последней пачке failed нет),
+    # плюс пустая последняя аренда
+    assert len(updates) == 3 + 3 + 2 + 1
+    result = statuses(session_factory)
+    assert [result[pid] for pid in due] == [
+        ("fulfilled", None), ("failed", None), ("fulfilled", None), ("failed", None),
+        ("fulfilled", None), ("failed", None), ("fulfilled", None)
+    ]
+    assert result[future[0]] == ("pending", None)
+
+    db = session_factory()
+    assert sorted(row.prediction_id for row in db.query(models.AwardOutbox)) == due[::2]
+    assert all(p.checked_at is not None for p in db.query(models.Prediction).filter_by(status="fulfilled"))
+    db.close()
+
+
+def test_undecided_predictions_are_deferred(session_factory):
+    ids = add_predictions(session_factory, ["maybe", "yes"])
+    processed = PredictionChecker(chunk_size=10, worker_id="w1", evaluator=ByText()).check_expired_predictions()
+    assert processed == 2
+
+    db = session_factory()
+    undecided = db.get(models.Prediction, ids[0])
+    assert (undecided.status, undecided.claimed_by) == ("pending", "w1")
+    # Аренда продлена до повтора - следующий запуск строку не берет
+    assert undecided.claim_expires_at > datetime.utcnow()
+    db.close()
+    evaluator = ByText()
+    assert PredictionChecker(worker_id="w2", evaluator=evaluator).check_expired_predictions() == 0
+    assert evaluator.batches == []
+
+
+def test_skips_rows_leased_by_another_worker(session_factory):
+    leased = add_predictions(
+        session_factory, ["yes"], claimed_by="other", claim_expires_at=datetime.utcnow() + timedelta(minutes=5)
+    )
+    expired_lease = add_predictions(
+        session_factory, ["yes"], claimed_by="crashed", claim_expires_at=datetime.utcnow() - timedelta(minutes=5)
+    )
+    assert PredictionChecker(worker_id="w1", evaluator=ByText()).check_expired_predictions() == 1
+
+    result = statuses(session_factory)
+    assert result[leased[0]] == ("pending", "other")
+    assert result[expired_lease[0]] == ("fulfilled", None)
+
+
+def test_evaluator_failure_releases_the_chunk(session_factory):
+    ids = add_predictions(session_factory, ["yes", "no"])
+    assert PredictionChecker(worker_id="w1", evaluator=Broken()).check_expired_predictions() == 0
+
+    assert statuses(session_factory) == {pid: ("pending", None) for pid in ids}
+    db = session_factory()
+    assert db.query(models.AwardOutbox).count() == 0
+    db.close()
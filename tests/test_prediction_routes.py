@@ -0,0 +1,152 @@
+# tests/test_prediction_routes.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth_service.dependencies import get_current_user
+from auth_service.schemas import UserResponse
+from prediction_service import models
+from prediction_service.cache import prediction_cache
+from prediction_service.database import get_db
+from prediction_service.main import app
+
+USER = UserResponse(id=1, username="alice", email="alice@example.com", is_active=True, created_at=datetime(2024, 1, 1))
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(
+        engine, tables=[models.Prediction.__table__, models.PredictionArchive.__table__]
+    )
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory):
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    prediction_cache.client.flushall()
+    prediction_cache.local.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def add_predictions(session_factory, count: int, user_id: int = USER.id):
+    db = session_factory()
+    start = datetime(2024, 1, 1)
+    db.add_all(
+        models.Prediction(
+            user_id=user_id,
+            prediction_text=f"prediction {i}",
+            due_date=start + timedelta(days=30),
+            created_at=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    )
+    db.commit()
+    db.close()
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -5}, {"limit": 100000}, {"skip": -1}])
+def test_list_rejects_out_of_range_paging(client, params):
+    assert client.get("/predictions/", params=params).status_code == 422
+
+
+def test_list_pages_with_cursor(client, session_factory):
+    add_predictions(session_factory, 5)
+    first = client.get("/predictions/", params={"limit": 2})
+    assert first.status_code == 200
+    assert [p["prediction_text"] for p in first.json()] == ["prediction 4", "prediction 3"]
+
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get("/predictions/", params={"limit": 2, "cursor": cursor})
+    assert [p["prediction_text"] for p in second.json()] == ["prediction 2", "prediction 1"]
+
+    last = client.get("/predictions/", params={"limit": 2, "cursor": second.headers["X-Next-Cursor"]})
+    assert [p["prediction_text"] for p in last.json()] == ["prediction 0"]
+    assert "X-Next-Cursor" not in last.headers
+
+
+def test_list_rejects_invalid_cursor(client):
+    assert client.get("/predictions/", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_search_on_unsupported_database_returns_501(client, monkeypatch):
+    from prediction_service import crud
+    monkeypatch.delitem(crud._SEARCH_SQL, "sqlite")
+    assert client.get("/predictions/search", params={"q": "rain"}).status_code == 501
+
+
+def test_batch_reports_invalid_and_non_object_items_by_index(client, session_factory):
+    valid = {"prediction_text": "rain tomorrow", "due_date": "2030-01-01T00:00:00"}
+    response = client.post("/predictions/batch", json={
+        "items": [valid, "not an object", {"prediction_text": "no due date"}, 42, None, dict(valid, is_public=True)]
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["prediction_text"] for p in body["created"]] == ["rain tomorrow", "rain tomorrow"]
+    assert [error["index"] for error in body["errors"]] == [1, 2, 3, 4]
+    assert body["errors"][0]["errors"] == ["item must be a JSON object"]
+    assert body["errors"][1]["errors"] == ["due_date: Field required"]
+    db = session_factory()
+    assert db.query(models.Prediction).count() == 2
+    db.close()
+
+
+def add_archived(session_factory, user_id: int = USER.id) -> int:
+    db = session_factory()
+    archived = models.PredictionArchive(
+        id=1000,
+        user_id=user_id,
+        prediction_text="archived",
+        due_date=datetime(2023, 2, 1),
+        status="fulfilled",
+        created_at=datetime(2023, 1, 1),
+        checked_at=datetime(2023, 2, 1)
+    )
+    db.add(archived)
+    db.commit()
+    db.close()
+    return 1000
+
+
+def test_delete_archived_prediction(client, session_factory):
+    prediction_id = add_archived(session_factory)
+    assert client.get(f"/predictions/{prediction_id}").status_code == 200
+
+    assert client.delete(f"/predictions/{prediction_id}").status_code == 200
+    assert client.get(f"/predictions/{prediction_id}").status_code == 404
+
+
+def test_delete_archived_prediction_of_other_user_is_forbidden(client, session_factory):
+    prediction_id = add_archived(session_factory, user_id=2)
+    assert client.delete(f"/predictions/{prediction_id}").status_code == 403
+
+
+def test_status_update_on_archived_prediction(session_factory):
+    from prediction_service import crud
+    prediction_id = add_archived(session_factory)
+    db = session_factory()
+
+    assert crud.update_prediction_status(db, prediction_id, "failed").status == "failed"
+    assert crud.get_prediction(db, prediction_id) is None
+
+    # Снова ожидающее возвращается в горячую таблицу
+    restored = crud.update_prediction_status(db, prediction_id, "pending")
+    assert isinstance(restored, models.Prediction)
+    assert crud.get_archived_prediction(db, prediction_id) is None
+    db.close()
@@ -0,0 +1,142 @@
+# tests/test_revocation.py
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from shared.models import Base, RevokedToken
+from shared.revocation import BloomFilter, RevocationList
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[RevokedToken.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def revoke(session_factory, jti: str, expires_in: float = 3600):
+    db = session_factory()
+    try:
+        db.add(RevokedToken(jti=jti, expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_in)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    keys = [f"jti-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_refresh_loads_only_new_rows(session_factory):
+    revocations = RevocationList(session_factory, rebuild_interval=3600)
+    revoke(session_factory, "a")
+    revocations.refresh()
+    assert revocations.is_revoked("a")
+    assert not revocations.is_revoked("b")
+
+    revoke(session_factory, "b")
+    revocations.refresh()
+    assert revocations.is_revoked("b")
+    assert revocations.stats()["revoked"] == 2
+
+
+def test_refresh_picks_up_late_commit_with_lower_id(session_factory):
+    revocations = RevocationList(session_factory, rebuild_interval=3600, overlap=30)
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(hours=1)
+    db = session_factory()
+    # id=1 зарезервирован транзакцией, которая закоммитится позже
+    db.add_all(
+        RevokedToken(id=i, jti=f"jti-{i}", expires_at=expires_at, revoked_at=now + timedelta(seconds=5))
+        for i in range(2, 300)
+    )
+    db.commit()
+    revocations.refresh()
+    assert revocations.is_revoked("jti-299")
+
+    db.add(RevokedToken(id=1, jti="late", expires_at=expires_at, revoked_at=now))
+    db.add(RevokedToken(id=300, jti="stale", expires_at=expires_at, revoked_at=now - timedelta(minutes=5)))
+    db.commit()
+    db.close()
+    revocations.refresh()
+    assert revocations.is_revoked("late")
+    # Строки старше окна перекрытия инкрементальное обновление не читает
+    assert not revocations.is_revoked("stale")
+
+
+def test_rebuild_drops_expired_tokens(session_factory):
+    revocations = RevocationList(session_factory, rebuild_interval=3600)
+    revoke(session_factory, "old", expires_in=-1)
+    revoke(session_factory, "live")
+    revocations.add("old", datetime.now(timezone.utc) - timedelta(seconds=1))
+
+    revocations.rebuild_interval = 0
+    revocations.refresh()
+    assert revocations.is_revoked("live")
+    assert not revocations.is_revoked("old")
+
+
+def test_rebuild_keeps_tokens_added_locally(session_factory):
+    revocations = RevocationList(session_factory, rebuild_interval=0)
+    # Отзыв записан в память, но строка еще не видна запросу перестройки
+    revocations.add("pending", datetime.now(timezone.utc) + timedelta(hours=1))
+    revocations.refresh()
+    assert revocations.is_revoked("pending")
+
+
+def test_rebuild_never_exposes_empty_list(session_factory):
+    db = session_factory()
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    db.add_all(RevokedToken(jti=f"jti-{i}", expires_at=expires_at) for i in range(5000))
+    db.commit()
+    db.close()
+    revocations = RevocationList(session_factory, rebuild_interval=0)
+    revocations.refresh()
+
+    # Последняя строка перестройки - в старой реализации она дольше всех отсутствовала
+    misses = []
+    stop = threading.Event()
+
+    def check():
+        while not stop.is_set():
+            if not revocations.is_revoked("jti-4999"):
+                misses.append(1)
+
+    checker = threading.Thread(target=check)
+    checker.start()
+    try:
+        for _ in range(10):
+            revocations.refresh()
+    finally:
+        stop.set()
+        checker.join()
+    assert not misses
+
+
+def test_bloom_grows_past_capacity(session_factory):
+    revocations = RevocationList(session_factory, capacity=4)
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    for i in range(50):
+        revocations.add(f"jti-{i}", expires_at)
+
+    assert all(revocations.is_revoked(f"jti-{i}") for i in range(50))
+    assert not revocations.is_revoked("unknown")
@@ -0,0 +1,123 @@
+# tests/test_scheduler.py
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+import redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from prediction_service import models, scheduler, tasks
+from prediction_service.scheduler import DueScheduler, due_score
+from prediction_service.tasks import PredictionChecker
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def due():
+    return DueScheduler(fakeredis.FakeRedis(), key="test:due")
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine, tables=[models.Prediction.__table__, models.AwardOutbox.__table__])
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+def test_due_score_treats_naive_as_utc():
+    assert due_score(NOW) == due_score(NOW.replace(tzinfo=timezone.utc))
+
+
+def test_pop_due_returns_only_due_in_order(due):
+    due.schedule_many([(1, NOW + timedelta(minutes=1)), (2, NOW - timedelta(minutes=2)), (3, NOW)])
+    due.schedule(4, NOW - timedelta(minutes=1))
+
+    assert due.pop_due(2, now=due_score(NOW)) == [2, 4]
+    assert due.pop_due(10, now=due_score(NOW)) == [3]
+    assert due.pop_due(10, now=due_score(NOW)) == []
+    assert due.seconds_until_next(now=due_score(NOW)) == 60
+
+
+def test_pop_due_skips_ids_taken_by_another_worker(due, monkeypatch):
+    due.schedule_many((i, NOW) for i in range(5))
+    read = due.client.zrangebyscore
+
+    def racing_read(*args, **kwargs):
+        members = read(*args, **kwargs)
+        # Другой воркер снял часть тех же элементов между чтением и ZREM
+        due.client.zrem(due.key, 0, 1)
+        return members
+
+    monkeypatch.setattr(due.client, "zrangebyscore", racing_read)
+    assert due.pop_due(10, now=due_score(NOW)) == [2, 3, 4]
+
+
+def test_unschedule(due):
+    due.schedule_many([(1, NOW), (2, NOW)])
+    due.unschedule(1)
+    due.unschedule()
+    assert due.pop_due(10, now=due_score(NOW)) == [2]
+
+
+def test_rebuild_merges_pending_rows(due, session_factory):
+    db = session_factory()
+    db.add_all([
+        models.Prediction(id=1, user_id=1, prediction_text="a", due_date=NOW + timedelta(days=1)),
+        models.Prediction(id=2, user_id=1, prediction_text="b", due_date=NOW - timedelta(days=1)),
+        models.Prediction(id=3, user_id=1, prediction_text="c", due_date=NOW, status="fulfilled"),
+        models.Prediction(id=4, user_id=1, prediction_text="d", due_date=None),
+    ])
+    db.commit()
+    # Запись, сделанная во время перестройки, сохраняется
+    due.schedule(99, NOW)
+
+    assert due.rebuild(db, chunk_size=1) == 2
+    assert due.client.zrange(due.key, 0, -1) == [b"2", b"99", b"1"]
+    assert not due.client.keys(f"{due.key}:rebuild:*")
+
+    # Перестройку выполняет только первый из одновременно стартующих
+    due.client.delete(scheduler.REBUILD_LOCK_KEY)
+    assert due.rebuild_once(db) == 2
+    assert due.rebuild_once(db) is None
+    db.close()
+
+
+def test_safe_helpers_swallow_redis_errors(monkeypatch):
+    class Down:
+        def zadd(self, *args):
+            raise redis.ConnectionError("down")
+
+        zrem = zadd
+
+    monkeypatch.setattr(scheduler.due_scheduler, "client", Down())
+    scheduler.safe_schedule(1, NOW)
+    scheduler.safe_schedule_many([(1, NOW), (2, None)])
+    scheduler.safe_unschedule(1)
+
+
+def test_checker_claims_only_scheduled_predictions(due, session_factory, monkeypatch):
+    monkeypatch.setattr(tasks, "SessionLocal", session_factory)
+    monkeypatch.setattr(tasks, "due_scheduler", due)
+    db = session_factory()
+    past = datetime.utcnow() - timedelta(minutes=1)
+    db.add_all(
+        models.Prediction(id=i, user_id=1, prediction_text="yes", due_date=past) for i in (1, 2, 3)
+    )
+    db.commit()
+    db.close()
+    # Строка 3 наступила, но не в расписании - ее подберет полный проход
+    due.schedule_many([(1, past), (2, past)])
+
+    class AllTrue(tasks.PredictionEvaluator):
+        def evaluate_batch(self, predictions):
+            return {prediction.id: True for prediction in predictions}
+
+    assert PredictionChecker(worker_id="w1", evaluator=AllTrue()).check_due_predictions() == 2
+    db = session_factory()
+    assert {p.id: p.status for p in db.query(models.Prediction)} == {1: "fulfilled", 2: "fulfilled", 3: "pending"}
+    db.close()
+    assert due.client.zcard(due.key) == 0
@@ -0,0 +1,104 @@
+# tests/test_user_cache.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth_service import user_cache as user_cache_module
+from auth_service.dependencies import get_current_user
+from auth_service.schemas import UserResponse
+from auth_service.user_cache import UserCache, user_cache
+from shared.models import Base, User
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    factory = sessionmaker(bind=engine, autoflush=False)
+    db = factory()
+    db.add(User(id=1, username="alice", email="alice@example.com", hashed_password="x"))
+    db.commit()
+    db.close()
+    user_cache.clear()
+    yield factory
+    user_cache.clear()
+    engine.dispose()
+
+
+def current_user(db, username: str = "alice") -> UserResponse:
+    return asyncio.run(get_current_user(payload={"sub": username}, db=db))
+
+
+def test_lru_with_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(user_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = UserCache(max_size=2, ttl=10)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    # "b" использовался давнее всех - вытеснен
+    assert cache.get("b") is None and cache.get("c") == "C"
+    now[0] = 110.0
+    assert cache.get("a") is None
+    assert cache.hits == 2 and cache.misses == 2
+
+
+def test_second_lookup_skips_database(session_factory):
+    db = session_factory()
+    queries = []
+    db.query = lambda *args: queries.append(args) or type(db).query(db, *args)
+
+    assert current_user(db).id == 1
+    assert current_user(db).id == 1
+    assert len(queries) == 1
+    db.close()
+
+
+def test_unknown_user_rejected_and_not_cached(session_factory):
+    db = session_factory()
+    with pytest.raises(HTTPException) as error:
+        current_user(db, "mallory")
+    assert error.value.status_code == 401
+    assert user_cache.get("mallory") is None
+    db.close()
+
+
+def test_update_invalidates_after_commit_only(session_factory):
+    db = session_factory()
+    current_user(db)
+    user = db.get(User, 1)
+    user.email = "new@example.com"
+    db.flush()
+    # До коммита параллельный запрос должен видеть прежнюю запись
+    assert user_cache.get("alice") is not None
+    db.commit()
+    assert user_cache.get("alice") is None
+    assert current_user(db).email == "new@example.com"
+    db.close()
+
+
+def test_rename_invalidates_old_username(session_factory):
+    db = session_factory()
+    current_user(db)
+    db.expire_all()
+    db.get(User, 1).username = "alicia"
+    db.commit()
+    assert user_cache.get("alice") is None
+    with pytest.raises(HTTPException):
+        current_user(db, "alice")
+    db.close()
+
+
+def test_delete_invalidates(session_factory):
+    db = session_factory()
+    current_user(db)
+    db.delete(db.get(User, 1))
+    db.commit()
+    assert user_cache.get("alice") is None
+    db.close()
@@ -0,0 +1,75 @@
+# tests/test_workers.py
+import signal
+import threading
+
+from prediction_service import workers
+
+
+class StubChecker:
+    """Подмена PredictionChecker: записывает вызовы и останавливает цикл"""
+
+    calls = []
+    results = []
+    stop_event = None
+
+    def __init__(self, chunk_size, worker_id, lease_seconds):
+        self.calls.append(("init", chunk_size, worker_id, lease_seconds))
+
+    def _next(self, kind):
+        self.calls.append((kind,))
+        result = self.results.pop(0)
+        if not self.results:
+            self.stop_event.set()
+        return result
+
+    def check_due_predictions(self):
+        return self._next("due")
+
+    def check_expired_predictions(self):
+        return self._next("expired")
+
+
+class StubEngine:
+    def __init__(self):
+        self.disposed = []
+
+    def dispose(self, close=True):
+        self.disposed.append(close)
+        StubChecker.calls.append(("dispose",))
+
+
+def test_run_worker_drops_inherited_pool_and_stops(monkeypatch):
+    stop_event = threading.Event()
+    engine = StubEngine()
+    monkeypatch.setattr(StubChecker, "calls", [])
+    monkeypatch.setattr(StubChecker, "results", [3, 0, 2])
+    monkeypatch.setattr(StubChecker, "stop_event", stop_event)
+    monkeypatch.setattr(workers, "PredictionChecker", StubChecker)
+    monkeypatch.setattr(workers, "engine", engine)
+    monkeypatch.setattr(workers, "idle_timeout", lambda poll_interval: 0)
+    monkeypatch.setattr(signal, "signal", lambda signum, handler: None)
+
+    workers.run_worker(stop_event, chunk_size=50, lease_seconds=30, poll_interval=0, reconcile_interval=3600)
+
+    # Пул родителя отброшен без закрытия до первого обращения к БД
+    assert engine.disposed == [False]
+    assert StubChecker.calls[0] == ("dispose",)
+    kinds = [call[0] for call in StubChecker.calls]
+    assert kinds == ["dispose", "init", "due", "init", "due", "init", "due"]
+    # Один worker_id на все итерации процесса
+    assert len({call[2] for call in StubChecker.calls if call[0] == "init"}) == 1
+    assert StubChecker.calls[1][1] == 50 and StubChecker.calls[1][3] == 30
+
+
+def test_run_worker_reconciles_by_full_scan(monkeypatch):
+    stop_event = threading.Event()
+    monkeypatch.setattr(StubChecker, "calls", [])
+    monkeypatch.setattr(StubChecker, "results", [1])
+    monkeypatch.setattr(StubChecker, "stop_event", stop_event)
+    monkeypatch.setattr(workers, "PredictionChecker", StubChecker)
+    monkeypatch.setattr(workers, "engine", StubEngine())
+    monkeypatch.setattr(signal, "signal", lambda signum, handler: None)
+
+    workers.run_worker(stop_event, chunk_size=10, lease_seconds=30, poll_interval=0, reconcile_interval=0)
+
+    assert ("expired",) in StubChecker.calls